@@ -0,0 +1,206 @@
+import os
+import math
+import time
+import argparse
+import tempfile
+import tracemalloc
+from typing import Callable, Dict, List, Tuple
+
+import fitz
+import numpy as np
+import pandas as pd
+
+from benchmarks.synthetic_pdfs import (
+    best_laps, make_riders, write_analysis_pdf, write_classification_pdf, write_race_classification_pdf, write_test_day
+)
+from utils.Parser import LapRecord, PdfParser
+
+# name: (riders, stints, laps per stint)
+SIZES = {
+    "small": (10, 2, 6),
+    "medium": (25, 3, 8),
+    "large": (30, 5, 10),
+}
+
+
+def expected_analysis_laps(laps: List[LapRecord], delete_if_less_than_three: bool) -> Dict[str, List[LapRecord]]:
+    """
+    Pick out the laps a practice session should keep, written from the rules rather than from the parser: pit in and
+    unfinished laps are dropped, then the out lap of every stint and the lap before the pit in lap of every stint but
+    the last.
+
+    :param laps: Every lap of the session, see synthetic_pdfs.write_analysis_pdf.
+    :param delete_if_less_than_three: Drop the riders with fewer than three laps left.
+    :return: The laps kept for each rider.
+    """
+    stints: Dict[str, Dict[int, List[LapRecord]]] = dict()
+    for lap in laps:
+        rider_stints = stints.setdefault(lap.rider, dict())
+        rider_stints.setdefault(lap.stint, list())
+        if not lap.pit_in and not lap.unfinished:
+            rider_stints[lap.stint].append(lap)
+    out = dict()
+    for rider, rider_stints in stints.items():
+        last = max(rider_stints)
+        kept = list()
+        for stint, stint_laps in rider_stints.items():
+            kept.extend(stint_laps[1:] if stint == last else stint_laps[1:-1])
+        if len(kept) >= 3 or not delete_if_less_than_three:
+            out[rider] = kept
+    return out
+
+
+def same_laps(parsed: List[LapRecord], expected: List[LapRecord]) -> bool:
+    """A helper to compare lap records, treating NaN as equal to NaN."""
+    return len(parsed) == len(expected) and all(repr(a) == repr(b) for a, b in zip(parsed, expected))
+
+
+def check_laps_table(df: pd.DataFrame, expected: Dict[str, List[LapRecord]]) -> bool:
+    """A helper to check a PdfParser.parse_laps table against the laps it should keep."""
+    kept = [lap for rider_laps in expected.values() for lap in rider_laps]
+    return (
+        list(df["Rider"]) == [lap.rider for lap in kept]
+        and list(df["Lap"]) == [lap.lap_number for lap in kept]
+        and np.array_equal(df["LapTime"].to_numpy(), np.array([lap.lap_time for lap in kept], dtype=np.float32))
+        and np.array_equal(df["T1"].to_numpy(), np.array([lap.sectors[0] for lap in kept], dtype=np.float32))
+    )
+
+
+def check_wide_table(df: pd.DataFrame, expected: Dict[str, List[LapRecord]]) -> bool:
+    """A helper to check a PdfParser.parse_pdf table against the laps it should keep."""
+    riders = [column for column in df.columns if column != "Session"]
+    return riders == list(expected) and all(
+        df[rider].dropna().tolist() == [lap.lap_time for lap in expected[rider]] for rider in riders
+    )
+
+
+def measure(func: Callable[[], object], repeats: int) -> Tuple[object, float, float]:
+    """
+    Run a function, timing the best of the repeats and tracing the peak of Python memory on a separate run. Memory
+    allocated by MuPDF itself is not traced.
+
+    :param func: The function to run.
+    :param repeats: The number of timed runs.
+    :return: The result, the fastest run in seconds and the peak traced memory in MB.
+    """
+    result = None
+    fastest = math.inf
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = func()
+        fastest = min(fastest, time.perf_counter() - start)
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, fastest, peak / 1024 / 1024
+
+
+def run_size(root: str, name: str, riders: int, stints: int, laps: int, repeats: int) -> List[Dict[str, object]]:
+    """
+    Time every parse method on one session of the given size.
+
+    :param root: The directory to write the PDFs to.
+    :param name: The name of the size.
+    :param riders: The number of riders.
+    :param stints: The number of stints of each rider.
+    :param laps: The number of laps in each stint.
+    :param repeats: The number of timed runs of each method.
+    :return: A row of results for each method.
+    """
+    parser = PdfParser()
+    field = make_riders(riders)
+    analysis = os.path.join(root, f"MotoGP-2024_{name.upper()}_FP1.pdf")
+    classification = os.path.join(root, f"MotoGP-2024_{name.upper()}_Classification_FP1.pdf")
+    race = os.path.join(root, f"2024_{name.upper()}_MotoGP_RAC_Classification.pdf")
+    all_laps = write_analysis_pdf(analysis, field, stints, laps)
+    write_classification_pdf(classification, field, best_laps(all_laps))
+    race_results = write_race_classification_pdf(race, field)
+    expected = expected_analysis_laps(all_laps, delete_if_less_than_three=True)
+    with fitz.Document(analysis) as doc:
+        pages = len(doc)
+
+    cases = {
+        "records_text": (lambda: list(parser.iter_lap_records(analysis, parser.TEXT)),
+                         lambda out: same_laps(out, all_laps)),
+        "records_words": (lambda: list(parser.iter_lap_records(analysis, parser.WORDS)),
+                          lambda out: same_laps(out, all_laps)),
+        "parse_pdf": (lambda: parser.parse_pdf(analysis, True, False),
+                      lambda out: check_wide_table(out, expected)),
+        "parse_laps": (lambda: parser.parse_laps(analysis, True, False),
+                       lambda out: check_laps_table(out, expected)),
+        "parse_laps_words": (lambda: parser.parse_laps(analysis, True, False, parser.WORDS),
+                             lambda out: check_laps_table(out, expected)),
+        "classification": (lambda: parser.parse_classification_pdf(classification),
+                           lambda out: list(out["Rider"]) == list(best_laps(all_laps))),
+        "race_classification": (lambda: parser.parse_race_classification_pdf(race),
+                                lambda out: list(out["Rider"]) == [row.rider.name for row in race_results]
+                                and list(out["Points"]) == [row.points for row in race_results]),
+    }
+    rows = list()
+    for method, (func, check) in cases.items():
+        out, seconds, peak = measure(func, repeats)
+        # every lap is read from an Analysis PDF, a row per rider from a Classification PDF
+        n_rows = len(out) if "classification" in method else len(all_laps)
+        rows.append({
+            "size": name, "method": method, "pages": 1 if "classification" in method else pages, "rows": n_rows,
+            "seconds": seconds, "rows_per_second": n_rows / seconds, "peak_mb": peak, "correct": check(out)
+        })
+    return rows
+
+
+def run_test_day(root: str, sessions: int, riders: int, stints: int, laps: int, workers: List[int]) \
+        -> List[Dict[str, object]]:
+    """
+    Time parsing every session of a test day into lap tables, one after the other and in pools of processes.
+
+    :param root: The directory to write the PDFs to.
+    :param sessions: The number of sessions.
+    :param riders: The number of riders.
+    :param stints: The number of stints of each rider in each session.
+    :param laps: The number of laps in each stint.
+    :param workers: The numbers of processes to compare.
+    :return: A row of results for each number of processes.
+    """
+    parser = PdfParser()
+    written = write_test_day(root, "MotoGP", 2024, "TST", [f"FP{i + 1}" for i in range(sessions)], riders, stints, laps)
+    files = [analysis for analysis, _, _ in written.values()]
+    total_laps = sum(len(session_laps) for _, _, session_laps in written.values())
+    expected = [expected_analysis_laps(session_laps, True) for _, _, session_laps in written.values()]
+    rows = list()
+    for n_workers in workers:
+        if n_workers > 1:
+            # start the shared pool before timing, the app keeps it for the life of the process
+            list(parser.process_pool(n_workers).map(abs, range(n_workers)))
+        start = time.perf_counter()
+        out = parser.parse_many(files, n_workers, parser.parse_laps, delete_if_less_than_three=True, is_race=False)
+        seconds = time.perf_counter() - start
+        rows.append({
+            "size": f"test_day_{sessions}", "method": f"parse_many_workers_{n_workers}", "pages": "",
+            "rows": total_laps, "seconds": seconds, "rows_per_second": total_laps / seconds, "peak_mb": "",
+            "correct": all(check_laps_table(df, exp) for df, exp in zip(out, expected))
+        })
+    return rows
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Measure the PDF parsers on synthetic PDFs.")
+    arg_parser.add_argument("--sizes", nargs="*", default=list(SIZES), choices=list(SIZES), help="Sizes to run.")
+    arg_parser.add_argument("--repeats", type=int, default=3, help="Timed runs of each method, the fastest is kept.")
+    arg_parser.add_argument("--sessions", type=int, default=9, help="Sessions in the test day, 0 to skip it.")
+    arg_parser.add_argument("--workers", type=int, nargs="*", default=[1, 2, 4], help="Processes to compare.")
+    args = arg_parser.parse_args()
+
+    results = list()
+    with tempfile.TemporaryDirectory() as pdf_dir:
+        for size in args.sizes:
+            results.extend(run_size(pdf_dir, size, *SIZES[size], args.repeats))
+        if args.sessions:
+            results.extend(run_test_day(pdf_dir, args.sessions, *SIZES["large"], args.workers))
+
+    for result in results:
+        print(", ".join(
+            f"{k}={v:.3f}" if isinstance(v, float) else f"{k}={v}" for k, v in result.items() if v != ""
+        ))
+    if not all(result["correct"] for result in results):
+        raise SystemExit("Some parse results were not correct")
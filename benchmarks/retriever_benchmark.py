@@ -0,0 +1,84 @@
+import os
+import time
+import argparse
+import tempfile
+from typing import Dict, List
+
+from utils.PdfCache import PdfCache
+from utils.ProbeCache import ProbeCache
+from utils.RateLimiter import RateLimiter
+from utils.Retriever import PdfRetriever
+from utils.Transport import FileTransport
+
+
+def make_fixtures(root: str, category: str, year: int, race: str, sessions: List[str], file_size: int) -> None:
+    """
+    Write a recorded website for one event: a Classification page and an Analysis PDF for each session.
+
+    :param root: The fixture directory.
+    :param category: The racing class.
+    :param year: The year of the event.
+    :param race: The race 3-letter code.
+    :param sessions: The session codes.
+    :param file_size: The number of bytes in each Analysis PDF.
+    """
+    for sess in sessions:
+        page = os.path.join(root, "www.motogp.com", "en", "gp-results", str(year), race, category, sess)
+        os.makedirs(page, exist_ok=True)
+        with open(os.path.join(page, "Classification"), "wb") as out_file:
+            out_file.write(b"<html></html>")
+        pdf_dir = os.path.join(root, "resources.motogp.com", "files", "results", str(year), race, category, sess)
+        os.makedirs(pdf_dir, exist_ok=True)
+        with open(os.path.join(pdf_dir, "Analysis.pdf"), "wb") as out_file:
+            out_file.write(os.urandom(file_size))
+
+
+def run(fixtures: str, sessions: List[str], workers: int, latency: float, failure_rate: float, rate: float) \
+        -> Dict[str, float]:
+    """
+    Time a cold and then a warm load of an event with a fresh cache.
+
+    :param fixtures: The fixture directory.
+    :param sessions: The session codes to load.
+    :param workers: The retriever's max_workers.
+    :param latency: The latency of each request in seconds.
+    :param failure_rate: The fraction of requests that fail.
+    :param rate: The requests per second allowed by the rate limiter, the burst is the same number of requests.
+    :return: The timings, request counts and bytes transferred.
+    """
+    PdfRetriever.probe_cache = ProbeCache()
+    PdfRetriever.rate_limiter = RateLimiter(default_rate=rate, default_burst=max(1, int(rate)))
+    transport = FileTransport(fixtures, latency=latency, latency_jitter=latency / 2, failure_rate=failure_rate)
+    with tempfile.TemporaryDirectory() as cache_dir:
+        retriever = PdfRetriever(max_workers=workers, cache=PdfCache(root=cache_dir), transport=transport)
+        out = dict()
+        for run_name in ("cold", "warm"):
+            requests_before = transport.request_count
+            start = time.perf_counter()
+            retriever.check_sessions_exist("MotoGP", 2024, "TST", sessions)
+            files = retriever.retrieve_practice_files("MotoGP", 2024, "TST", sessions)
+            out[f"{run_name}_seconds"] = time.perf_counter() - start
+            out[f"{run_name}_requests"] = transport.request_count - requests_before
+            out[f"{run_name}_files"] = len(files)
+        out["bytes_served"] = transport.bytes_served
+    return out
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Measure session retrieval against a local recorded website.")
+    arg_parser.add_argument("--sessions", type=int, default=9, help="Number of sessions in the event.")
+    arg_parser.add_argument("--file-size", type=int, default=400 * 1024, help="Bytes per Analysis PDF.")
+    arg_parser.add_argument("--latency", type=float, default=0.1, help="Seconds of latency per request.")
+    arg_parser.add_argument("--failure-rate", type=float, default=0.0, help="Fraction of requests that fail.")
+    arg_parser.add_argument("--rate", type=float, default=1000.0, help="Requests per second allowed per host.")
+    arg_parser.add_argument("--workers", type=int, nargs="*", default=[1, 2, 4, 8], help="max_workers to compare.")
+    args = arg_parser.parse_args()
+
+    session_codes = [f"FP{i + 1}" for i in range(args.sessions)]
+    with tempfile.TemporaryDirectory() as fixture_dir:
+        make_fixtures(fixture_dir, "MotoGP", 2024, "TST", session_codes, args.file_size)
+        for n_workers in args.workers:
+            result = run(fixture_dir, session_codes, n_workers, args.latency, args.failure_rate, args.rate)
+            print(f"workers={n_workers}: " + ", ".join(
+                f"{k}={v:.3f}" if isinstance(v, float) else f"{k}={v}" for k, v in result.items()
+            ))
@@ -0,0 +1,147 @@
+import time
+import argparse
+from typing import Callable, Dict, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+from fp_analysis.Metrics import MetricsCalculator, PairwiseMetrics
+from utils.DataWrangler import DataWrangler
+
+
+def make_laps(riders: int, sessions: int, laps: int, seed: int = 0) -> pd.DataFrame:
+    """
+    Make a long format lap table like PdfParser.parse_laps, each rider with their own pace and consistency, with the lap
+    times to the millisecond like in the PDFs.
+
+    :param riders: The number of riders.
+    :param sessions: The number of sessions.
+    :param laps: The number of laps of each rider in each session.
+    :param seed: The random seed.
+    :return: The dataframe with the Rider, Session and LapTime columns.
+    """
+    rng = np.random.default_rng(seed)
+    names = [f"Rider {i + 1} SURNAME{i + 1}" for i in range(riders)]
+    pace = rng.uniform(95.0, 98.0, riders)
+    spread = rng.uniform(0.2, 1.0, riders)
+    lap_times = rng.normal(pace, spread, (sessions, laps, riders))
+    return pd.DataFrame({
+        "Rider": pd.Categorical(np.tile(names, sessions * laps), categories=names),
+        "Session": pd.Categorical(np.repeat([f"FP{i + 1}" for i in range(sessions)], laps * riders)),
+        "LapTime": lap_times.ravel().round(3).astype(np.float32),
+    })
+
+
+def loop_matrix(df: pd.DataFrame, low_bin: float, high_bin: float, bin_num: int) -> pd.DataFrame:
+    """
+    The heatmap matrix worked out as it used to be: a relative frequency histogram per rider, then the coefficient of
+    every ordered pair in a double loop.
+    """
+    metrics = MetricsCalculator()
+    rel_freqs = dict()
+    for rider, values in df.groupby("Rider", observed=True, sort=False)["LapTime"]:
+        # numpy bins float32 values with float32 edges, so compare in float64 as the matrix form does
+        values = values.to_numpy(dtype=np.float64)
+        rel_freqs[rider] = metrics.relative_frequency_histogram(values, (low_bin, high_bin), bin_num)[0]
+    rows = list()
+    for rider_a, p in rel_freqs.items():
+        rows.append([
+            0 if rider_a == rider_b else metrics.calculate_bhattacharyya_coefficient(p, q)
+            for rider_b, q in rel_freqs.items()
+        ])
+    return pd.DataFrame(rows, index=pd.Index(list(rel_freqs), name="Rider"), columns=list(rel_freqs))
+
+
+def best_of(func: Callable[[], pd.DataFrame], repeats: int) -> Tuple[pd.DataFrame, float]:
+    """A helper to time the fastest of a number of runs."""
+    out, fastest = None, np.inf
+    for _ in range(repeats):
+        start = time.perf_counter()
+        out = func()
+        fastest = min(fastest, time.perf_counter() - start)
+    return out, fastest
+
+
+def run(riders: int, sessions: int, laps: int, bin_width: float, repeats: int) -> List[Dict[str, object]]:
+    """
+    Time the loop and the matrix form of the heatmap on one dataset and check they agree, then time binning the laps
+    and working out each of the other metrics. Last, time moving the tolerance and bin width as on the practice page,
+    binning the laps again each time against reading the bins from a histogram index.
+
+    :param riders: The number of riders.
+    :param sessions: The number of sessions.
+    :param laps: The number of laps of each rider in each session.
+    :param bin_width: The width of each bin in seconds.
+    :param repeats: The number of timed runs, the fastest is kept.
+    :return: A row of results for each method.
+    """
+    df = make_laps(riders, sessions, laps)
+    low_bin = float(df["LapTime"].min()) - 0.1
+    high_bin = float(df["LapTime"].min()) * 1.07 + 0.1
+    bin_num = int(np.ceil(high_bin - low_bin) / bin_width)
+    data_wrangler = DataWrangler.__new__(DataWrangler)  # only the metrics are needed, not a retriever or a cache
+    data_wrangler.metrics_calculator = MetricsCalculator()
+
+    expected, loop_seconds = best_of(lambda: loop_matrix(df, low_bin, high_bin, bin_num), repeats)
+    out, matrix_seconds = best_of(lambda: data_wrangler.bhattacharyya_matrix(df, low_bin, high_bin, bin_num), repeats)
+    correct = list(out.index) == list(expected.index) and np.allclose(out.to_numpy(), expected.to_numpy())
+    size = f"{riders}x{sessions}x{laps}"
+    rows = [
+        {"size": size, "method": "loop", "laps": len(df), "bins": bin_num, "seconds": loop_seconds, "correct": True},
+        {"size": size, "method": "matrix", "laps": len(df), "bins": bin_num, "seconds": matrix_seconds,
+         "speed_up": loop_seconds / matrix_seconds, "correct": correct},
+    ]
+
+    pairwise, bin_seconds = best_of(lambda: data_wrangler.pairwise_metrics(df, low_bin, high_bin, bin_num), repeats)
+    rows.append({"size": size, "method": "bin_once", "laps": len(df), "bins": bin_num, "seconds": bin_seconds,
+                 "correct": True})
+    for metric in PairwiseMetrics.metrics:
+        # a fresh copy each run, so the matrix is worked out rather than read back
+        matrix, seconds = best_of(
+            lambda: PairwiseMetrics(pairwise.labels, pairwise.frequencies, pairwise.samples).matrix(metric), repeats
+        )
+        rows.append({"size": size, "method": metric, "laps": len(df), "bins": bin_num, "seconds": seconds,
+                     "correct": bool(np.allclose(matrix, matrix.T, equal_nan=True))})
+
+    fastest = float(df["LapTime"].min())
+    settings = [(tolerance, width) for tolerance in (3.0, 5.0, 7.0, 10.0) for width in (0.1, 0.25, 0.5)]
+    index, index_seconds = best_of(lambda: data_wrangler.histogram_index(df), repeats)
+    rows.append({"size": size, "method": "index_build", "laps": len(df), "bins": "", "seconds": index_seconds,
+                 "correct": True})
+    rebin_seconds, derive_seconds, correct = 0.0, 0.0, True
+    for tolerance, width in settings:
+        edges = index.bin_edges(fastest - 0.1, fastest * (1 + tolerance / 100) + 0.1, width)
+        rebinned, seconds = best_of(lambda: data_wrangler.metric_matrix(
+            data_wrangler.pairwise_metrics(df, edges[0], edges[-1], len(edges) - 1), PairwiseMetrics.BHATTACHARYYA
+        ), repeats)
+        rebin_seconds += seconds
+        derived, seconds = best_of(lambda: data_wrangler.metric_matrix(
+            index.pairwise_metrics(edges[0], edges[-1], width), PairwiseMetrics.BHATTACHARYYA
+        ), repeats)
+        derive_seconds += seconds
+        # the edges are whole milliseconds, so only a lap right on an edge could be binned differently by the two
+        correct = correct and np.allclose(rebinned.to_numpy(), derived.to_numpy(), atol=1 / laps)
+    rows.append({"size": size, "method": "rebin_per_setting", "laps": len(df), "bins": "",
+                 "seconds": rebin_seconds / len(settings), "correct": True})
+    rows.append({"size": size, "method": "index_per_setting", "laps": len(df), "bins": "",
+                 "seconds": derive_seconds / len(settings), "speed_up": rebin_seconds / derive_seconds,
+                 "correct": bool(correct)})
+    return rows
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Measure the rider similarity metrics of a practice weekend.")
+    arg_parser.add_argument("--riders", type=int, default=30, help="Number of riders.")
+    arg_parser.add_argument("--sessions", type=int, default=9, help="Number of sessions.")
+    arg_parser.add_argument("--laps", type=int, default=20, help="Laps of each rider in each session.")
+    arg_parser.add_argument("--bin-width", type=float, default=0.25, help="Width of each bin in seconds.")
+    arg_parser.add_argument("--repeats", type=int, default=5, help="Timed runs of each method, the fastest is kept.")
+    args = arg_parser.parse_args()
+
+    results = run(args.riders, args.sessions, args.laps, args.bin_width, args.repeats)
+    for result in results:
+        print(", ".join(
+            f"{k}={v:.4f}" if isinstance(v, float) else f"{k}={v}" for k, v in result.items() if v != ""
+        ))
+    if not all(result["correct"] for result in results):
+        raise SystemExit("Some similarity results were not correct")
@@ -0,0 +1,394 @@
+import os
+import math
+import random
+import argparse
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+import fitz
+
+from utils.Parser import LapRecord
+from utils.Retriever import PdfRetriever
+
+FIRST_NAMES = ["Marco", "Fabio", "Jorge", "Alex", "Pedro", "Johann", "Franco", "Enea", "Raul", "Joan", "Luca", "Brad"]
+SURNAME_SYLLABLES = ["MAR", "TI", "NEZ", "BAS", "TIA", "NI", "QUAR", "TA", "RO", "VI", "ZAR", "CO", "DI", "GIAN"]
+NATIONS = ["ESP", "ITA", "FRA", "POR", "AUS", "RSA", "JPN", "THA", "GER", "USA"]
+TEAMS = [
+    "Ducati Lenovo Team", "Red Bull KTM Factory Racing", "Liqui Moly Husqvarna Intact GP", "LCR Honda CASTROL",
+    "Monster Energy Yamaha MotoGP", "Aprilia Racing", "Gresini Racing MotoGP", "Prima Pramac Racing"
+]
+RACE_POINTS = [25, 20, 16, 13, 11, 10, 9, 8, 7, 6, 5, 4, 3, 2, 1]
+
+# x-coordinates of the Analysis lap table columns and the pit entry marker, A4 points
+ANALYSIS_COLUMNS = [("Time", 40), ("Lap", 95), ("T1", 150), ("T2", 200), ("T3", 250), ("T4", 300), ("Speed", 350)]
+PIT_MARKER_X = 115
+CLASSIFICATION_COLUMNS = [
+    ("Pos.", 30), ("Num", 55), ("Rider", 80), ("Nation", 190), ("Team", 225), ("Motorcycle", 345), ("Time", 405),
+    ("Lap", 450), ("Total Lap", 470), ("Km/h", 505), ("Gap 1st/Prev.", 540)
+]
+RACE_COLUMNS = [
+    ("Pos.", 30), ("Points", 55), ("Num", 82), ("Rider", 112), ("Nation", 215), ("Team", 250), ("Motorcycle", 370),
+    ("Km/h", 425), ("Time", 460), ("Gap", 520)
+]
+PAGE_WIDTH, PAGE_HEIGHT = 595, 842
+FONT_SIZE = 7
+
+
+class Rider(NamedTuple):
+    """
+    A made up rider.
+    """
+    name: str
+    number: int
+    nation: str
+    team: str
+
+
+def make_riders(count: int, seed: int = 0) -> List[Rider]:
+    """
+    Make up a field of riders with unique names in the website's style, a first name and an upper case surname.
+
+    :param count: The number of riders.
+    :param seed: The seed of the random names.
+    :return: The riders.
+    """
+    rnd = random.Random(seed)
+    riders = list()
+    names = set()
+    while len(riders) < count:
+        name = f"{rnd.choice(FIRST_NAMES)} {''.join(rnd.sample(SURNAME_SYLLABLES, 3))}"
+        if name in names:
+            continue
+        names.add(name)
+        riders.append(Rider(name, len(riders) + 2, rnd.choice(NATIONS), TEAMS[len(riders) % len(TEAMS)]))
+    return riders
+
+
+def ordinal(position: int) -> str:
+    """A helper to write a position as 1st, 2nd, 3rd, 4th, ..."""
+    suffix = "th" if position % 100 in (11, 12, 13) else {1: "st", 2: "nd", 3: "rd"}.get(position % 10, "th")
+    return f"{position}{suffix}"
+
+
+def format_lap_time(milliseconds: int) -> str:
+    """A helper to write a lap time in milliseconds as m'ss.000."""
+    return f"{milliseconds // 60000}'{milliseconds % 60000 / 1000:06.3f}"
+
+
+def format_race_time(milliseconds: int) -> str:
+    """A helper to write a race time in milliseconds as mm'ss.000, or h:mm'ss.000 for an hour or more."""
+    hours, rest = divmod(milliseconds, 3600000)
+    return f"{hours}:{format_lap_time(rest).zfill(9)}" if hours else format_lap_time(rest)
+
+
+class _Writer:
+    """
+    A helper to write rows of text onto pages, starting a new page when one is full. The text of a page is gathered in
+    a TextWriter and written in one go, which is far quicker than inserting each cell.
+    """
+    def __init__(self, doc: fitz.Document, title: str, row_height: float = 11.0, bottom: float = 790.0):
+        self.doc = doc
+        self.title = title
+        self.row_height = row_height
+        self.bottom = bottom
+        self.page: Optional[fitz.Page] = None
+        self.text: Optional[fitz.TextWriter] = None
+        self.font = fitz.Font("helv")
+        self.y = math.inf
+
+    def new_page(self) -> None:
+        """Finish the current page and start a new one with the title at the top."""
+        self.finish()
+        self.page = self.doc.new_page(width=PAGE_WIDTH, height=PAGE_HEIGHT)
+        self.text = fitz.TextWriter(self.page.rect)
+        self.insert((40, 25), self.title, fontsize=8)
+        self.y = 45.0
+
+    def insert(self, point: Tuple[float, float], text: str, fontsize: float = FONT_SIZE) -> None:
+        """Add a cell of text to the current page, with its baseline starting at the point."""
+        self.text.append(point, text, font=self.font, fontsize=fontsize)
+
+    def finish(self) -> None:
+        """Write the text gathered for the current page onto it."""
+        if self.page is not None and self.text is not None:
+            self.text.write_text(self.page)
+            self.text = None
+
+    def row(self, cells: List[Tuple[float, str]], space: float = 0.0) -> None:
+        """
+        Write a row of cells, each at its x-coordinate, in the order given.
+
+        :param cells: The (x-coordinate, text) of each cell.
+        :param space: The extra space above the row.
+        """
+        if self.y + space + self.row_height > self.bottom:
+            self.new_page()
+        self.y += space + self.row_height
+        for x, text in cells:
+            self.insert((x, self.y), text)
+
+
+def write_analysis_pdf(
+        path: str,
+        riders: List[Rider],
+        stints: int = 3,
+        laps_per_stint: int = 8,
+        unfinished_rate: float = 0.05,
+        base_lap_time: float = 100.0,
+        missing_sector_rate: float = 0.0,
+        seed: int = 0) -> List[LapRecord]:
+    """
+    Write an Analysis PDF: for each rider a row naming them, the number of runs and the headings of their lap table,
+    then a row for every lap with the lap time, lap number, a pit entry marker on the last lap of every stint but the
+    last, the four sector times and the top speed. Some laps are unfinished, and the rest of that stint is not used.
+    Some sector cells can be left empty, as on a lap where a timing loop missed the rider.
+
+    :param path: The file to write.
+    :param riders: The riders, in the order of the session's classification.
+    :param stints: The number of stints of each rider.
+    :param laps_per_stint: The number of laps in each stint.
+    :param unfinished_rate: The chance of a lap other than a pit in lap being unfinished.
+    :param base_lap_time: The lap time, in seconds, the made up lap times are spread around.
+    :param missing_sector_rate: The chance of each sector cell of a finished lap being empty.
+    :param seed: The seed of the random lap times.
+    :return: The laps the parser should read, as PdfParser.iter_lap_records returns them.
+    """
+    rnd = random.Random(seed)
+    doc = fitz.open()
+    writer = _Writer(doc, "Circuit Information   Analysis   Lap times and sector times")
+    expected = list()
+    for position, rider in enumerate(riders, start=1):
+        # the team is written before the rider, the name follows the nation and the position follows the name
+        writer.row([(250, rider.team), (40, rider.nation), (70, rider.name), (520, ordinal(position))], space=8)
+        writer.row([(40, f"Runs={stints}"), (150, f"Total laps={stints * laps_per_stint}")])
+        writer.row([(x, heading) for heading, x in ANALYSIS_COLUMNS])
+        lap_number = 1
+        for stint in range(1, stints + 1):
+            unfinished = False
+            for lap_in_stint in range(laps_per_stint):
+                pit_in = lap_in_stint == laps_per_stint - 1 and stint < stints
+                lap_ms = int(round((base_lap_time + rnd.uniform(-2, 6) + (5 if lap_in_stint == 0 else 0)) * 1000))
+                if not pit_in and rnd.random() < unfinished_rate:
+                    writer.row([(40, "unfinished"), (95, str(lap_number)), (150, f"{lap_ms / 4000:.3f}")])
+                    if not unfinished:
+                        expected.append(LapRecord(rider.name, stint, lap_number, math.nan, False, True))
+                    unfinished = True
+                    lap_number += 1
+                    continue
+                shares = [rnd.uniform(0.9, 1.1) for _ in range(4)]
+                sector_ms = [int(lap_ms * share / sum(shares)) for share in shares[:3]]
+                sector_ms.append(lap_ms - sum(sector_ms))
+                speed = round(rnd.uniform(280, 345), 1)
+                cells = [(40, format_lap_time(lap_ms)), (95, str(lap_number))]
+                if pit_in:
+                    cells.append((PIT_MARKER_X, "P"))
+                # only draw from the generator when asked to, so the other PDFs stay the same for a seed
+                sectors = tuple(
+                    math.nan if missing_sector_rate and rnd.random() < missing_sector_rate else ms / 1000
+                    for ms in sector_ms
+                )
+                cells.extend(
+                    (x, f"{sector:.3f}") for (_, x), sector in zip(ANALYSIS_COLUMNS[2:6], sectors)
+                    if not math.isnan(sector)
+                )
+                cells.append((ANALYSIS_COLUMNS[6][1], f"{speed:.1f}"))
+                writer.row(cells)
+                if not unfinished:
+                    expected.append(LapRecord(
+                        rider.name, stint, lap_number, round(lap_ms / 1000, 3), pit_in, False, sectors, speed
+                    ))
+                lap_number += 1
+    writer.finish()
+    doc.save(path)
+    doc.close()
+    return expected
+
+
+def best_laps(laps: List[LapRecord]) -> Dict[str, float]:
+    """
+    Find the best lap of each rider, as a session Classification shows it.
+
+    :param laps: The laps of a session.
+    :return: The best lap time of each rider with a finished lap, fastest first.
+    """
+    best = dict()
+    for lap in laps:
+        if not lap.unfinished and (lap.rider not in best or lap.lap_time < best[lap.rider]):
+            best[lap.rider] = lap.lap_time
+    return dict(sorted(best.items(), key=lambda item: item[1]))
+
+
+def write_classification_pdf(path: str, riders: List[Rider], best: Dict[str, float]) -> None:
+    """
+    Write a practice session Classification PDF: one page with a row for every rider, fastest first, and the riders
+    without a lap time at the bottom.
+
+    :param path: The file to write.
+    :param riders: The riders of the session.
+    :param best: The best lap time of each rider, see best_laps.
+    """
+    doc = fitz.open()
+    writer = _Writer(doc, "Circuit Information   Free Practice   Classification", row_height=14)
+    writer.row([(x, heading) for heading, x in CLASSIFICATION_COLUMNS])
+    by_name = {rider.name: rider for rider in riders}
+    fastest = next(iter(best.values()), 0.0)
+    previous = fastest
+    order = list(best) + [rider.name for rider in riders if rider.name not in best]
+    for position, name in enumerate(order, start=1):
+        rider = by_name[name]
+        cells = [(55, str(rider.number)), (80, rider.name), (190, rider.nation), (225, rider.team), (345, "Ducati")]
+        if name in best:
+            lap_time = best[name]
+            cells = [(30, str(position))] + cells + [
+                (405, format_lap_time(int(round(lap_time * 1000)))), (450, "5"), (470, "20"), (505, "301.2")
+            ]
+            if position > 1:
+                cells.append((540, f"{lap_time - fastest:.3f} / {lap_time - previous:.3f}"))
+            previous = lap_time
+        writer.row(cells)
+    writer.row([(30, "Fastest Lap: " + next(iter(best), "") + " Record Lap: 1'30.000")], space=20)
+    writer.finish()
+    doc.save(path)
+    doc.close()
+
+
+class RaceResult(NamedTuple):
+    """
+    A row of a made up race Classification.
+    """
+    position: Optional[int]  # None if not classified
+    rider: Rider
+    time: float  # the race time in seconds, NaN if lapped or not classified
+    points: float
+
+
+def write_race_classification_pdf(
+        path: str,
+        riders: List[Rider],
+        lapped: int = 2,
+        not_classified: int = 3,
+        race_time: float = 2465.0,
+        rows_per_page: int = 14,
+        seed: int = 0) -> List[RaceResult]:
+    """
+    Write a race Classification PDF: the classified riders with their points and race time, the lapped riders, then
+    the riders who were not classified under a label. The table continues over pages with the headings repeated, and
+    every page has lines above and below the table.
+
+    :param path: The file to write.
+    :param riders: The riders, in finishing order.
+    :param lapped: The number of classified riders a lap down.
+    :param not_classified: The number of riders who did not finish.
+    :param race_time: The winner's race time in seconds.
+    :param rows_per_page: The number of table rows on each page.
+    :param seed: The seed of the random gaps.
+    :return: The rows the parser should read, as PdfParser.parse_race_classification_pdf returns them.
+    """
+    rnd = random.Random(seed)
+    doc = fitz.open()
+    writer = _Writer(doc, "Grand Prix   Race Classification", row_height=14, bottom=780)
+    classified = len(riders) - not_classified
+    expected = list()
+    rows = riders[:classified] + [None] + riders[classified:]
+    rows_on_page = rows_per_page
+    time_ms = int(race_time * 1000)
+    for i, rider in enumerate(rows):
+        if rows_on_page == rows_per_page:
+            if writer.page is not None:
+                writer.insert((30, 800), "Fastest Lap: 1'39.123 Lap 5 160.1 Km/h")
+                writer.insert((30, 812), "Circuit Record Lap: 1'38.000")
+            writer.new_page()
+            writer.insert((40, 38), "Circuit length 4.6 km   Rider lap record 1'38.000")
+            writer.row([(x, heading) for heading, x in RACE_COLUMNS], space=10)
+            rows_on_page = 0
+        rows_on_page += 1
+        if rider is None:
+            writer.row([(112, "Not classified")])
+            continue
+        # the cells are written in the order the website's sheets give their text: the gap, points and speed come
+        # before the race time, which ends the row
+        cells = [(82, str(rider.number)), (112, rider.name), (215, rider.nation), (250, rider.team), (370, "Ducati")]
+        if i < classified:
+            position = i + 1
+            points = RACE_POINTS[i] if i < len(RACE_POINTS) else 0
+            cells.insert(0, (30, str(position)))
+            if i < classified - lapped:
+                if i:
+                    cells.append((520, f"{(time_ms - int(race_time * 1000)) / 1000:.3f}"))
+                cells.extend(([(55, str(points))] if points else []) + [(425, "160.2")])
+                cells.append((460, format_race_time(time_ms)))
+                expected.append(RaceResult(position, rider, time_ms / 1000, float(points)))
+                time_ms += rnd.randint(100, 3000)
+            else:
+                cells.extend([(520, "1 Lap")] + ([(55, str(points))] if points else []) + [(425, "160.2")])
+                expected.append(RaceResult(position, rider, math.nan, float(points)))
+        else:
+            cells.extend([(520, f"{rnd.randint(2, 20)} Laps"), (425, "160.2")])
+            expected.append(RaceResult(None, rider, math.nan, 0.0))
+        writer.row(cells)
+    writer.insert((30, 800), "Fastest Lap: 1'39.123 Lap 5 160.1 Km/h")
+    writer.finish()
+    doc.save(path)
+    doc.close()
+    return expected
+
+
+def write_test_day(
+        root: str,
+        category: str,
+        year: int,
+        race: str,
+        sessions: List[str],
+        riders: int = 25,
+        stints: int = 3,
+        laps_per_stint: int = 8,
+        unfinished_rate: float = 0.05,
+        seed: int = 0) -> Dict[str, Tuple[str, str, List[LapRecord]]]:
+    """
+    Write the Analysis and Classification PDFs of each session of an event, named as PdfRetriever saves them.
+
+    :param root: The directory to write to.
+    :param category: The racing class.
+    :param year: The year of the event.
+    :param race: The race 3-letter code.
+    :param sessions: The session codes.
+    :param riders: The number of riders.
+    :param stints: The number of stints of each rider in each session.
+    :param laps_per_stint: The number of laps in each stint.
+    :param unfinished_rate: The chance of a lap being unfinished.
+    :param seed: The seed of the made up data.
+    :return: The (Analysis file, Classification file, expected laps) of each session.
+    """
+    os.makedirs(root, exist_ok=True)
+    field = make_riders(riders, seed)
+    out = dict()
+    for i, sess in enumerate(sessions):
+        analysis = os.path.join(root, f"{category}-{year}_{race}_{sess}.pdf")
+        classification = os.path.join(root, f"{category}-{year}_{race}_{PdfRetriever.CLASSIFICATION}_{sess}.pdf")
+        laps = write_analysis_pdf(
+            analysis, field, stints, laps_per_stint, unfinished_rate, seed=seed * 1000 + i
+        )
+        write_classification_pdf(classification, field, best_laps(laps))
+        out[sess] = (analysis, classification, laps)
+    return out
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(description="Write synthetic Analysis and Classification PDFs.")
+    arg_parser.add_argument("out_dir", help="The directory to write to.")
+    arg_parser.add_argument("--sessions", type=int, default=3, help="Number of practice sessions.")
+    arg_parser.add_argument("--riders", type=int, default=25, help="Number of riders.")
+    arg_parser.add_argument("--stints", type=int, default=3, help="Stints per rider per session.")
+    arg_parser.add_argument("--laps", type=int, default=8, help="Laps per stint.")
+    arg_parser.add_argument("--unfinished-rate", type=float, default=0.05, help="Chance of an unfinished lap.")
+    arg_parser.add_argument("--seed", type=int, default=0, help="Seed of the made up data.")
+    args = arg_parser.parse_args()
+
+    written = write_test_day(
+        args.out_dir, "MotoGP", 2024, "TST", [f"FP{i + 1}" for i in range(args.sessions)], args.riders, args.stints,
+        args.laps, args.unfinished_rate, args.seed
+    )
+    race_file = os.path.join(args.out_dir, "2024_TST_MotoGP_RAC_Classification.pdf")
+    write_race_classification_pdf(race_file, make_riders(args.riders, args.seed), seed=args.seed)
+    for sess, (analysis_file, classification_file, session_laps) in written.items():
+        print(f"{sess}: {analysis_file} ({len(session_laps)} laps), {classification_file}")
+    print(f"RAC: {race_file}")
@@ -3,9 +3,9 @@ import matplotlib.pyplot as plt
 
 from sklearn.neighbors import KernelDensity
 # from sklearn.cluster import HDBSCAN
-from scipy.special import kl_div, softmax
+from scipy.special import entr, kl_div, softmax
 from scipy import stats
-from typing import Tuple
+from typing import Dict, List, Tuple
 
 
 class MetricsCalculator:
@@ -73,6 +73,128 @@ class MetricsCalculator:
             numbins=num_of_bins
         )
 
+    @staticmethod
+    def relative_frequency_matrix(
+            arr: np.ndarray, groups: np.ndarray, num_of_groups: int, bin_bounds: Tuple, num_of_bins: int) -> np.ndarray:
+        """
+        Create the relative frequency histogram of many datasets at once, the same as relative_frequency_histogram for
+        each of them: values outside the bin bounds are not counted in a bin but do count towards the total.
+
+        :param arr: The values of every dataset.
+        :param groups: The dataset of each value, from 0 to num_of_groups - 1.
+        :param num_of_groups: The number of datasets.
+        :param bin_bounds: The lower and upper bound of the bins.
+        :param num_of_bins: The number of bins.
+        :return: A matrix with a row of bin frequencies for each dataset.
+        """
+        arr = np.asarray(arr, dtype=np.float64)
+        groups = np.asarray(groups, dtype=np.int64)
+        bin_edges = np.linspace(bin_bounds[0], bin_bounds[1], num_of_bins + 1)
+        # the same bins as numpy's histogram, the last bin includes its upper edge
+        bins = np.searchsorted(bin_edges, arr, side="right") - 1
+        bins[arr == bin_edges[-1]] = num_of_bins - 1
+        in_range = (bins >= 0) & (bins < num_of_bins)
+        counts = np.bincount(
+            groups[in_range] * num_of_bins + bins[in_range], minlength=num_of_groups * num_of_bins
+        ).reshape(num_of_groups, num_of_bins)
+        totals = np.bincount(groups, minlength=num_of_groups)
+        return counts / np.maximum(totals, 1)[:, np.newaxis]
+
+    @staticmethod
+    def bhattacharyya_coefficient_matrix(frequencies: np.ndarray) -> np.ndarray:
+        """
+        This finds the coefficient for every pair of distributions at once, as a single matrix product of the square
+        roots of their relative frequencies. See calculate_bhattacharyya_coefficient.
+
+        :param frequencies: A row of relative frequencies for each distribution, all with the same bins.
+        :return: The symmetric matrix of Bhattacharyya coefficients.
+        """
+        root_frequencies = np.sqrt(frequencies)
+        return root_frequencies @ root_frequencies.T
+
+    @staticmethod
+    def normalise_frequencies(frequencies: np.ndarray) -> np.ndarray:
+        """
+        Scale each row of relative frequencies to sum to 1, so the laps outside the bins are left out. A row with
+        nothing in the bins becomes NaN.
+
+        :param frequencies: A row of relative frequencies for each distribution.
+        :return: The normalised frequencies.
+        """
+        totals = frequencies.sum(axis=1, keepdims=True)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(totals > 0, frequencies / totals, np.nan)
+
+    def hellinger_distance_matrix(self, frequencies: np.ndarray) -> np.ndarray:
+        """
+        This finds the Hellinger distance, sqrt(1 - BC), between every pair of distributions from the Bhattacharyya
+        coefficients of their normalised frequencies. It goes from 0 for the same distribution to 1 for no overlap.
+
+        :param frequencies: A row of relative frequencies for each distribution, all with the same bins.
+        :return: The symmetric matrix of Hellinger distances.
+        """
+        coefficients = self.bhattacharyya_coefficient_matrix(self.normalise_frequencies(frequencies))
+        return np.sqrt(np.clip(1 - coefficients, 0, 1))
+
+    def symmetric_kl_divergence_matrix(self, frequencies: np.ndarray, epsilon: float = 1e-6) -> np.ndarray:
+        """
+        This finds KL(P||Q) + KL(Q||P) between every pair of distributions. The sum is (p - q)(log p - log q) over the
+        bins, which expands into matrix products. An empty bin would make it infinite, so epsilon is added to every bin
+        before normalising.
+
+        :param frequencies: A row of relative frequencies for each distribution, all with the same bins.
+        :param epsilon: The relative frequency added to every bin.
+        :return: The symmetric matrix of divergences in nats.
+        """
+        p = self.normalise_frequencies(frequencies + epsilon)
+        log_p = np.log(p)
+        self_terms = np.sum(p * log_p, axis=1)
+        cross_terms = p @ log_p.T
+        return np.maximum(self_terms[:, np.newaxis] + self_terms[np.newaxis, :] - cross_terms - cross_terms.T, 0)
+
+    def jensen_shannon_divergence_matrix(self, frequencies: np.ndarray) -> np.ndarray:
+        """
+        This finds the Jensen-Shannon divergence, H(M) - (H(P) + H(Q)) / 2 with M the average of P and Q, between every
+        pair of distributions. Empty bins need no smoothing. It is in bits, so goes from 0 to 1.
+
+        :param frequencies: A row of relative frequencies for each distribution, all with the same bins.
+        :return: The symmetric matrix of divergences.
+        """
+        p = self.normalise_frequencies(frequencies)
+        entropy = entr(p).sum(axis=1)
+        mixture_entropy = entr((p[:, np.newaxis, :] + p[np.newaxis, :, :]) / 2).sum(axis=2)
+        return np.maximum(mixture_entropy - (entropy[:, np.newaxis] + entropy[np.newaxis, :]) / 2, 0) / np.log(2)
+
+    @staticmethod
+    def wasserstein_distance_matrix(samples: List[np.ndarray]) -> np.ndarray:
+        """
+        This finds the 1-D Wasserstein (earth mover's) distance between every pair of samples, the area between their
+        quantile functions. Every sample's quantile function is read on the same steps of cumulative probability, so
+        the distances need no binning and are the same as stats.wasserstein_distance.
+
+        :param samples: The sorted values of each sample.
+        :return: The symmetric matrix of distances, in the units of the values, NaN for an empty sample.
+        """
+        n_samples = len(samples)
+        counts = np.array([len(sample) for sample in samples], dtype=np.int64)
+        out = np.full((n_samples, n_samples), np.nan)
+        filled = np.flatnonzero(counts)
+        if not len(filled):
+            return out
+        # the quantile function of a sample of n values steps at k / n, so these are every step of every sample
+        steps = np.unique(np.concatenate([np.arange(count + 1) / count for count in np.unique(counts[filled])]))
+        widths = np.diff(steps)
+        middles = (steps[:-1] + steps[1:]) / 2
+
+        padded = np.zeros((len(filled), counts.max()))
+        for row, i in enumerate(filled):
+            padded[row, :counts[i]] = samples[i]
+        index = np.ceil(middles[np.newaxis, :] * counts[filled, np.newaxis]).astype(np.int64) - 1
+        quantiles = np.take_along_axis(padded, index, axis=1)
+        for row, i in enumerate(filled):
+            out[i, filled] = np.abs(quantiles - quantiles[row]) @ widths
+        return out
+
     # def cluster(self, X: np.ndarray):
     #     """Wrapper around Scikit-Learn HDBSCAN."""
     #     fig, axes = plt.subplots(3, 1, figsize=(10, 12))
@@ -123,3 +245,159 @@ class MetricsCalculator:
             title += f" | {parameters_str}"
         ax.set_title(title)
         plt.tight_layout()
+
+
+class PairwiseMetrics:
+    """
+    The distances between the lap times of every pair of riders, for several metrics. The riders are binned once, and
+    each metric's matrix is worked out the first time it is asked for and kept, so switching metric does not bin the
+    laps again or work out the other metrics again.
+    """
+    BHATTACHARYYA = "Bhattacharyya coefficient"
+    HELLINGER = "Hellinger distance"
+    JENSEN_SHANNON = "Jensen-Shannon divergence"
+    SYMMETRIC_KL = "Symmetric KL divergence"
+    WASSERSTEIN = "Wasserstein distance"
+    metrics = (BHATTACHARYYA, HELLINGER, JENSEN_SHANNON, SYMMETRIC_KL, WASSERSTEIN)
+    similarities = (BHATTACHARYYA,)  # higher is more similar, for the rest lower is more similar
+
+    def __init__(self, labels: List[str], frequencies: np.ndarray, samples: List[np.ndarray]):
+        """
+        :param labels: The name of each rider.
+        :param frequencies: A row of relative frequencies for each rider, see relative_frequency_matrix.
+        :param samples: The sorted lap times of each rider, for the Wasserstein distance.
+        """
+        self.labels = list(labels)
+        self.frequencies = frequencies
+        self.samples = samples
+        self._calculator = MetricsCalculator()
+        self._matrices: Dict[str, np.ndarray] = dict()
+
+    def matrix(self, metric: str) -> np.ndarray:
+        """
+        Get the matrix of a metric, working it out on first use.
+
+        :param metric: One of metrics.
+        :return: The symmetric rider x rider matrix.
+        """
+        if metric not in self._matrices:
+            if metric == self.BHATTACHARYYA:
+                matrix = self._calculator.bhattacharyya_coefficient_matrix(self.frequencies)
+            elif metric == self.HELLINGER:
+                matrix = self._calculator.hellinger_distance_matrix(self.frequencies)
+            elif metric == self.JENSEN_SHANNON:
+                matrix = self._calculator.jensen_shannon_divergence_matrix(self.frequencies)
+            elif metric == self.SYMMETRIC_KL:
+                matrix = self._calculator.symmetric_kl_divergence_matrix(self.frequencies)
+            elif metric == self.WASSERSTEIN:
+                matrix = self._calculator.wasserstein_distance_matrix(self.samples)
+            else:
+                raise ValueError(f"Unknown metric {metric}")
+            self._matrices[metric] = matrix
+        return self._matrices[metric]
+
+
+class HistogramIndex:
+    """
+    A cumulative count of every rider's laps on a fine grid of lap times, built once for a set of laps. The relative
+    frequencies for any window of lap times and any bin width that is a multiple of the grid step come from differences
+    of the cumulative counts, so changing the tolerance or bin width does not go through the laps again.
+
+    The default step of 1 ms is the precision of the lap times in the PDFs, so the counts are exact.
+    """
+    def __init__(self, labels: List[str], lap_times: np.ndarray, groups: np.ndarray, step: float = 0.001):
+        """
+        :param labels: The name of each rider.
+        :param lap_times: The lap times in seconds of every rider.
+        :param groups: The rider of each lap time, from 0 to len(labels) - 1.
+        :param step: The grid step in seconds.
+        """
+        lap_times = np.asarray(lap_times, dtype=np.float64)
+        groups = np.asarray(groups, dtype=np.int64)
+        n_riders = len(labels)
+        self.labels = list(labels)
+        self.step = step
+        ticks = np.rint(lap_times / step).astype(np.int64)
+        self.origin = int(ticks.min()) if len(ticks) else 0
+        n_cells = int(ticks.max()) - self.origin + 1 if len(ticks) else 1
+        counts = np.bincount(groups * n_cells + ticks - self.origin, minlength=n_riders * n_cells)
+        # cumulative[r, i] is the number of rider r's laps below the grid point origin + i
+        self.cumulative = np.zeros((n_riders, n_cells + 1), dtype=np.int32)
+        np.cumsum(counts.reshape(n_riders, n_cells), axis=1, out=self.cumulative[:, 1:])
+        self.totals = self.cumulative[:, -1]
+
+        # the sorted laps of each rider, so a window of them can be sliced out for the Wasserstein distance
+        by_rider = np.lexsort((ticks, groups))
+        self._sorted_ticks = ticks[by_rider]
+        self._rider_starts = np.concatenate(([0], np.cumsum(self.totals)))
+
+    def bin_edges(self, low: float, high: float, width: float) -> np.ndarray:
+        """
+        Get the edges of the bins of a given width from the grid point at or below low until high is covered.
+
+        :param low: The lowest lap time in seconds.
+        :param high: The highest lap time in seconds.
+        :param width: The bin width in seconds, a multiple of the grid step.
+        :return: The bin edges in seconds.
+        """
+        low_tick, n_bins, width_ticks = self._bin_ticks(low, high, width)
+        return (low_tick + np.arange(n_bins + 1) * width_ticks) * self.step
+
+    def _bin_ticks(self, low: float, high: float, width: float) -> Tuple[int, int, int]:
+        """A helper method to get the first edge, the number of bins and the bin width in grid steps."""
+        width_ticks = int(round(width / self.step))
+        if width_ticks < 1 or not np.isclose(width_ticks * self.step, width):
+            raise ValueError(f"The bin width {width} must be a multiple of the grid step {self.step}")
+        low_tick = int(np.floor(low / self.step + 1e-9))
+        high_tick = int(np.ceil(high / self.step - 1e-9))
+        n_bins = max(1, -(-(high_tick - low_tick) // width_ticks))
+        return low_tick, n_bins, width_ticks
+
+    def _count_below(self, ticks: np.ndarray) -> np.ndarray:
+        """A helper method to get the number of each rider's laps below each grid point."""
+        return self.cumulative[:, np.clip(ticks - self.origin, 0, self.cumulative.shape[1] - 1)]
+
+    def relative_frequencies(self, low: float, high: float, width: float) -> np.ndarray:
+        """
+        Get the relative frequency histogram of every rider, like MetricsCalculator.relative_frequency_matrix: each bin
+        holds its lower edge, the last bin also holds its upper edge, and the laps outside the bins count towards the
+        total.
+
+        :param low: The lowest lap time in seconds.
+        :param high: The highest lap time in seconds.
+        :param width: The bin width in seconds, a multiple of the grid step.
+        :return: A matrix with a row of bin frequencies for each rider.
+        """
+        low_tick, n_bins, width_ticks = self._bin_ticks(low, high, width)
+        edges = low_tick + np.arange(n_bins + 1) * width_ticks
+        edges[-1] += 1
+        counts = np.diff(self._count_below(edges), axis=1)
+        return counts / np.maximum(self.totals, 1)[:, np.newaxis]
+
+    def samples(self, low: float, high: float) -> List[np.ndarray]:
+        """
+        Get the sorted lap times of each rider from low to high.
+
+        :param low: The lowest lap time in seconds.
+        :param high: The highest lap time in seconds.
+        :return: The lap times in seconds of each rider.
+        """
+        bounds = self._count_below(np.array([
+            int(np.ceil(low / self.step - 1e-9)), int(np.floor(high / self.step + 1e-9)) + 1
+        ])) + self._rider_starts[:-1, np.newaxis]
+        return [self._sorted_ticks[start:stop] * self.step for start, stop in bounds]
+
+    def pairwise_metrics(self, low: float, high: float, width: float) -> PairwiseMetrics:
+        """
+        Get the pairwise metrics of the riders for a window of lap times and a bin width, see PairwiseMetrics. The
+        Wasserstein distance uses the laps inside the bins.
+
+        :param low: The lowest lap time in seconds.
+        :param high: The highest lap time in seconds.
+        :param width: The bin width in seconds, a multiple of the grid step.
+        :return: The pairwise metrics.
+        """
+        edges = self.bin_edges(low, high, width)
+        return PairwiseMetrics(
+            self.labels, self.relative_frequencies(low, high, width), self.samples(edges[0], edges[-1])
+        )
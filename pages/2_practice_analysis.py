@@ -4,11 +4,20 @@ import numpy as np
 from copy import deepcopy
 
 from utils.DataWrangler import DataWrangler
+from fp_analysis.Metrics import PairwiseMetrics
 
 
 # region session state setup
 if "current_analysis_df" not in st.session_state:
     st.session_state["current_analysis_df"] = None
+if "current_leaderboard_df" not in st.session_state:
+    st.session_state["current_leaderboard_df"] = None
+if "current_selection" not in st.session_state:
+    st.session_state["current_selection"] = None
+if "current_histogram_index" not in st.session_state:
+    st.session_state["current_histogram_index"] = None
+if "current_pairwise_metrics" not in st.session_state:
+    st.session_state["current_pairwise_metrics"] = None
 # endregion
 
 # region Introduction to page
@@ -19,7 +28,8 @@ st.write("This page is to analyse MotoGP/2/3 practice sessions.")
 #          "Tick the box above 'Get sessions' button.")
 st.write("Choose a race weekend, choose the sessions to display and the year.")
 st.write("The **session choice** is important as the session names have changed over the years. If the incorrect "
-         "session name is picked, it will result in missing data.")
+         "session name is picked, it will result in missing data. Choose 'Auto-detect' to use the sessions the event "
+         "actually had.")
 st.write("**This page is still under construction and so may change at any moment**")
 st.write("I am still figuring out what is useful and what is not, and how best to incorporate tyre compound and life "
          "into the analysis.")
@@ -28,17 +38,15 @@ st.write("I am still figuring out what is useful and what is not, and how best t
 
 # region Analysis
 def visualise_data(full_df: pd.DataFrame):
-    orig_df = data_wrangler.copy_df(full_df)
-    sessions = data_wrangler.copy_df(full_df["Session"])
-    orig_laps_only_df = data_wrangler.drop_column(full_df, "Session")
-    data_df = data_wrangler.drop_column(full_df, "Session")
+    # full_df is the long format lap table, one row per lap with Rider, Session, Stint, Lap and LapTime columns
+    median_lap_time = data_wrangler.median_lap_time(full_df)
 
     # remove any short laps where riders take a shortcut to the pits or slow/cool down laps
     upper_tol = st.number_input(
         "Select maximum lap time",
-        min_value=data_wrangler.median_of_all_columns(data_df),
-        max_value=data_wrangler.median_of_all_columns(data_df) + 50.0,
-        value=data_wrangler.median_of_all_columns(data_df) + 1.0,
+        min_value=median_lap_time,
+        max_value=median_lap_time + 50.0,
+        value=median_lap_time + 1.0,
         step=0.001,
         format="%.3f",
         help="Any laps slower than this value will be ignored",
@@ -46,27 +54,23 @@ def visualise_data(full_df: pd.DataFrame):
     )
 
     # fastest lap is assumed to be only up to 10% faster
-    min_lap_time_allowed = data_wrangler.median_of_all_columns(data_df) * 0.9
+    min_lap_time_allowed = median_lap_time * 0.9
     max_lap_time_allowed = upper_tol  # slowest lap used in analysis is set by user
 
     # make a new filtered dataframe after getting rid of unhelpful lap times
-    df = data_wrangler.mask_df(data_df, min_lap_time_allowed, max_lap_time_allowed)
+    df = data_wrangler.filter_lap_times(full_df, min_lap_time_allowed, max_lap_time_allowed)
 
     # get fastest lap for relative comparison purposes
-    fastest_lap, fastest_rider = data_wrangler.minimum_of_all_columns(df)
+    fastest_lap, fastest_rider = data_wrangler.fastest_lap(df)
     st.write(f"Fastest lap was {fastest_lap} by {fastest_rider}")
 
-    # sort the dataframe by median, from lowest to highest
-    df, riders = data_wrangler.sort_by_median(df)
+    # sort the riders by median, from lowest to highest
+    df, riders = data_wrangler.sort_riders_by_median(df)
 
     show_data = st.checkbox("Show data")
     if show_data:
         st.dataframe(df)  # show data
 
-    # with st.expander("See all rider summary plots"):
-    with_sessions_df = data_wrangler.horizontally_concat_dataframes(df, sessions)
-    with_sessions_melt_df = data_wrangler.melt_on_session(with_sessions_df)
-
     st.write("The plot below shows all the lap times recorded by a rider for all available sessions. Clicking on the "
              "rider name on the right hand side hides the data, double clicking shows only their data. Clicking on "
              "other riders will add/remove their data.")
@@ -74,10 +78,8 @@ def visualise_data(full_df: pd.DataFrame):
         label="Choose what the colours represent:",
         options=["Colour by rider", "Colour by session"]
     )
-    colour = "Session" if plot_colours == "Colour by session" else "Riders"
-    plotly_strip_summary_fig = data_wrangler.plotly_strip_chart(
-        with_sessions_melt_df, x_name="LapTimes", y_name="Riders", colour=colour
-    )
+    colour = "Session" if plot_colours == "Colour by session" else "Rider"
+    plotly_strip_summary_fig = data_wrangler.plotly_strip_chart(df, x_name="LapTime", y_name="Rider", colour=colour)
     st.plotly_chart(plotly_strip_summary_fig)
 
     st.write("The box plot below shows the spread of the data. If the rider's laps are arranged from fastest to "
@@ -85,9 +87,18 @@ def visualise_data(full_df: pd.DataFrame):
              "the middle of the box is the median, which is the middle lap in terms of lap time. 50% of the rider's "
              "laps will be faster than this, and 50% will be slower. Points are outliers, so either a particularly "
              "quick or slow lap.")
-    plotly_box_summary_fig = data_wrangler.plotly_box_plot(df)
+    plotly_box_summary_fig = data_wrangler.plotly_lap_box_plot(df)
     st.plotly_chart(plotly_box_summary_fig)
 
+    st.write("## Sectors and top speed")
+    st.write("The ideal lap adds up a rider's best time in each sector, even if they were set on different laps. The "
+             "gap is how much quicker the rider would have been by putting their best sectors together on one lap.")
+    st.dataframe(data_wrangler.ideal_laps(df))
+    st.write("Each rider's best time in every sector, and where it ranks against the rest of the field.")
+    st.dataframe(data_wrangler.sector_ranking(df))
+    st.write("The highest speed each rider reached through the speed trap on any lap.")
+    st.dataframe(data_wrangler.speed_trap_ranking(df))
+
     with st.form("rider_picker"):
         selected_riders = st.multiselect(
             "Pick riders to compare or leave blank for all (but really just select a couple)", riders)
@@ -95,21 +106,17 @@ def visualise_data(full_df: pd.DataFrame):
 
     if riders_picked:
         if len(selected_riders) > 0:
-            rider_laps = data_wrangler.filter_on_columns(df, selected_riders)
+            rider_laps = data_wrangler.laps_of_riders(df, selected_riders)
         else:
             rider_laps = df
-            selected_riders = data_wrangler.get_column_names(df)
+            selected_riders = list(riders)
 
         # plotting the PDF of the lap times
-        rider_laps = data_wrangler.horizontally_concat_dataframes(rider_laps, sessions)
         # hist_data = data_wrangler.make_histogram_data(rider_laps, selected_riders)
         # pdf_fig = data_wrangler.plotly_distribution_plot(hist_data, selected_riders, False)
         # st.plotly_chart(pdf_fig)
 
-        rider_laps_melt = data_wrangler.melt_on_session(rider_laps)
-        plotly_strip_select_riders_fig = data_wrangler.plotly_strip_chart(
-            rider_laps_melt, "LapTimes", "Riders", "Session"
-        )
+        plotly_strip_select_riders_fig = data_wrangler.plotly_strip_chart(rider_laps, "LapTime", "Rider", "Session")
         st.plotly_chart(plotly_strip_select_riders_fig)
 
         # filtered_df = data_wrangler.filter_on_columns(df, selected_riders)
@@ -120,7 +127,7 @@ def visualise_data(full_df: pd.DataFrame):
                  "The curved line shows the distribution of laps, so a peak (though the distribution is shown "
                  "vertically) means more laps are concentrated around this lap time. A wider, flatter curve means "
                  "the laps are spread across a larger range.")
-        violin_fig = data_wrangler.plotly_stacked_violin_figure(rider_laps_melt, selected_riders)
+        violin_fig = data_wrangler.plotly_stacked_violin_figure(rider_laps, selected_riders)
         st.plotly_chart(violin_fig)
 
         # plot empirical cumulative distribution functions for each selected rider
@@ -129,7 +136,8 @@ def visualise_data(full_df: pd.DataFrame):
 
     st.write("## Further comparisons")
     st.write("This heatmap is all about how riders compare to each other and not who is fastest. "
-             "The higher the number the more similar the lap times were between the two riders.")
+             "For the Bhattacharyya coefficient the higher the number the more similar the lap times were between "
+             "the two riders, for the distances and divergences the lower the number the more similar they were.")
     st.write("Increasing the tolerance means more laps are considered in this analysis (therefore including some slow "
              "down laps) and widening the bins will mean more laps from a rider will overlap with laps from other "
              "riders.")
@@ -152,15 +160,29 @@ def visualise_data(full_df: pd.DataFrame):
     st.write(f"Slowest lap time considered will be {np.round(maximum_lap_time, 3)}")
     lowest_bin_limit = fastest_lap - 0.1
     highest_bin_limit = maximum_lap_time + 0.1
-    num_of_bins = int(np.ceil(highest_bin_limit - lowest_bin_limit) / bin_width)
-    st.write(f"Low bin = {lowest_bin_limit}, high bin = {highest_bin_limit}, num bins = {num_of_bins}")
+    bin_width = round(bin_width, 3)  # a whole number of milliseconds, the step of the histogram index
 
-    rider_relative_laps = data_wrangler.relative_freq_hist_calculation(
-        df, lowest_bin_limit, highest_bin_limit, num_of_bins
-    )
+    # the laps are counted on a 1 ms grid once, then the bins for any tolerance and bin width are read from the counts
+    lap_filter = (min_lap_time_allowed, max_lap_time_allowed)
+    cached_index = st.session_state["current_histogram_index"]
+    if cached_index is None or cached_index[0] != lap_filter:
+        cached_index = (lap_filter, data_wrangler.histogram_index(df))
+        st.session_state["current_histogram_index"] = cached_index
+    bin_edges = cached_index[1].bin_edges(lowest_bin_limit, highest_bin_limit, bin_width)
+    st.write(f"Low bin = {bin_edges[0]:.3f}, high bin = {bin_edges[-1]:.3f}, num bins = {len(bin_edges) - 1}")
 
-    rider_coeffs = data_wrangler.bhattacharyya_coefficients(rider_relative_laps)
-    new_bc_df = data_wrangler.dataframe_from_dictionary(rider_coeffs)
+    similarity_metric = st.selectbox(
+        "Select comparison", PairwiseMetrics.metrics,
+        help="The Wasserstein distance is in seconds and uses the laps themselves rather than the bins."
+    )
+    # each metric is worked out the first time it is selected for these settings
+    bin_settings = (lowest_bin_limit, highest_bin_limit, bin_width)
+    metric_settings = (lap_filter, bin_settings)
+    cached_metrics = st.session_state["current_pairwise_metrics"]
+    if cached_metrics is None or cached_metrics[0] != metric_settings:
+        cached_metrics = (metric_settings, cached_index[1].pairwise_metrics(*bin_settings))
+        st.session_state["current_pairwise_metrics"] = cached_metrics
+    new_bc_df = data_wrangler.metric_matrix(cached_metrics[1], similarity_metric)
     heatmap_fig = data_wrangler.plotly_heatmap(new_bc_df)
     st.plotly_chart(heatmap_fig)
 # endregion
@@ -170,6 +192,7 @@ if __name__ == "__main__":
     data_wrangler = DataWrangler()
 
     sessions_names = [
+        data_wrangler.pdf_retriever.AUTO_SESSIONS,
         "GP: FP1, PR, FP2, WUP",
         "GP: P1, P2, FP, WUP",
         "GP: FP1, FP2, FP3, FP4, WUP",
@@ -207,12 +230,38 @@ if __name__ == "__main__":
         submit = st.form_submit_button("Get sessions")
 
     if submit:
-        data = data_wrangler.get_practice_sessions(category, year, race, session)
-        if race_laps:
-            race_df = data_wrangler.get_race_pace_for_practice_comparison(year, race)
-            if race_df is not None:
-                data = data_wrangler.vertically_concat_dataframes(data, race_df)
-        st.session_state["current_analysis_df"] = deepcopy(data)
-        visualise_data(data)
-    elif st.session_state["current_analysis_df"] is not None:
+        if session == data_wrangler.pdf_retriever.AUTO_SESSIONS:
+            found_sessions = data_wrangler.pdf_retriever.discover_practice_sessions(category, year, race)
+            st.write(f"Sessions found: {', '.join(found_sessions) if found_sessions else 'none'}")
+        # the one page classifications come first, the full lap analysis is only loaded when asked for
+        st.session_state["current_selection"] = (category, year, race, session)
+        st.session_state["current_leaderboard_df"] = data_wrangler.get_practice_leaderboard(
+            category, year, race, session
+        )
+        st.session_state["current_analysis_df"] = None
+        st.session_state["current_histogram_index"] = None
+        st.session_state["current_pairwise_metrics"] = None
+
+    leaderboard = st.session_state["current_leaderboard_df"]
+    if leaderboard is not None:
+        st.write("## Best laps")
+        if leaderboard.empty:
+            st.write("No session classifications were found.")
+        else:
+            st.write("The best lap of each rider in each session and the gap to the fastest rider in that session, "
+                     "then their best lap across all sessions.")
+            st.dataframe(data_wrangler.leaderboard_table(leaderboard))
+
+        if st.session_state["current_analysis_df"] is None and st.button("Load full lap analysis"):
+            category, year, race, session = st.session_state["current_selection"]
+            data = data_wrangler.get_practice_laps(category, year, race, session)
+            if race_laps:
+                race_df = data_wrangler.get_race_pace_for_practice_comparison(year, race)
+                if race_df is not None:
+                    data = data_wrangler.concat_laps([data, race_df])
+            st.session_state["current_analysis_df"] = deepcopy(data)
+            st.session_state["current_histogram_index"] = None
+            st.session_state["current_pairwise_metrics"] = None
+
+    if st.session_state["current_analysis_df"] is not None:
         visualise_data(st.session_state["current_analysis_df"])
@@ -6,8 +6,8 @@ from utils.DataWrangler import DataWrangler
 
 
 # region session state setup
-if "current_race_df" not in st.session_state:
-    st.session_state["current_race_df"] = None
+if "current_race_laps_df" not in st.session_state:
+    st.session_state["current_race_laps_df"] = None
 # endregion
 
 # region Introduction to page
@@ -21,29 +21,36 @@ st.write("MotoE to come as a later update.")
 
 
 # region Analysis
-def visualise_race(the_race_df: pd.DataFrame):
+def visualise_race(the_laps_df: pd.DataFrame):
     """
     A function to visualise the race pace from main and sprint races.
 
-    :param the_race_df: The data for the race.
+    :param the_laps_df: The laps of the race, each with its lap number.
     """
-    data_df = data_wrangler.drop_column(the_race_df, "Session")
+    data_df = data_wrangler.race_laps_by_rider(the_laps_df)
 
     show_race_data = st.checkbox("Show race raw data")
     if show_race_data:
         st.dataframe(data_df)
 
-    st.write("This plot shows the gap in seconds to the winner for each rider for each lap. If a rider is ahead of "
-             "the winner the gap will be positive. A line trending down shows the gap getting larger as the race "
-             "goes on, a line trending up shows a rider getting closer to the winner.")
-    winner = data_wrangler.values_of_first_column(data_df)
-    cum_gap_df = data_wrangler.gap_between_column_and_dataframe(data_df, winner)
-    melt_cum_gap_df = data_wrangler.melt_on_lap(cum_gap_df, list(data_wrangler.get_column_names(data_df)))
-    melt_cum_gap_df = data_wrangler.rename_columns(
-        melt_cum_gap_df, {"index": "Lap", "variable": "Rider", "value": "Gap"}
-    )
-    gap_to_winner_plotly = data_wrangler.plotly_line_chart(melt_cum_gap_df, "Lap", "Gap", "Rider")
-    st.plotly_chart(gap_to_winner_plotly)
+    trace = data_wrangler.race_trace(the_laps_df)
+    trace_df = trace.to_frame()
+
+    st.write("The result worked out from the lap times: the finishing position, laps completed, race time and gap to "
+             "the leader, the position at the end of the first lap and the positions gained from there.")
+    st.dataframe(trace.summary())
+
+    st.write("These plots show the race lap by lap. The gap is the time in seconds behind the leader at the end of "
+             "each lap, so a line trending down shows a rider dropping back and a line trending up shows a rider "
+             "closing in. Hover over a point to see the interval to the rider ahead.")
+    trace_chart = st.radio(label="Select race trace", options=["Gap to leader", "Position", "Lap time"])
+    if trace_chart == "Position":
+        race_trace_fig = data_wrangler.plotly_race_trace_chart(trace_df, "Position")
+    elif trace_chart == "Lap time":
+        race_trace_fig = data_wrangler.plotly_line_chart(trace_df, "Lap", "LapTime", "Rider")
+    else:
+        race_trace_fig = data_wrangler.plotly_race_trace_chart(trace_df, "Gap")
+    st.plotly_chart(race_trace_fig)
 
     st.write("This plot shows the spread of a rider's lap times. The smaller the box the more consistent they "
              "are. The lower the box the faster they are. Outliers such as the first lap are shown by dots. The middle "
@@ -87,8 +94,8 @@ if __name__ == "__main__":
         if race_type == "SPR" and race_class != "MotoGP":
             st.error("Sprint selected for non MotoGP class")
             st.stop()
-        data = data_wrangler.get_race(race_class, year, race, race_type)
-        st.session_state["current_race_df"] = deepcopy(data)
-        visualise_race(data)
-    elif st.session_state["current_race_df"] is not None:
-        visualise_race(st.session_state["current_race_df"])
+        laps = data_wrangler.get_race_laps(race_class, year, race, race_type)
+        st.session_state["current_race_laps_df"] = deepcopy(laps)
+        visualise_race(laps)
+    elif st.session_state["current_race_laps_df"] is not None:
+        visualise_race(st.session_state["current_race_laps_df"])
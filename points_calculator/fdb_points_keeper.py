@@ -2,6 +2,7 @@ from typing import List, Tuple, Dict
 from utils.Parser import PdfParser
 from utils.Retriever import PdfRetriever
 from utils.RaceNames import RaceResources
+from utils.RateLimiter import RateLimiter
 from firestore_management import FirestoreDatabaseManager
 import json
 import pandas as pd
@@ -19,7 +20,7 @@ class PointsKeeper:
         Hardcoded file contain replacement riders.
         """
         self.results_getter = PdfParser()
-        self.pdf_getter = PdfRetriever()
+        self.pdf_getter = PdfRetriever(priority=RateLimiter.BACKGROUND)
         self.fdb_manager = FirestoreDatabaseManager()
 
         self._score_has_been_updated = list()
@@ -0,0 +1,75 @@
+import os
+import shutil
+from typing import Callable, Dict, List, NamedTuple
+
+import pytest
+
+from benchmarks.synthetic_pdfs import write_test_day
+from utils.Parser import LapRecord
+from utils.PdfCache import PdfCache
+from utils.ProbeCache import ProbeCache
+from utils.RateLimiter import RateLimiter
+from utils.Resilience import CircuitBreaker, RetryPolicy
+from utils.Retriever import PdfRetriever
+from utils.Transport import Transport
+
+
+class Website(NamedTuple):
+    """
+    A recorded website for one event, laid out as FileTransport reads it.
+    """
+    root: str
+    category: str
+    year: int
+    race: str
+    sessions: List[str]
+    laps: Dict[str, List[LapRecord]]  # the laps written into the Analysis PDF of each session
+
+
+def write_website(root: str, category: str, year: int, race: str, sessions: List[str]) -> Website:
+    """
+    Write a Classification page and the Analysis and Classification PDFs of each session of an event.
+
+    :param root: The directory to write to.
+    :param category: The racing class.
+    :param year: The year of the event.
+    :param race: The race 3-letter code.
+    :param sessions: The session codes.
+    :return: The recorded website.
+    """
+    written = write_test_day(os.path.join(root, "pdfs"), category, year, race, sessions, riders=8, stints=2,
+                             laps_per_stint=5)
+    site = os.path.join(root, "site")
+    for sess, (analysis, classification, _) in written.items():
+        page = os.path.join(site, "www.motogp.com", "en", "gp-results", str(year), race, category, sess)
+        os.makedirs(page, exist_ok=True)
+        with open(os.path.join(page, "Classification"), "wb") as out_file:
+            out_file.write(b"<html></html>")
+        pdf_dir = os.path.join(site, "resources.motogp.com", "files", "results", str(year), race, category, sess)
+        os.makedirs(pdf_dir, exist_ok=True)
+        shutil.copy(analysis, os.path.join(pdf_dir, f"{PdfRetriever.ANALYSIS}.pdf"))
+        shutil.copy(classification, os.path.join(pdf_dir, f"{PdfRetriever.CLASSIFICATION}.pdf"))
+    return Website(site, category, year, race, sessions, {sess: laps for sess, (_, _, laps) in written.items()})
+
+
+@pytest.fixture
+def website(tmp_path) -> Website:
+    """An event with three practice sessions."""
+    return write_website(str(tmp_path / "website"), "MotoGP", 2024, "TST", ["FP1", "FP2", "PR"])
+
+
+@pytest.fixture(autouse=True)
+def fresh_retriever_state(monkeypatch):
+    """Give each test its own probe cache, circuit breaker and rate limiter, as retrievers share them in a process."""
+    monkeypatch.setattr(PdfRetriever, "probe_cache", ProbeCache())
+    monkeypatch.setattr(PdfRetriever, "circuit_breaker", CircuitBreaker())
+    monkeypatch.setattr(PdfRetriever, "rate_limiter", RateLimiter(default_rate=1000.0, default_burst=1000))
+
+
+@pytest.fixture
+def make_retriever(tmp_path) -> Callable[..., PdfRetriever]:
+    """Make retrievers for a transport, with a cache of their own and no waits between retries."""
+    def make(transport: Transport, **kwargs) -> PdfRetriever:
+        kwargs.setdefault("retry_policy", RetryPolicy(base_delay=0.0))
+        return PdfRetriever(cache=PdfCache(root=str(tmp_path / "cache")), transport=transport, **kwargs)
+    return make
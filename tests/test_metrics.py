@@ -0,0 +1,115 @@
+from typing import List
+
+import numpy as np
+import pytest
+from scipy import stats
+from scipy.spatial import distance
+from scipy.special import rel_entr
+
+pytest.importorskip("matplotlib")
+pytest.importorskip("sklearn")
+
+from fp_analysis.Metrics import HistogramIndex, MetricsCalculator, PairwiseMetrics  # noqa: E402
+
+LOW, HIGH, BINS = 95.0, 100.0, 20
+
+
+@pytest.fixture(scope="module")
+def laps():
+    """The lap times of five riders, to the millisecond, some of them outside the bins and one rider with none."""
+    rng = np.random.default_rng(0)
+    samples = [rng.normal(pace, spread, 40).round(3) for pace, spread in [(96, 0.5), (97, 1), (97.5, 0.3), (99, 2)]]
+    samples.append(np.array([]))
+    lap_times = np.concatenate(samples)
+    groups = np.repeat(np.arange(len(samples)), [len(sample) for sample in samples])
+    return samples, lap_times, groups
+
+
+@pytest.fixture(scope="module")
+def pairwise(laps) -> PairwiseMetrics:
+    samples, lap_times, groups = laps
+    frequencies = MetricsCalculator.relative_frequency_matrix(lap_times, groups, len(samples), (LOW, HIGH), BINS)
+    in_bins = [np.sort(sample[(sample >= LOW) & (sample <= HIGH)]) for sample in samples]
+    return PairwiseMetrics([f"Rider {i}" for i in range(len(samples))], frequencies, in_bins)
+
+
+def normalised(pairwise: PairwiseMetrics) -> List[np.ndarray]:
+    """A helper to get the frequencies of each rider with laps, summing to 1."""
+    return [row / row.sum() for row in pairwise.frequencies[:-1]]
+
+
+def test_frequencies_match_relfreq(laps, pairwise):
+    samples, _, _ = laps
+    for sample, row in zip(samples[:-1], pairwise.frequencies):
+        np.testing.assert_allclose(row, stats.relfreq(sample, numbins=BINS, defaultreallimits=(LOW, HIGH))[0])
+    np.testing.assert_array_equal(pairwise.frequencies[-1], 0)
+
+
+def test_bhattacharyya_matches_pairwise_coefficients(pairwise):
+    frequencies = pairwise.frequencies
+    expected = np.array([[MetricsCalculator.calculate_bhattacharyya_coefficient(p, q) for q in frequencies]
+                         for p in frequencies])
+    np.testing.assert_allclose(pairwise.matrix(PairwiseMetrics.BHATTACHARYYA), expected)
+
+
+def test_hellinger_matches_scipy(pairwise):
+    rows = normalised(pairwise)
+    # the Hellinger distance is the Euclidean distance of the square roots over sqrt(2)
+    expected = np.array([[distance.euclidean(np.sqrt(p), np.sqrt(q)) / np.sqrt(2) for q in rows] for p in rows])
+    matrix = pairwise.matrix(PairwiseMetrics.HELLINGER)
+    np.testing.assert_allclose(matrix[:-1, :-1], expected, atol=1e-7)
+    assert np.isnan(matrix[-1]).all() and np.isnan(matrix[:, -1]).all()
+
+
+def test_jensen_shannon_matches_scipy(pairwise):
+    rows = normalised(pairwise)
+    # scipy gives the distance, the square root of the divergence
+    expected = np.array([[distance.jensenshannon(p, q, base=2) ** 2 for q in rows] for p in rows])
+    matrix = pairwise.matrix(PairwiseMetrics.JENSEN_SHANNON)
+    np.testing.assert_allclose(matrix[:-1, :-1], expected, atol=1e-9)
+    assert np.isnan(matrix[-1]).all()
+
+
+def test_symmetric_kl_matches_scipy(pairwise):
+    epsilon = 1e-6
+    rows = [(row + epsilon) / (row + epsilon).sum() for row in pairwise.frequencies]
+    expected = np.array([[rel_entr(p, q).sum() + rel_entr(q, p).sum() for q in rows] for p in rows])
+    np.testing.assert_allclose(pairwise.matrix(PairwiseMetrics.SYMMETRIC_KL), expected, rtol=1e-9, atol=1e-9)
+
+
+def test_wasserstein_matches_scipy(pairwise):
+    samples = pairwise.samples[:-1]
+    expected = np.array([[stats.wasserstein_distance(u, v) for v in samples] for u in samples])
+    matrix = pairwise.matrix(PairwiseMetrics.WASSERSTEIN)
+    np.testing.assert_allclose(matrix[:-1, :-1], expected, atol=1e-9)
+    assert np.isnan(matrix[-1]).all()
+
+
+def test_matrices_are_kept(pairwise):
+    for metric in PairwiseMetrics.metrics:
+        assert pairwise.matrix(metric) is pairwise.matrix(metric)
+    with pytest.raises(ValueError):
+        pairwise.matrix("Unknown")
+
+
+@pytest.mark.parametrize("low, high, width", [(95.0, 100.0, 0.25), (95.3, 98.71, 0.1), (96.0, 97.0, 0.5)])
+def test_histogram_index_matches_binning_again(laps, low, high, width):
+    samples, lap_times, groups = laps
+    index = HistogramIndex([f"Rider {i}" for i in range(len(samples))], lap_times, groups)
+    edges = index.bin_edges(low, high, width)
+    assert edges[0] <= low and edges[-1] >= high
+    np.testing.assert_allclose(np.diff(edges), width)
+
+    expected = MetricsCalculator.relative_frequency_matrix(
+        lap_times, groups, len(samples), (edges[0], edges[-1]), len(edges) - 1
+    )
+    np.testing.assert_allclose(index.relative_frequencies(low, high, width), expected)
+    for sample, window in zip(samples, index.samples(edges[0], edges[-1])):
+        np.testing.assert_allclose(window, np.sort(sample[(sample >= edges[0]) & (sample <= edges[-1])]))
+
+
+def test_histogram_index_rejects_width_off_the_grid(laps):
+    samples, lap_times, groups = laps
+    index = HistogramIndex([f"Rider {i}" for i in range(len(samples))], lap_times, groups)
+    with pytest.raises(ValueError):
+        index.relative_frequencies(95.0, 100.0, 0.0005)
@@ -0,0 +1,139 @@
+import os
+import time
+from typing import List
+
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic_pdfs import make_riders, write_race_classification_pdf
+from utils.ParsedCache import ParsedCache
+from utils.Parser import PdfParser
+from utils.PdfCache import PdfCache
+
+calls: List[str] = list()
+
+
+def parse_results(file: str, **kwargs) -> pd.DataFrame:
+    """A parse method counting its calls."""
+    calls.append(file)
+    return PdfParser.parse_race_results_pdf(file)
+
+
+@pytest.fixture(autouse=True)
+def reset_calls():
+    calls.clear()
+
+
+def write_pdf(path: str, seed: int = 0) -> str:
+    """A helper to write a race Classification PDF."""
+    write_race_classification_pdf(path, make_riders(12, seed), rows_per_page=40, seed=seed)
+    return path
+
+
+def feather_files(cache: ParsedCache) -> List[str]:
+    """A helper to list the parsed files in the cache."""
+    return sorted(name for name in os.listdir(cache.root) if name.endswith(".feather"))
+
+
+def test_second_parse_is_a_hit(tmp_path):
+    cache = ParsedCache(str(tmp_path))
+    file = write_pdf(str(tmp_path / "2024_TST_MotoGP_RAC_Classification.pdf"))
+
+    first = cache.parse(file, parse_results)
+    second = ParsedCache(str(tmp_path)).parse(file, parse_results)
+
+    assert calls == [file]
+    pd.testing.assert_frame_equal(first, second)
+    assert len(feather_files(cache)) == 1
+
+
+def test_changed_pdf_or_arguments_miss(tmp_path):
+    cache = ParsedCache(str(tmp_path))
+    file = write_pdf(str(tmp_path / "2024_TST_MotoGP_RAC_Classification.pdf"))
+    cache.parse(file, parse_results)
+
+    cache.parse(file, parse_results, extra=True)
+    write_pdf(file, seed=1)
+    df = cache.parse(file, parse_results)
+
+    assert len(calls) == 3
+    pd.testing.assert_frame_equal(df, PdfParser.parse_race_results_pdf(file))
+
+
+def test_new_parser_version_misses_and_removes_old_files(tmp_path, monkeypatch):
+    cache = ParsedCache(str(tmp_path))
+    file = write_pdf(str(tmp_path / "2024_TST_MotoGP_RAC_Classification.pdf"))
+    cache.parse(file, parse_results)
+    old_files = feather_files(cache)
+
+    monkeypatch.setattr(PdfParser, "version", PdfParser.version + "-next")
+    cache = ParsedCache(str(tmp_path))
+    cache.parse(file, parse_results)
+
+    assert len(calls) == 2
+    assert len(feather_files(cache)) == 1 and feather_files(cache) != old_files
+
+
+def test_parsed_pdf_is_removed_with_its_pdf(tmp_path):
+    pdf_cache = PdfCache(root=str(tmp_path), max_bytes=1)
+    bodies = list()
+    for seed in range(2):
+        with open(write_pdf(str(tmp_path / f"source{seed}.pdf"), seed=seed), "rb") as in_file:
+            bodies.append(in_file.read())
+    cache = ParsedCache(str(tmp_path), pdf_cache=pdf_cache)
+    first = pdf_cache.store("2024_TST_MotoGP_RAC_Classification.pdf", "https://resources.motogp.com/a", [bodies[0]])
+    cache.parse(first, parse_results)
+
+    # the PDF cache only has room for one file, so storing the second evicts the first
+    second = pdf_cache.store("2024_TST_MotoGP_SPR_Classification.pdf", "https://resources.motogp.com/b", [bodies[1]])
+    assert pdf_cache.lookup("2024_TST_MotoGP_RAC_Classification.pdf") is None
+    cache.parse(second, parse_results)
+
+    assert feather_files(cache) == [os.path.basename(cache.path(second, "parse_results", dict()))]
+
+
+def test_least_recently_used_files_are_evicted(tmp_path):
+    files = [write_pdf(str(tmp_path / f"2024_TST_MotoGP_RAC{i}_Classification.pdf"), seed=i) for i in range(3)]
+    cache = ParsedCache(str(tmp_path))
+    cache.parse(files[0], parse_results)
+    size = cache.total_bytes()
+    cache.max_bytes = 2 * size + size // 2
+    # the access times are file times, which the file system only keeps to a few milliseconds
+    time.sleep(0.02)
+    cache.parse(files[1], parse_results)
+    time.sleep(0.02)
+    # the first file is read again so the second one is now the least recently used
+    cache.parse(files[0], parse_results)
+    time.sleep(0.02)
+
+    cache.parse(files[2], parse_results)
+
+    assert cache.total_bytes() <= cache.max_bytes
+    assert os.path.exists(cache.path(files[0], "parse_results", dict()))
+    assert not os.path.exists(cache.path(files[1], "parse_results", dict()))
+    assert os.path.exists(cache.path(files[2], "parse_results", dict()))
+
+
+def test_unreadable_file_is_parsed_again(tmp_path):
+    cache = ParsedCache(str(tmp_path))
+    file = write_pdf(str(tmp_path / "2024_TST_MotoGP_RAC_Classification.pdf"))
+    cache.parse(file, parse_results)
+    with open(cache.path(file, "parse_results", dict()), "wb") as out_file:
+        out_file.write(b"not feather")
+
+    df = cache.parse(file, parse_results)
+
+    assert len(calls) == 2
+    pd.testing.assert_frame_equal(df, PdfParser.parse_race_results_pdf(file))
+
+
+def test_parse_many_only_parses_the_misses(tmp_path):
+    files = [write_pdf(str(tmp_path / f"2024_TST_MotoGP_RAC{i}_Classification.pdf"), seed=i) for i in range(3)]
+    cache = ParsedCache(str(tmp_path))
+    cache.parse(files[1], PdfParser.parse_race_results_pdf)
+
+    out = cache.parse_many(files, PdfParser.parse_race_results_pdf, workers=1)
+
+    for file, df in zip(files, out):
+        pd.testing.assert_frame_equal(df, PdfParser.parse_race_results_pdf(file))
+    assert len(feather_files(cache)) == 3
@@ -0,0 +1,131 @@
+import re
+
+import fitz
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.parser_benchmark import check_laps_table, check_wide_table, expected_analysis_laps, same_laps
+from benchmarks.synthetic_pdfs import best_laps, make_riders, write_analysis_pdf, write_classification_pdf
+from utils.Parser import PdfParser
+
+
+def baseline_parse_pdf(file: str, delete_if_less_than_three: bool, is_race: bool) -> pd.DataFrame:
+    """
+    The first version of PdfParser.parse_pdf, which ran regular expressions over the text of the whole document, kept
+    as the reference the parser must agree with.
+    """
+    with fitz.Document(file) as doc:
+        text = "".join(page.get_text() for page in doc)
+    rider_name_pattern = r"[A-Z]{3}\s{1}[\w\s]+\s\d{1,2}[stndrh]{2,}"
+    riders = [rider.split("\n")[-2] for rider in re.findall(rider_name_pattern, text)]
+    rider_data = re.split(rider_name_pattern, text)[1:]
+    lap_time_pattern = r"\s[1-2]'\d\d.\d\d\d\s\d{1,2}\s"
+    rider_lap_times = list()
+    for lap_time_string in rider_data:
+        stint_times = re.split(r"\nP\n", lap_time_string)
+        lap_times = list()
+        for i, times in enumerate(stint_times):
+            unfinished_idx = times.find("unfinished")
+            if unfinished_idx != -1:
+                times = times[:unfinished_idx]
+            laps = re.findall(lap_time_pattern, times)
+            if not is_race:
+                laps = laps[1:] if i == len(stint_times) - 1 else laps[1:-1]
+            for lap in laps:
+                minutes, seconds = lap.split("\n")[1].split("'")
+                lap_times.append(round(int(minutes) * 60 + float(seconds), 3))
+        rider_lap_times.append(lap_times)
+    rider_laps = dict(zip(riders, rider_lap_times))
+    if delete_if_less_than_three:
+        rider_laps = {rider: laps for rider, laps in rider_laps.items() if len(laps) >= 3}
+    df = pd.DataFrame.from_dict(rider_laps, orient="index").T
+    df["Session"] = file.split("_")[-1][:-4]
+    return df
+
+
+@pytest.fixture(scope="module", params=[0, 1, 2])
+def analysis(request, tmp_path_factory):
+    """An Analysis PDF over several pages with unfinished laps, and the laps written into it."""
+    file = str(tmp_path_factory.mktemp("analysis") / f"MotoGP-2024_TST_{request.param}_FP1.pdf")
+    laps = write_analysis_pdf(file, make_riders(12, request.param), stints=3, laps_per_stint=6, unfinished_rate=0.1,
+                              seed=request.param)
+    return file, laps
+
+
+@pytest.mark.parametrize("extraction", [PdfParser.TEXT, PdfParser.WORDS])
+@pytest.mark.parametrize("is_race", [False, True])
+@pytest.mark.parametrize("delete_if_less_than_three", [False, True])
+def test_parse_pdf_matches_baseline(analysis, delete_if_less_than_three, is_race, extraction):
+    file, _ = analysis
+
+    df = PdfParser().parse_pdf(file, delete_if_less_than_three, is_race, extraction)
+
+    pd.testing.assert_frame_equal(df, baseline_parse_pdf(file, delete_if_less_than_three, is_race))
+
+
+@pytest.mark.parametrize("extraction", [PdfParser.TEXT, PdfParser.WORDS])
+def test_lap_records_match_the_written_laps(analysis, extraction):
+    file, laps = analysis
+
+    assert same_laps(list(PdfParser().iter_lap_records(file, extraction)), laps)
+
+
+@pytest.mark.parametrize("extraction", [PdfParser.TEXT, PdfParser.WORDS])
+def test_missing_sector_does_not_shift_the_others(tmp_path, extraction):
+    file = str(tmp_path / "MotoGP-2024_TST_FP1.pdf")
+    laps = write_analysis_pdf(file, make_riders(6), stints=2, laps_per_stint=6, unfinished_rate=0.0,
+                              missing_sector_rate=0.1)
+    missing = [any(np.isnan(lap.sectors)) for lap in laps]
+    assert any(missing) and not all(missing)
+
+    parsed = list(PdfParser().iter_lap_records(file, extraction))
+
+    assert [lap.lap_time for lap in parsed] == [lap.lap_time for lap in laps]
+    for lap, expected, has_missing in zip(parsed, laps, missing):
+        if extraction == PdfParser.WORDS or not has_missing:
+            np.testing.assert_array_equal(lap.sectors, expected.sectors)
+        else:
+            # the plain text cannot tell which cell is empty, so none of the sectors are kept
+            assert np.isnan(lap.sectors).all()
+        assert lap.speed == expected.speed
+
+
+@pytest.mark.parametrize("extraction", [PdfParser.TEXT, PdfParser.WORDS])
+def test_parse_laps_keeps_the_laps_parse_pdf_keeps(analysis, extraction):
+    file, laps = analysis
+    parser = PdfParser()
+
+    df = parser.parse_laps(file, True, False, extraction)
+
+    assert check_laps_table(df, expected_analysis_laps(laps, delete_if_less_than_three=True))
+    wide = parser.parse_pdf(file, True, False)
+    for rider, rider_laps in df.groupby("Rider", observed=True, sort=False):
+        np.testing.assert_array_equal(rider_laps["LapTime"].to_numpy(),
+                                      wide[rider].dropna().to_numpy(dtype=np.float32))
+    assert (df["Session"] == "FP1").all()
+
+
+def test_parse_many_matches_parsing_each_file(analysis):
+    file, laps = analysis
+    parser = PdfParser()
+
+    out = parser.parse_many([file, file], 2, parser.parse_pdf, delete_if_less_than_three=True, is_race=False)
+
+    expected = expected_analysis_laps(laps, delete_if_less_than_three=True)
+    assert len(out) == 2 and all(check_wide_table(df, expected) for df in out)
+
+
+def test_classification_best_laps(tmp_path):
+    field = make_riders(10)
+    laps = write_analysis_pdf(str(tmp_path / "MotoGP-2024_TST_FP1.pdf"), field, stints=2, laps_per_stint=5)
+    best = best_laps(laps)
+    file = str(tmp_path / "MotoGP-2024_TST_Classification_FP1.pdf")
+    write_classification_pdf(file, field, best)
+
+    df = PdfParser().parse_classification_pdf(file)
+
+    assert list(df["Rider"]) == list(best)
+    np.testing.assert_array_equal(df["BestLap"].to_numpy(), np.array(list(best.values()), dtype=np.float32))
+    assert list(df["Position"]) == list(range(1, len(best) + 1))
+    assert (df["Session"] == "FP1").all()
@@ -0,0 +1,104 @@
+import os
+import json
+import time
+
+from utils.PdfCache import PdfCache
+
+
+def store(cache: PdfCache, name: str, body: bytes) -> str:
+    """A helper to put a file into the cache."""
+    return cache.store(name, f"https://resources.motogp.com/{name}", [body[:10], body[10:]], etag='"1"')
+
+
+def test_store_then_lookup_hits(tmp_path):
+    cache = PdfCache(root=str(tmp_path))
+    path = store(cache, "a.pdf", b"%PDF-1.4 body\n%%EOF\n")
+
+    assert cache.lookup("a.pdf") == path
+    with open(path, "rb") as in_file:
+        assert in_file.read() == b"%PDF-1.4 body\n%%EOF\n"
+    assert cache.validators("a.pdf") == {"If-None-Match": '"1"'}
+
+
+def test_lookup_of_unknown_file_misses(tmp_path):
+    cache = PdfCache(root=str(tmp_path))
+
+    assert cache.lookup("a.pdf") is None
+
+
+def test_manifest_is_shared_with_a_new_instance(tmp_path):
+    store(PdfCache(root=str(tmp_path)), "a.pdf", b"%PDF-1.4 body\n%%EOF\n")
+
+    assert PdfCache(root=str(tmp_path)).lookup("a.pdf") == os.path.join(str(tmp_path), "a.pdf")
+
+
+def test_truncated_file_misses_and_is_removed(tmp_path):
+    path = store(PdfCache(root=str(tmp_path)), "a.pdf", b"%PDF-1.4 body\n%%EOF\n")
+    with open(path, "r+b") as out_file:
+        out_file.truncate(5)
+    cache = PdfCache(root=str(tmp_path))
+
+    assert cache.lookup("a.pdf") is None
+    assert not os.path.exists(path)
+    assert cache.entry("a.pdf") is None
+
+
+def test_changed_file_of_the_same_size_misses(tmp_path):
+    path = store(PdfCache(root=str(tmp_path)), "a.pdf", b"%PDF-1.4 body\n%%EOF\n")
+    with open(path, "r+b") as out_file:
+        out_file.write(b"%PDF-1.7")
+    cache = PdfCache(root=str(tmp_path))
+
+    assert cache.lookup("a.pdf") is None
+    assert not os.path.exists(path)
+
+
+def test_least_recently_used_files_are_evicted(tmp_path):
+    cache = PdfCache(root=str(tmp_path), max_bytes=250)
+    for name in ("a.pdf", "b.pdf"):
+        store(cache, name, b"x" * 100)
+    # a is used again, so b is now the least recently used
+    time.sleep(0.01)
+    cache.lookup("a.pdf")
+
+    store(cache, "c.pdf", b"x" * 100)
+
+    assert cache.lookup("b.pdf") is None
+    assert not os.path.exists(os.path.join(str(tmp_path), "b.pdf"))
+    assert cache.lookup("a.pdf") is not None
+    assert cache.lookup("c.pdf") is not None
+    assert cache.total_bytes() == 200
+
+
+def test_file_larger_than_the_budget_is_kept(tmp_path):
+    cache = PdfCache(root=str(tmp_path), max_bytes=50)
+
+    path = store(cache, "a.pdf", b"x" * 100)
+
+    assert cache.lookup("a.pdf") == path
+
+
+def test_pdfs_from_before_the_manifest_are_adopted_or_removed(tmp_path):
+    with open(tmp_path / "complete.pdf", "wb") as out_file:
+        out_file.write(b"%PDF-1.4 body\n%%EOF\n")
+    with open(tmp_path / "truncated.pdf", "wb") as out_file:
+        out_file.write(b"%PDF-1.4 bo")
+    with open(tmp_path / "notes.txt", "wb") as out_file:
+        out_file.write(b"not a pdf")
+
+    cache = PdfCache(root=str(tmp_path))
+
+    assert cache.lookup("complete.pdf") == os.path.join(str(tmp_path), "complete.pdf")
+    assert cache.lookup("truncated.pdf") is None
+    assert not os.path.exists(tmp_path / "truncated.pdf")
+    assert os.path.exists(tmp_path / "notes.txt")
+    with open(tmp_path / PdfCache.manifest_name) as json_file:
+        assert list(json.load(json_file)) == ["complete.pdf"]
+
+
+def test_pdfs_are_only_adopted_without_a_manifest(tmp_path):
+    PdfCache(root=str(tmp_path))
+    with open(tmp_path / "later.pdf", "wb") as out_file:
+        out_file.write(b"%PDF-1.4 body\n%%EOF\n")
+
+    assert PdfCache(root=str(tmp_path)).lookup("later.pdf") is None
@@ -0,0 +1,44 @@
+import re
+from typing import List, Tuple
+
+import fitz
+
+from benchmarks.synthetic_pdfs import make_riders, write_race_classification_pdf
+from utils.Parser import PdfParser
+
+
+def baseline_race_results(file: str) -> List[Tuple[str, float]]:
+    """
+    The riders and points read by the first version of PdfParser.parse_race_results_pdf, which split the text of the
+    first page at every race time, kept as the reference the parser must agree with.
+    """
+    with fitz.Document(file) as doc:
+        text = doc[0].get_text()
+    results = list()
+    for i, rider in enumerate(re.split(r"\d\d'\d\d.\d\d\d", text)):
+        if "Not classified" in rider:
+            break
+        words = rider.split("\n")
+        if len(words) <= 10:
+            break
+        try:
+            results.append((words[-7 if i == 0 else -8], float(words[-3])))
+        except ValueError:
+            break
+    return results
+
+
+def test_race_results_match_baseline_on_synthetic_sheet(tmp_path):
+    file_name = str(tmp_path / "2024_TST_MotoGP_RAC_Classification.pdf")
+    expected = write_race_classification_pdf(file_name, make_riders(22), lapped=2, not_classified=3, rows_per_page=40)
+
+    df = PdfParser.parse_race_results_pdf(file_name)
+
+    scored = [(row.rider.name, row.points) for row in expected if row.points > 0]
+    assert list(zip(df["Rider"], df["Points"])) == scored
+    assert list(df["Position"]) == list(range(1, len(scored) + 1))
+    assert baseline_race_results(file_name) == scored
+
+
+def test_race_results_of_missing_file():
+    assert PdfParser.parse_race_results_pdf(None) is None
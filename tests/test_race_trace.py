@@ -0,0 +1,107 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from benchmarks.synthetic_pdfs import make_riders, write_analysis_pdf
+from utils.Parser import PdfParser
+from utils.RaceTrace import RaceTrace
+
+
+def lap_table(rows) -> pd.DataFrame:
+    """A helper to make a long format lap table like PdfParser.parse_laps from (rider, lap, lap time) rows."""
+    riders = ["Rider A", "Rider B", "Rider C", "Rider D"]
+    df = pd.DataFrame(rows, columns=["Rider", "Lap", "LapTime"])
+    df["Rider"] = pd.Categorical(df["Rider"], categories=riders)
+    return df
+
+
+@pytest.fixture
+def trace() -> RaceTrace:
+    # B has no time on lap 2, a pit in lap left out by the parser, C retires after lap 2 and D has no laps
+    return RaceTrace.from_laps(lap_table([
+        ("Rider A", 1, 100.0), ("Rider A", 2, 99.0), ("Rider A", 3, 99.0),
+        ("Rider B", 1, 99.5), ("Rider B", 3, 98.0),
+        ("Rider C", 1, 101.0), ("Rider C", 2, 97.0),
+    ]))
+
+
+def test_from_laps_puts_each_lap_at_its_number(trace):
+    assert trace.riders == ["Rider A", "Rider B", "Rider C", "Rider D"]
+    np.testing.assert_array_equal(trace.laps, [1, 2, 3])
+    np.testing.assert_array_equal(trace.lap_times, [
+        [100.0, 99.0, 99.0], [99.5, np.nan, 98.0], [101.0, 97.0, np.nan], [np.nan, np.nan, np.nan]
+    ])
+    np.testing.assert_array_equal(trace.laps_completed, [3, 1, 2, 0])
+
+
+def test_positions_and_gaps(trace):
+    np.testing.assert_array_equal(trace.race_time[:, :2], [[100.0, 199.0], [99.5, np.nan], [101.0, 198.0],
+                                                           [np.nan, np.nan]])
+    np.testing.assert_array_equal(trace.position, [[2, 2, 1], [1, np.nan, np.nan], [3, 1, np.nan],
+                                                   [np.nan, np.nan, np.nan]])
+    np.testing.assert_array_equal(trace.gap_to_leader[:, :2], [[0.5, 1.0], [0.0, np.nan], [1.5, 0.0],
+                                                               [np.nan, np.nan]])
+    np.testing.assert_array_equal(trace.interval[:, 1], [1.0, np.nan, np.nan, np.nan])
+    np.testing.assert_array_equal(trace.position_change[:, 1], [0, np.nan, 2, np.nan])
+
+
+def test_summary_is_in_finishing_order(trace):
+    summary = trace.summary()
+    assert list(summary.index) == ["Rider A", "Rider C", "Rider B", "Rider D"]
+    assert list(summary["Position"]) == [1, 2, 3, 4]
+    assert list(summary.loc["Rider C", ["LapsCompleted", "RaceTime", "PositionsGained"]]) == [2, 198.0, 1]
+
+
+def test_to_frame_has_a_row_per_lap_completed(trace):
+    frame = trace.to_frame()
+    assert len(frame) == 6
+    assert list(frame["Rider"].cat.categories) == trace.riders
+    assert list(frame.loc[frame["Rider"] == "Rider B", "Lap"]) == [1]
+
+
+def test_from_wide_uses_the_lap_column():
+    wide = pd.DataFrame({"Lap": [1, 3], "Rider A": [100.0, 99.0], "Rider B": [99.5, 98.0]})
+    trace = RaceTrace.from_wide(wide)
+    np.testing.assert_array_equal(trace.lap_times, [[100.0, np.nan, 99.0], [99.5, np.nan, 98.0]])
+
+
+def test_from_wide_counts_the_default_index_from_lap_1():
+    wide = pd.DataFrame({"Session": ["RAC", "RAC"], "Rider A": [100.0, 99.0]})
+    trace = RaceTrace.from_wide(wide)
+    assert trace.riders == ["Rider A"]
+    np.testing.assert_array_equal(trace.laps, [1, 2])
+
+
+@pytest.mark.parametrize("wide", [
+    pd.DataFrame({"Rider A": [100.0, 99.0]}, index=[0, 2]),
+    pd.DataFrame({"Lap": [1, 1], "Rider A": [100.0, 99.0]}),
+    pd.DataFrame({"Lap": [0, 1], "Rider A": [100.0, 99.0]}),
+])
+def test_from_wide_rejects_rows_that_are_not_laps(wide):
+    with pytest.raises(ValueError):
+        RaceTrace.from_wide(wide)
+
+
+@pytest.mark.parametrize("extraction", [PdfParser.TEXT, PdfParser.WORDS])
+def test_riders_who_pit_stay_in_the_race_trace(tmp_path, extraction):
+    # every rider pits at the end of the first stint, as in a flag to flag race
+    file = str(tmp_path / "2024_TST_MotoGP_RAC_Analysis.pdf")
+    laps = write_analysis_pdf(file, make_riders(6, 0), stints=2, laps_per_stint=5, unfinished_rate=0.0)
+    df = PdfParser().parse_laps(file, False, True, extraction, keep_pit_in=True)
+
+    assert df["PitIn"].sum() == 6
+    assert df.loc[df["PitIn"], "Lap"].tolist() == [5] * 6
+    summary = RaceTrace.from_laps(df).summary()
+    assert summary["LapsCompleted"].tolist() == [10] * 6
+    race_times = {rider: round(sum(lap.lap_time for lap in laps if lap.rider == rider), 3) for rider in summary.index}
+    np.testing.assert_allclose(summary["RaceTime"], [race_times[rider] for rider in summary.index], rtol=1e-6)
+    assert summary["Gap"].min() == 0
+
+
+def test_parse_laps_leaves_out_pit_in_laps_by_default(tmp_path):
+    file = str(tmp_path / "2024_TST_MotoGP_RAC_Analysis.pdf")
+    write_analysis_pdf(file, make_riders(6, 0), stints=2, laps_per_stint=5, unfinished_rate=0.0)
+    df = PdfParser().parse_laps(file, False, True)
+
+    assert not df["PitIn"].any()
+    assert len(df) == 6 * 9
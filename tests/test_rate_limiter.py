@@ -0,0 +1,55 @@
+import time
+import threading
+
+from utils.RateLimiter import RateLimiter
+
+URL = "https://resources.motogp.com/files/results/2024/TST/MotoGP/FP1/Analysis.pdf"
+
+
+def test_burst_is_allowed_then_requests_wait_for_a_token():
+    limiter = RateLimiter(default_rate=10.0, default_burst=2)
+
+    waits = [limiter.acquire(URL) for _ in range(3)]
+
+    assert waits[0] < 0.02 and waits[1] < 0.02
+    assert 0.05 < waits[2] < 0.5
+
+
+def test_each_host_has_its_own_bucket():
+    limiter = RateLimiter(default_rate=1.0, default_burst=1)
+    limiter.acquire(URL)
+
+    assert limiter.acquire("https://www.motogp.com/en/gp-results") < 0.02
+
+
+def test_host_rate_overrides_the_default():
+    limiter = RateLimiter(default_rate=1.0, default_burst=1)
+    limiter.set_rate("resources.motogp.com", 1000.0, 10)
+
+    assert sum(limiter.acquire(URL) for _ in range(10)) < 0.05
+
+
+def test_interactive_request_goes_ahead_of_a_waiting_background_request():
+    limiter = RateLimiter(default_rate=5.0, default_burst=1)
+    limiter.acquire(URL)  # empty the bucket, the next token comes in 0.2 s
+    order = list()
+
+    def request(priority: int, name: str) -> None:
+        limiter.acquire(URL, priority)
+        order.append(name)
+
+    background = threading.Thread(target=request, args=(RateLimiter.BACKGROUND, "background"))
+    interactive = threading.Thread(target=request, args=(RateLimiter.INTERACTIVE, "interactive"))
+    background.start()
+    time.sleep(0.05)
+    interactive.start()
+    background.join(2.0)
+    interactive.join(2.0)
+
+    assert order == ["interactive", "background"]
+
+
+def test_background_request_is_not_held_without_interactive_requests():
+    limiter = RateLimiter(default_rate=10.0, default_burst=1)
+
+    assert limiter.acquire(URL, RateLimiter.BACKGROUND) < 0.02
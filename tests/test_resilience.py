@@ -0,0 +1,175 @@
+import time
+
+import pytest
+
+from utils.Resilience import CircuitBreaker, CircuitOpenError, RetryPolicy
+from utils.Retriever import PdfRetriever
+from utils.Transport import Transport, TransportResponse
+
+URL = "https://resources.motogp.com/files/results/2024/TST/MotoGP/FP1/Analysis.pdf"
+
+
+class ScriptedTransport(Transport):
+    """A transport answering each request with the next outcome given, a status or an exception to raise."""
+    def __init__(self, *outcomes):
+        self.outcomes = list(outcomes)
+
+    def request(self, method, url, headers=None) -> TransportResponse:
+        outcome = self.outcomes.pop(0)
+        if isinstance(outcome, BaseException):
+            raise outcome
+        return TransportResponse(outcome)
+
+
+def open_breaker(breaker: CircuitBreaker) -> None:
+    """A helper to fail enough requests to open the circuit."""
+    for _ in range(breaker.failure_threshold):
+        breaker.before_request(URL)
+        breaker.record_failure(URL)
+
+
+def test_breaker_opens_after_consecutive_failures():
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=60.0)
+    for _ in range(2):
+        breaker.before_request(URL)
+        breaker.record_failure(URL)
+    assert not breaker.is_open(URL)
+
+    breaker.before_request(URL)
+    breaker.record_failure(URL)
+
+    assert breaker.is_open(URL)
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request(URL)
+    # other hosts are not affected
+    breaker.before_request("https://www.motogp.com/en")
+
+
+def test_breaker_success_resets_the_failure_count():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=60.0)
+    breaker.record_failure(URL)
+    breaker.record_success(URL)
+    breaker.record_failure(URL)
+
+    assert not breaker.is_open(URL)
+
+
+def test_breaker_half_open_lets_one_trial_through_then_closes():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    open_breaker(breaker)
+    time.sleep(0.06)
+
+    breaker.before_request(URL)  # the trial
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request(URL)
+    breaker.record_success(URL)
+
+    assert not breaker.is_open(URL)
+    breaker.before_request(URL)
+
+
+def test_breaker_failed_trial_opens_the_circuit_again():
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=0.05)
+    open_breaker(breaker)
+    time.sleep(0.06)
+
+    breaker.before_request(URL)
+    breaker.record_failure(URL)
+
+    with pytest.raises(CircuitOpenError):
+        breaker.before_request(URL)
+    time.sleep(0.06)
+    breaker.before_request(URL)
+
+
+@pytest.fixture
+def quick_breaker(monkeypatch) -> CircuitBreaker:
+    """Give the retrievers a breaker that opens on the first failure and half opens after 50 ms."""
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=0.05)
+    monkeypatch.setattr(PdfRetriever, "circuit_breaker", breaker)
+    return breaker
+
+
+@pytest.mark.parametrize("error", [ValueError("unexpected"), KeyboardInterrupt()])
+def test_exception_during_trial_ends_it(error, make_retriever, quick_breaker):
+    retriever = make_retriever(ScriptedTransport(ConnectionError("down"), error, 200), max_workers=1,
+                               retry_policy=RetryPolicy(max_attempts=1))
+    with pytest.raises(ConnectionError):
+        retriever._send("GET", URL)
+    time.sleep(0.06)
+
+    with pytest.raises(type(error)):
+        retriever._send("GET", URL)
+
+    # the trial counted as a failure, so the circuit opened again rather than staying half open for good
+    with pytest.raises(CircuitOpenError):
+        retriever._send("GET", URL)
+    time.sleep(0.06)
+    assert retriever._send("GET", URL).status == 200
+    assert not retriever.circuit_breaker.is_open(URL)
+
+
+def test_rate_limiter_error_during_trial_ends_it(make_retriever, quick_breaker, monkeypatch):
+    retriever = make_retriever(ScriptedTransport(ConnectionError("down"), 200), max_workers=1,
+                               retry_policy=RetryPolicy(max_attempts=1))
+    with pytest.raises(ConnectionError):
+        retriever._send("GET", URL)
+    time.sleep(0.06)
+
+    def interrupted(url, priority):
+        raise KeyboardInterrupt()
+
+    with monkeypatch.context() as patch:
+        patch.setattr(retriever.rate_limiter, "acquire", interrupted)
+        with pytest.raises(KeyboardInterrupt):
+            retriever._send("GET", URL)
+
+    time.sleep(0.06)
+    assert retriever._send("GET", URL).status == 200
+
+
+def test_server_error_status_counts_as_failure(make_retriever, quick_breaker):
+    retriever = make_retriever(ScriptedTransport(503), max_workers=1, retry_policy=RetryPolicy(max_attempts=1))
+
+    with pytest.raises(ConnectionError):
+        retriever._send("GET", URL)
+
+    assert retriever.circuit_breaker.is_open(URL)
+
+
+def test_retry_policy_retries_until_success():
+    outcomes = [ConnectionError("down"), TimeoutError("slow"), "done"]
+    failures = list()
+
+    def call():
+        outcome = outcomes.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    assert RetryPolicy(max_attempts=3, base_delay=0.0).call(call, failures.append) == "done"
+    assert [type(e) for e in failures] == [ConnectionError, TimeoutError]
+
+
+def test_retry_policy_gives_up_after_max_attempts():
+    calls = list()
+
+    def call():
+        calls.append(1)
+        raise ConnectionError("down")
+
+    with pytest.raises(ConnectionError):
+        RetryPolicy(max_attempts=2, base_delay=0.0).call(call)
+    assert len(calls) == 2
+
+
+def test_retry_policy_does_not_retry_an_open_circuit():
+    calls = list()
+
+    def call():
+        calls.append(1)
+        raise CircuitOpenError("open")
+
+    with pytest.raises(CircuitOpenError):
+        RetryPolicy(max_attempts=3, base_delay=0.0).call(call)
+    assert len(calls) == 1
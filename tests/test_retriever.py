@@ -0,0 +1,114 @@
+import filecmp
+import os
+import shutil
+
+from utils.ProbeCache import ProbeCache
+from utils.Retriever import PdfRetriever
+from utils.Transport import FileTransport
+
+
+def recorded(website, sess: str, document: str = PdfRetriever.ANALYSIS) -> str:
+    """A helper to get the recorded file of a session."""
+    return os.path.join(website.root, "resources.motogp.com", "files", "results", str(website.year), website.race,
+                        website.category, sess, f"{document}.pdf")
+
+
+def test_retrieve_practice_files_in_session_order(website, make_retriever):
+    retriever = make_retriever(FileTransport(website.root, latency=0.02, latency_jitter=0.05), max_workers=4)
+
+    assert retriever.check_sessions_exist(website.category, website.year, website.race, website.sessions)
+    files = retriever.retrieve_practice_files(website.category, website.year, website.race, website.sessions)
+
+    assert [os.path.basename(file).split("_")[-1] for file in files] == ["FP1.pdf", "FP2.pdf", "PR.pdf"]
+    for sess, file in zip(website.sessions, files):
+        assert filecmp.cmp(file, recorded(website, sess), shallow=False)
+
+
+def test_retrieve_classification_files(website, make_retriever):
+    retriever = make_retriever(FileTransport(website.root))
+
+    files = retriever.retrieve_practice_files(website.category, website.year, website.race, website.sessions,
+                                              document=PdfRetriever.CLASSIFICATION)
+
+    for sess, file in zip(website.sessions, files):
+        assert filecmp.cmp(file, recorded(website, sess, PdfRetriever.CLASSIFICATION), shallow=False)
+
+
+def test_missing_session_is_skipped(website, make_retriever):
+    retriever = make_retriever(FileTransport(website.root))
+    sessions = ["FP1", "FP3", "PR"]
+
+    assert retriever.check_sessions_exist(website.category, website.year, website.race, sessions)
+    files = retriever.retrieve_practice_files(website.category, website.year, website.race, sessions)
+
+    assert [os.path.basename(file).split("_")[-1] for file in files] == ["FP1.pdf", "PR.pdf"]
+    assert PdfRetriever.probe_cache.get(website.year, website.race, website.category, "FP3") is False
+
+
+def test_second_load_makes_no_requests(website, make_retriever):
+    transport = FileTransport(website.root)
+    retriever = make_retriever(transport)
+    args = (website.category, website.year, website.race, website.sessions)
+    retriever.check_sessions_exist(*args)
+    first = retriever.retrieve_practice_files(*args)
+    requests = transport.request_count
+
+    retriever.check_sessions_exist(*args)
+    second = retriever.retrieve_practice_files(*args)
+
+    assert second == first
+    assert transport.request_count == requests
+
+
+def test_failures_are_retried(website, make_retriever):
+    # the seeded failures make some first attempts fail, every file still arrives within the retries
+    transport = FileTransport(website.root, failure_rate=0.3, seed=3)
+    retriever = make_retriever(transport, max_workers=1)
+
+    files = retriever.retrieve_practice_files(website.category, website.year, website.race, website.sessions)
+
+    assert len(files) == len(website.sessions)
+    assert transport.request_count > len(website.sessions)
+
+
+def test_outage_is_not_cached_as_missing(website, make_retriever):
+    race_dir = os.path.dirname(recorded(website, "RAC"))
+    os.makedirs(race_dir)
+    shutil.copy(recorded(website, "FP1", PdfRetriever.CLASSIFICATION), os.path.join(race_dir, "Classification.pdf"))
+    args = (website.category, website.year, website.race)
+    retriever = make_retriever(FileTransport(website.root, failure_rate=1.0))
+
+    assert not retriever.check_sessions_exist(*args, ["FP1"])
+    assert retriever.retrieve_race_files(*args, "RAC", "results") is None
+    assert PdfRetriever.probe_cache.get(website.year, website.race, website.category, "FP1") is None
+    assert PdfRetriever.probe_cache.get(website.year, website.race, website.category, "RAC") is None
+
+    retriever.transport = FileTransport(website.root)
+    assert retriever.check_sessions_exist(*args, ["FP1"])
+    assert retriever.retrieve_race_files(*args, "RAC", "results") is not None
+
+
+def test_missing_race_classification_is_cached(website, make_retriever):
+    transport = FileTransport(website.root)
+    retriever = make_retriever(transport)
+    args = (website.category, website.year, website.race, "RAC", "results")
+
+    assert retriever.retrieve_race_files(*args) is None
+    requests = transport.request_count
+    assert retriever.retrieve_race_files(*args) is None
+    assert transport.request_count == requests
+
+
+def test_session_index_is_trusted_before_probing(website, make_retriever, monkeypatch):
+    transport = FileTransport(website.root)
+    retriever = make_retriever(transport)
+    args = (website.category, website.year, website.race)
+    assert sorted(retriever.discover_practice_sessions(*args)) == sorted(website.sessions)
+
+    # a new process starts with a cold probe cache but reads the same session index
+    monkeypatch.setattr(PdfRetriever, "probe_cache", ProbeCache())
+    requests = transport.request_count
+    assert retriever.check_sessions_exist(*args, PdfRetriever.AUTO_SESSIONS)
+    assert not retriever.check_sessions_exist(*args, ["FP3"])
+    assert transport.request_count == requests
+    assert PdfRetriever.probe_cache.get(website.year, website.race, website.category, "FP3") is False
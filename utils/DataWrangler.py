@@ -4,12 +4,16 @@ import plotly.graph_objects as go
 import plotly.express as px
 import plotly.figure_factory as ff
 from copy import deepcopy
-from typing import List, Union, Tuple, Any, Dict
-from collections import defaultdict
+from typing import List, Union, Tuple, Any, Dict, Optional, Callable, Iterator
+import queue
+from concurrent.futures import Future, ThreadPoolExecutor
+from pandas.api.types import union_categoricals
 
 from utils.Parser import PdfParser
+from utils.ParsedCache import ParsedCache
+from utils.RaceTrace import RaceTrace
 from utils.Retriever import PdfRetriever
-from fp_analysis.Metrics import MetricsCalculator
+from fp_analysis.Metrics import HistogramIndex, MetricsCalculator, PairwiseMetrics
 
 from sklearn.datasets import make_blobs
 
@@ -18,9 +22,17 @@ class DataWrangler:
     """
     A class to manage all aspects of the data to be presented, from retrieving, parsing, combining and preparing.
     """
-    def __init__(self):
-        self.pdf_retriever = PdfRetriever()
+    def __init__(self, max_workers: int = 4, parse_workers: Optional[int] = None):
+        """
+        :param max_workers: The maximum number of session files retrieved at the same time.
+        :param parse_workers:
+            The number of processes session files are parsed in, see PdfParser.process_pool. Defaults to 1, parsing
+            in this process.
+        """
+        self.pdf_retriever = PdfRetriever(max_workers=max_workers)
+        self.parse_workers = parse_workers
         self.pdf_parser = PdfParser()
+        self.parsed_cache = ParsedCache.shared(self.pdf_retriever.cache.root, pdf_cache=self.pdf_retriever.cache)
         self.metrics_calculator = MetricsCalculator()
 
     def get_race(self, category: str, year: int, race: str, session: str) -> Union[pd.DataFrame, None]:
@@ -38,9 +50,90 @@ class DataWrangler:
         if exist:
             race_file_name = self.pdf_retriever.retrieve_race_files(category, year, race, session, "analysis")
             if race_file_name:
-                out = self.pdf_parser.parse_pdf(race_file_name, delete_if_less_than_three=False, is_race=True)
+                out = self.parsed_cache.parse(
+                    race_file_name, self.pdf_parser.parse_pdf, delete_if_less_than_three=False, is_race=True
+                )
         return out
 
+    def get_race_laps(self, category: str, year: int, race: str, session: str) -> Union[pd.DataFrame, None]:
+        """
+        A method to check if a race exists, retrieves it and parses the file into a long format lap table, each lap
+        with its lap number, see PdfParser.parse_laps. Pit in laps are kept, so a rider who pits stays in the race
+        trace, the PitIn column marks them.
+
+        :param category: The racing class for which to retrieve the race analysis.
+        :param year: The year of the desired race.
+        :param race: The race 3-letter code.
+        :param session: The race type, either RAC or SPR.
+        :return: The dataframe with one row per lap for all riders.
+        """
+        exist = self.pdf_retriever.check_sessions_exist(category, year, race, session)
+        out = None
+        if exist:
+            race_file_name = self.pdf_retriever.retrieve_race_files(category, year, race, session, "analysis")
+            if race_file_name:
+                out = self.parsed_cache.parse(
+                    race_file_name, self.pdf_parser.parse_laps, delete_if_less_than_three=False, is_race=True,
+                    keep_pit_in=True
+                )
+        return out
+
+    def iter_practice_sessions(
+            self,
+            category: str,
+            year: int,
+            race: str,
+            session: Union[List[str], str],
+            parse_func: Optional[Callable[..., Optional[pd.DataFrame]]] = None,
+            **kwargs) -> Iterator[pd.DataFrame]:
+        """
+        A method to retrieve and parse the practice sessions as a pipeline, yielding the dataframe of each session in
+        session order as soon as it is parsed. A session is parsed while the following ones are still downloading, and
+        with more than one parse worker the sessions already downloaded are parsed in a pool of processes at the same
+        time. Nothing is yielded if the sessions do not exist.
+
+        :param category: The racing class for which to retrieve the sessions.
+        :param year: The year of the desired sessions.
+        :param race: The race of the desired sessions.
+        :param session: The format of the desired sessions.
+        :param parse_func: The parse method, defaults to PdfParser.parse_pdf.
+        :param kwargs: The arguments of the parse method, defaults to those for practice sessions.
+        :return: The dataframe of each session.
+        """
+        parse_func = parse_func if parse_func is not None else self.pdf_parser.parse_pdf
+        kwargs = kwargs if kwargs else dict(delete_if_less_than_three=True, is_race=False)
+        if not self.pdf_retriever.check_sessions_exist(category, year, race, session):
+            return
+        files = self.pdf_retriever.iter_practice_files(category, year, race, session)
+        workers = self.parse_workers if self.parse_workers is not None else 1
+        if workers <= 1:
+            for file in files:
+                df = self.parsed_cache.parse(file, parse_func, **kwargs)
+                if df is not None:
+                    yield df
+            return
+
+        # the downloads are read in a thread of their own, which hands each file to a thread that looks it up in the
+        # cache and sends a miss to the shared process pool. The parses are waited on here in session order, so each
+        # session is yielded as soon as it is parsed rather than when the next download arrives
+        parse_pool = self.pdf_parser.process_pool(workers)
+        parsing: "queue.Queue[Optional[Future]]" = queue.Queue()
+
+        def submit_downloads() -> None:
+            try:
+                for file in files:
+                    parsing.put(waiters.submit(self.parsed_cache.parse, file, parse_func, parse_pool, **kwargs))
+            finally:
+                parsing.put(None)
+
+        with ThreadPoolExecutor(max_workers=workers) as waiters, ThreadPoolExecutor(max_workers=1) as downloader:
+            downloads = downloader.submit(submit_downloads)
+            for future in iter(parsing.get, None):
+                df = future.result()
+                if df is not None:
+                    yield df
+            downloads.result()
+
     def get_practice_sessions(
             self, category: str, year: int, race: str, session: Union[List[str], str]) -> Union[pd.DataFrame, None]:
         """
@@ -52,34 +145,219 @@ class DataWrangler:
         :param session: The format of the desired sessions.
         :return: The dataframe with all lap times for all riders for all practice sessions.
         """
+        session_dfs = list(self.iter_practice_sessions(category, year, race, session))
+        if not session_dfs:
+            return None
+        return pd.concat(session_dfs, ignore_index=True)
+
+    def get_practice_laps(
+            self, category: str, year: int, race: str, session: Union[List[str], str]) -> Union[pd.DataFrame, None]:
+        """
+        A method to check which sessions exist, retrieves them and parses the files into a single long format lap
+        table, see PdfParser.parse_laps.
+
+        :param category: The racing class for which to retrieve the sessions.
+        :param year: The year of the desired sessions.
+        :param race: The race of the desired sessions.
+        :param session: The format of the desired sessions.
+        :return: The dataframe with one row per lap for all riders for all practice sessions.
+        """
+        session_dfs = list(self.iter_practice_sessions(category, year, race, session, self.pdf_parser.parse_laps))
+        if not session_dfs:
+            return None
+        return self.concat_laps(session_dfs)
+
+    def get_practice_leaderboard(
+            self, category: str, year: int, race: str, session: Union[List[str], str]) -> Union[pd.DataFrame, None]:
+        """
+        A method to get the best lap of every rider in each session from the one page Classification PDFs, a quick look
+        that avoids downloading and parsing the Analysis PDFs, see PdfParser.parse_classification_pdf.
+
+        :param category: The racing class for which to retrieve the sessions.
+        :param year: The year of the desired sessions.
+        :param race: The race of the desired sessions.
+        :param session: The format of the desired sessions.
+        :return: The dataframe with the Position, Rider, Session, BestLap and Gap of each rider in each session.
+        """
         exists = self.pdf_retriever.check_sessions_exist(category, year, race, session)
         out = None
         if exists:
-            all_session_file_names = self.pdf_retriever.retrieve_practice_files(category, year, race, session)
-            final_df = pd.DataFrame()
-            for file in all_session_file_names:
-                tmp_df = self.pdf_parser.parse_pdf(file, delete_if_less_than_three=True, is_race=False)
-                final_df = pd.concat([final_df, tmp_df], ignore_index=True)
-            out = final_df
+            all_session_file_names = self.pdf_retriever.retrieve_practice_files(
+                category, year, race, session, document=self.pdf_retriever.CLASSIFICATION
+            )
+            # one page each, so starting processes would take longer than parsing them here
+            session_dfs = self.parsed_cache.parse_many(
+                all_session_file_names, self.pdf_parser.parse_classification_pdf, workers=1
+            )
+            out = self.concat_laps(session_dfs)
         return out
 
+    @staticmethod
+    def leaderboard_table(df: pd.DataFrame) -> pd.DataFrame:
+        """
+        A helper method to lay out a leaderboard with a row per rider: the best lap and gap of each session, then the
+        best lap over all sessions and the gap to the fastest rider, from the fastest rider to the slowest.
+        """
+        df = df.astype({"BestLap": np.float64, "Gap": np.float64})  # so rounding to the millisecond displays cleanly
+        best = df.pivot_table(index="Rider", columns="Session", values="BestLap", aggfunc="min", observed=True)
+        gap = df.pivot_table(index="Rider", columns="Session", values="Gap", aggfunc="min", observed=True)
+        out = pd.DataFrame(index=best.index)
+        for sess in best.columns:
+            out[sess] = best[sess].round(3)
+            out[f"{sess} Gap"] = gap[sess].round(3)
+        out["Best"] = best.min(axis=1).round(3)
+        out["Gap"] = (out["Best"] - out["Best"].min()).round(3)
+        return out.sort_values("Best")
+
     def get_race_pace_for_practice_comparison(self, year: int, race: str) -> Union[pd.DataFrame, None]:
         """
         A method to get the full Sunday race lap times to overlay on practice data for MotoGP only.
 
         :param year: The year of the desired sessions.
         :param race: The race of the desired sessions.
-        :return:
+        :return: The long format lap table of the race, with RAC as the session.
         """
         exists = self.pdf_retriever.check_sessions_exist("MotoGP", year, race, "RAC")
         out = None
         if exists:
-            race_session_file = self.pdf_retriever.retrieve_race_files(year, race, "MotoGP Race", "analysis")
-            race_df = self.pdf_parser.parse_pdf(race_session_file, delete_if_less_than_three=False, is_race=True)
-            race_df.replace("Analysis", "RAC", inplace=True)
-            out = race_df
+            race_session_file = self.pdf_retriever.retrieve_race_files("MotoGP", year, race, "RAC", "analysis")
+            if race_session_file:
+                race_df = self.parsed_cache.parse(
+                    race_session_file, self.pdf_parser.parse_laps, delete_if_less_than_three=False, is_race=True
+                )
+                race_df["Session"] = pd.Categorical(["RAC"] * len(race_df), categories=["RAC"])
+                out = race_df
         return out
 
+    @staticmethod
+    def concat_laps(dfs: List[pd.DataFrame]) -> pd.DataFrame:
+        """
+        A helper method to stack long format lap tables in one go, keeping Rider and Session categorical with the
+        categories in the order they first appear.
+        """
+        dfs = [df for df in dfs if df is not None]
+        if not dfs:
+            return pd.DataFrame()
+        for column in ("Rider", "Session"):
+            categories = union_categoricals([df[column] for df in dfs]).categories
+            dfs = [df.assign(**{column: df[column].cat.set_categories(categories)}) for df in dfs]
+        return pd.concat(dfs, ignore_index=True)
+
+    @staticmethod
+    def median_lap_time(df: pd.DataFrame) -> float:
+        """
+        A helper method to find the median of the riders' median lap times in a long format lap table. Lap times are
+        float32, so the result is rounded to a tenth of a millisecond, the median of two laps timed to the millisecond.
+        """
+        return round(float(df.groupby("Rider", observed=True)["LapTime"].median().median()), 4)
+
+    @staticmethod
+    def filter_lap_times(df: pd.DataFrame, min_value: float, max_value: float) -> pd.DataFrame:
+        """A helper method to keep only the laps between the min and max values of a long format lap table."""
+        return df[df["LapTime"].between(min_value, max_value)]
+
+    @staticmethod
+    def fastest_lap(df: pd.DataFrame) -> Tuple[float, Any]:
+        """A helper method to find the fastest lap in a long format lap table and the rider who set it."""
+        fastest = df["LapTime"].idxmin()
+        return round(float(df.at[fastest, "LapTime"]), 3), df.at[fastest, "Rider"]
+
+    @staticmethod
+    def sort_riders_by_median(df: pd.DataFrame) -> Tuple[pd.DataFrame, pd.Index]:
+        """
+        A helper method to order the riders of a long format lap table in ascending median lap time. Riders without
+        laps are dropped and the rows are sorted so riders appear in that order.
+        """
+        med = df.groupby("Rider", observed=True)["LapTime"].median().sort_values()
+        rider = df["Rider"].cat.set_categories(med.index)
+        df = df.assign(Rider=rider).sort_values("Rider", kind="stable")
+        return df, med.index
+
+    @staticmethod
+    def laps_of_riders(df: pd.DataFrame, riders: List[str]) -> pd.DataFrame:
+        """A helper method to keep only the laps of the given riders in a long format lap table."""
+        df = df[df["Rider"].isin(riders)]
+        return df.assign(Rider=df["Rider"].cat.remove_unused_categories())
+
+    @staticmethod
+    def _best_per_rider(df: pd.DataFrame, columns: List[str], fastest: bool = True) -> Tuple[pd.Index, np.ndarray]:
+        """
+        A helper method to find the best value of each column for every rider of a long format lap table at once, by
+        sorting the rows by rider and reducing each rider's block of rows. Missing values are ignored.
+
+        :param df: The long format lap table.
+        :param columns: The columns to reduce.
+        :param fastest: True to take the lowest value, e.g. a sector time, False to take the highest, e.g. a speed.
+        :return: The riders with at least one lap and a (riders, columns) array of their best values.
+        """
+        if df.empty:
+            return pd.Index([], name="Rider"), np.empty((0, len(columns)))
+        codes = df["Rider"].cat.codes.to_numpy()
+        order = np.argsort(codes, kind="stable")
+        codes = codes[order]
+        values = df[columns].to_numpy(dtype=np.float64)[order]
+        starts = np.flatnonzero(np.r_[True, codes[1:] != codes[:-1]])
+        riders = df["Rider"].cat.categories[codes[starts]]
+        return riders, (np.fmin if fastest else np.fmax).reduceat(values, starts, axis=0)
+
+    @staticmethod
+    def _rank(values: np.ndarray, fastest: bool = True) -> np.ndarray:
+        """
+        A helper method to rank the riders in each column of a (riders, columns) array, 1 being the best. Tied riders
+        share the best rank of the tie and missing values are not ranked.
+        """
+        better = values[None, :, :] < values[:, None, :] if fastest else values[None, :, :] > values[:, None, :]
+        ranks = better.sum(axis=1).astype(np.float64) + 1
+        ranks[np.isnan(values)] = np.nan
+        return ranks
+
+    def ideal_laps(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Find each rider's ideal lap, the sum of their best sector times, and compare it with their fastest lap.
+
+        :param df: The long format lap table, see PdfParser.parse_laps.
+        :return: A dataframe indexed by rider with the IdealLap, BestLap and Gap (BestLap - IdealLap) columns, from the
+            fastest ideal lap to the slowest. The ideal lap is NaN if a rider has no time for a sector.
+        """
+        riders, best = self._best_per_rider(df, list(PdfParser.sector_headings) + ["LapTime"])
+        ideal = best[:, :-1].sum(axis=1)
+        out = pd.DataFrame(
+            {"IdealLap": ideal, "BestLap": best[:, -1], "Gap": best[:, -1] - ideal}, index=riders
+        ).round(3)
+        out.index.name = "Rider"
+        return out.sort_values("IdealLap")
+
+    def sector_ranking(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Rank every rider's best time in each sector.
+
+        :param df: The long format lap table, see PdfParser.parse_laps.
+        :return: A dataframe indexed by rider with each rider's best time for each sector, e.g. T1, and their rank in
+            that sector, e.g. T1Rank, ordered by the sum of the ranks.
+        """
+        sectors = list(PdfParser.sector_headings)
+        riders, best = self._best_per_rider(df, sectors)
+        ranks = self._rank(best)
+        out = pd.DataFrame(np.round(best, 3), index=riders, columns=sectors)
+        for i, sector in enumerate(sectors):
+            out[f"{sector}Rank"] = ranks[:, i]
+        out.index.name = "Rider"
+        rank_sum = np.where(np.isnan(ranks).all(axis=1), np.inf, np.nansum(ranks, axis=1))
+        return out.iloc[np.argsort(rank_sum, kind="stable")]
+
+    def speed_trap_ranking(self, df: pd.DataFrame) -> pd.DataFrame:
+        """
+        Rank the riders by the highest top speed they reached on any lap.
+
+        :param df: The long format lap table, see PdfParser.parse_laps.
+        :return: A dataframe indexed by rider with the TopSpeed and Rank columns, from the fastest rider to the slowest.
+        """
+        riders, best = self._best_per_rider(df, ["TopSpeed"], fastest=False)
+        out = pd.DataFrame({"TopSpeed": np.round(best[:, 0], 1), "Rank": self._rank(best, fastest=False)[:, 0]},
+                           index=riders)
+        out.index.name = "Rider"
+        return out.sort_values(["Rank", "TopSpeed"], ascending=[True, False])
+
     @staticmethod
     def vertically_concat_dataframes(df1: pd.DataFrame, df2: pd.DataFrame) -> pd.DataFrame:
         """A helper method to concatenate two dataframes across rows (stacking vertically)."""
@@ -172,20 +450,37 @@ class DataWrangler:
         return df[df.columns[0]]
 
     @staticmethod
-    def gap_between_column_and_dataframe(df: pd.DataFrame, column: pd.Series) -> pd.DataFrame:
-        """A helper method to find the difference between a series and each column of a dataframe."""
-        out_df = pd.DataFrame()
-        for col in df.columns:
-            out_df[col] = column - df[col]
-        cumulative_out_df = out_df.cumsum()
-        cumulative_out_df.reset_index(inplace=True)
-        return cumulative_out_df
+    def race_laps_by_rider(df: pd.DataFrame) -> pd.DataFrame:
+        """
+        A helper method to lay out a lap table from get_race_laps as a column of lap times per rider and a row per lap,
+        for the box and violin plots. The pit in laps are left out as they are not race pace.
+
+        :param df: The long format lap table with the Rider, Lap, LapTime and PitIn columns.
+        :return: The lap times indexed by lap, the riders in the order of the table.
+        """
+        if "PitIn" in df.columns:
+            df = df[~df["PitIn"]]
+        riders = list(df["Rider"].cat.categories) if isinstance(df["Rider"].dtype, pd.CategoricalDtype) \
+            else list(pd.unique(df["Rider"]))
+        wide = df.pivot(index="Lap", columns="Rider", values="LapTime")
+        wide.columns = wide.columns.astype(object)
+        return wide.reindex(columns=riders).dropna(axis="columns", how="all")
+
+    @staticmethod
+    def race_trace(df: pd.DataFrame) -> RaceTrace:
+        """
+        A helper method to work out the race time, gap, position and interval of every rider on every lap, from a lap
+        table from get_race_laps or a column of lap times per rider.
+        """
+        if {"Rider", "Lap", "LapTime"}.issubset(df.columns):
+            return RaceTrace.from_laps(df)
+        return RaceTrace.from_wide(df)
 
     @staticmethod
     def plotly_strip_chart(df: pd.DataFrame, x_name: str, y_name: str, colour: str):
         """A helper method to create a plotly strip chart and order the y axis."""
         fig = px.strip(df, x=x_name, y=y_name, color=colour)
-        y_axes_order = np.flip(df["Riders"].unique())
+        y_axes_order = np.flip(np.asarray(df[y_name].unique()))
         fig.update_yaxes(categoryorder="array", categoryarray=y_axes_order)
         return fig
 
@@ -194,6 +489,11 @@ class DataWrangler:
         """A helper method to create box plots. Data in the columns is set as the y-axis value."""
         return px.box(df, y=df.columns, hover_data=[df.index])
 
+    @staticmethod
+    def plotly_lap_box_plot(df: pd.DataFrame):
+        """A helper method to create a box plot per rider from a long format lap table."""
+        return px.box(df, x="Rider", y="LapTime", hover_data=["Session", "Lap"])
+
     @staticmethod
     def plotly_distribution_plot(data: List[Union[np.ndarray, List]], labels: List[str], show_histogram: bool):
         """A helper method to create a histogram."""
@@ -211,8 +511,8 @@ class DataWrangler:
         """A helper method to make a stacked violin plot for the given labels."""
         fig = go.Figure()
         for label in labels:
-            fig.add_trace(go.Violin(x=df["Riders"][df["Riders"] == label],
-                                    y=df["LapTimes"][df["Riders"] == label],
+            fig.add_trace(go.Violin(x=df["Rider"][df["Rider"] == label],
+                                    y=df["LapTime"][df["Rider"] == label],
                                     name=label,
                                     box_visible=True,
                                     meanline_visible=True,
@@ -235,31 +535,103 @@ class DataWrangler:
         """A helper method to create a plotly line chart with markers."""
         return px.line(df, x=x_values, y=y_values, color=colour, markers=True)
 
+    @staticmethod
+    def plotly_race_trace_chart(df: pd.DataFrame, y_values: str):
+        """
+        A helper method to create a line per rider over the laps of a race trace, see RaceTrace.to_frame. The y axis is
+        reversed so the leader, the smallest gap or position, is at the top.
+        """
+        fig = px.line(df, x="Lap", y=y_values, color="Rider", markers=True, hover_data=["Position", "Interval"])
+        fig.update_yaxes(autorange="reversed")
+        return fig
+
     def relative_freq_hist_calculation(self, df: pd.DataFrame, low_bin: float, high_bin: float, bin_num: int) -> Dict:
-        """A helper method to find the relative frequency of each riders' laps."""
+        """A helper method to find the relative frequency of each riders' laps from a long format lap table."""
         out_dict = dict()
-        for col in df.columns:
-            values = df[col].dropna().values
+        for rider, values in df.groupby("Rider", observed=True, sort=False)["LapTime"]:
             res = self.metrics_calculator.relative_frequency_histogram(
-                arr=values, bin_bounds=(low_bin, high_bin), num_of_bins=bin_num
+                arr=values.values, bin_bounds=(low_bin, high_bin), num_of_bins=bin_num
             )
-            out_dict[col] = res
+            out_dict[rider] = res
         return out_dict
 
     def bhattacharyya_coefficients(self, data: Dict) -> Dict:
         """A helper method to calculate Bhattacharyya coefficients."""
-        rider_coeffs = defaultdict(list)
-        for rider_a, ra_rel_freqs in data.items():
-            for rider_b, rb_rel_freqs in data.items():
-                if rider_a == rider_b:
-                    b_c = 0
-                else:
-                    b_c = self.metrics_calculator.calculate_bhattacharyya_coefficient(
-                        p=ra_rel_freqs[0],
-                        q=rb_rel_freqs[0]
-                    )
-                rider_coeffs[rider_a].append(b_c)
-        return rider_coeffs
+        coeffs = self.metrics_calculator.bhattacharyya_coefficient_matrix(
+            np.array([rel_freqs[0] for rel_freqs in data.values()])
+        )
+        np.fill_diagonal(coeffs, 0)
+        return {rider: list(row) for rider, row in zip(data, coeffs)}
+
+    @staticmethod
+    def _rider_groups(df: pd.DataFrame) -> Tuple[List[str], np.ndarray]:
+        """A helper method to number the riders of a long format lap table in the order they appear."""
+        riders = df["Rider"].astype("category").cat.remove_unused_categories()
+        # number the riders in the order they appear, as the heatmap has always shown them
+        order = pd.unique(riders.cat.codes.to_numpy())
+        codes = np.empty(len(riders.cat.categories), dtype=np.int64)
+        codes[order] = np.arange(len(order))
+        return list(riders.cat.categories[order].astype(str)), codes[riders.cat.codes.to_numpy()]
+
+    def pairwise_metrics(self, df: pd.DataFrame, low_bin: float, high_bin: float, bin_num: int) -> PairwiseMetrics:
+        """
+        A method to bin the lap times of every rider once, from a long format lap table, ready to compare every pair of
+        riders with any of the PairwiseMetrics. The Wasserstein distance uses the laps inside the bins, so slow laps
+        outside the bins are left out of every metric.
+
+        :param df: The long format lap table.
+        :param low_bin: The lower bound of the bins.
+        :param high_bin: The upper bound of the bins.
+        :param bin_num: The number of bins.
+        :return: The pairwise metrics, with the riders in the order they appear.
+        """
+        labels, groups = self._rider_groups(df)
+        lap_times = df["LapTime"].to_numpy(dtype=np.float64)
+        frequencies = self.metrics_calculator.relative_frequency_matrix(
+            arr=lap_times, groups=groups, num_of_groups=len(labels), bin_bounds=(low_bin, high_bin), num_of_bins=bin_num
+        )
+        in_bins = (lap_times >= low_bin) & (lap_times <= high_bin)
+        by_rider = np.lexsort((lap_times[in_bins], groups[in_bins]))
+        bounds = np.cumsum(np.bincount(groups[in_bins], minlength=len(labels)))[:-1]
+        samples = np.split(lap_times[in_bins][by_rider], bounds) if labels else list()
+        return PairwiseMetrics(labels, frequencies, samples)
+
+    def histogram_index(self, df: pd.DataFrame) -> HistogramIndex:
+        """
+        A method to build the cumulative count of every rider's laps on a 1 ms grid, from a long format lap table. The
+        pairwise metrics for any tolerance and bin width are then worked out from it without going through the laps
+        again, see HistogramIndex.pairwise_metrics.
+
+        :param df: The long format lap table.
+        :return: The histogram index, with the riders in the order they appear.
+        """
+        labels, groups = self._rider_groups(df)
+        return HistogramIndex(labels, df["LapTime"].to_numpy(dtype=np.float64), groups)
+
+    @staticmethod
+    def metric_matrix(pairwise: PairwiseMetrics, metric: str) -> pd.DataFrame:
+        """
+        A helper method to lay out one metric of every pair of riders for plotly_heatmap. A rider's Bhattacharyya
+        coefficient with themself is set to 0 so it does not dominate the heatmap.
+        """
+        matrix = pairwise.matrix(metric).copy()
+        if metric == PairwiseMetrics.BHATTACHARYYA:
+            np.fill_diagonal(matrix, 0)
+        return pd.DataFrame(matrix, index=pd.Index(pairwise.labels, name="Rider"), columns=pairwise.labels)
+
+    def bhattacharyya_matrix(self, df: pd.DataFrame, low_bin: float, high_bin: float, bin_num: int) -> pd.DataFrame:
+        """
+        A method to find how similar the lap times of every pair of riders are, from a long format lap table. All riders
+        are binned into one relative frequency matrix, and the Bhattacharyya coefficients of every pair come from one
+        matrix product. A rider's coefficient with themself is set to 0 so it does not dominate the heatmap.
+
+        :param df: The long format lap table.
+        :param low_bin: The lower bound of the bins.
+        :param high_bin: The upper bound of the bins.
+        :param bin_num: The number of bins.
+        :return: The coefficients, with a row and a column per rider in the order they appear.
+        """
+        return self.metric_matrix(self.pairwise_metrics(df, low_bin, high_bin, bin_num), PairwiseMetrics.BHATTACHARYYA)
 
 
 if __name__ == "__main__":
@@ -268,38 +640,31 @@ if __name__ == "__main__":
     year = 2024
     race = "ES3"
     session = ["FP1", "FP2", "FP3", "FP4", "FP5", "FP6", "FP7", "FP8", "FP9"]
-    practice_df = dw.get_practice_sessions(category, year, race, session)
+    practice_df = dw.get_practice_laps(category, year, race, session)
     race_df = dw.get_race_pace_for_practice_comparison(year, race)
-    combined_df = dw.vertically_concat_dataframes(practice_df, race_df)
+    combined_df = dw.concat_laps([practice_df, race_df])
 
-    sess_df = dw.copy_df(combined_df["Session"])
-    data_df = dw.drop_column(combined_df, "Session")
-
-    med_value = dw.median_of_all_columns(data_df)
+    med_value = dw.median_lap_time(combined_df)
     min_lap = med_value * 0.9
     max_lap = med_value * 1.3
-    masked_df = dw.mask_df(data_df, min_lap, max_lap)
+    masked_df = dw.filter_lap_times(combined_df, min_lap, max_lap)
 
-    fastest_lap, fastest_rider = dw.minimum_of_all_columns(masked_df)
+    fastest_lap, fastest_rider = dw.fastest_lap(masked_df)
     print(f"Fastest lap was {fastest_lap} by {fastest_rider}")
 
-    sorted_df, riders = dw.sort_by_median(masked_df)
-
-    with_sess_df = dw.horizontally_concat_dataframes(sorted_df, sess_df)
-
-    melt_with_sess_df = dw.melt_on_session(with_sess_df)
+    sorted_df, riders = dw.sort_riders_by_median(masked_df)
 
     centers = [[1, 1], [-1, -1], [1.5, -1.5]]
     X, labels_true = make_blobs(
         n_samples=750, centers=centers, cluster_std=[0.4, 0.1, 0.75], random_state=0
     )
-    d = np.expand_dims(melt_with_sess_df["LapTimes"].values, axis=1)
+    d = np.expand_dims(sorted_df["LapTime"].values, axis=1)
     b = 2
     #
-    # plotly_strip_fig = dw.plotly_strip_chart(melt_with_sess_df, "LapTimes", "Riders", "Session")
+    # plotly_strip_fig = dw.plotly_strip_chart(sorted_df, "LapTime", "Rider", "Session")
     # # plotly_strip_fig.show()
     #
-    # plotly_box_fig = dw.plotly_box_plot(sorted_df)
+    # plotly_box_fig = dw.plotly_lap_box_plot(sorted_df)
     # # plotly_box_fig.show()
     #
     # selected_riders = dw.get_column_names(sorted_df)
@@ -323,11 +688,8 @@ if __name__ == "__main__":
     # raw_df = dw.get_race(year, race, category)
     # data_df = dw.drop_column(raw_df, "Session")
     #
-    # winner = dw.values_of_first_column(data_df)
-    # gap_df = dw.gap_between_column_and_dataframe(data_df, winner)
-    # melt_gap_df = dw.melt_on_lap(gap_df, list(dw.get_column_names(data_df)))
-    # melt_gap_df = dw.rename_columns(melt_gap_df, {"index": "Lap", "variable": "Rider", "value": "Gap"})
-    # line_fig = dw.plotly_line_chart(melt_gap_df, "Lap", "Gap", "Rider")
+    # trace_df = dw.race_trace(data_df).to_frame()
+    # line_fig = dw.plotly_race_trace_chart(trace_df, "Gap")
     # line_fig.show()
     #
     # violin_fig = dw.plotly_standard_violin(data_df, list(dw.get_column_names(data_df)))
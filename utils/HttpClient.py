@@ -0,0 +1,108 @@
+import threading
+import urllib3
+from typing import Dict, Iterator, Optional
+
+from urllib3.exceptions import HTTPError, MaxRetryError, NewConnectionError, TimeoutError as Urllib3TimeoutError
+
+from utils.Transport import Transport, TransportResponse
+
+
+class HttpResponse(TransportResponse):
+    """
+    A streamed response from the HttpClient. The body is read in chunks with iter_content, and the connection goes
+    back to the pool when the response is closed, so use it as a context manager.
+    """
+    def __init__(self, response: urllib3.BaseHTTPResponse, chunk_size: int):
+        super().__init__(response.status, response.headers)
+        self._response = response
+        self._chunk_size = chunk_size
+
+    def iter_content(self) -> Iterator[bytes]:
+        """
+        Stream the body of the response.
+
+        :return: An iterator over the chunks of the body.
+        """
+        try:
+            for chunk in self._response.stream(self._chunk_size):
+                yield chunk
+        except Urllib3TimeoutError as e:
+            raise TimeoutError(f"Timed out reading {self._response.geturl()}") from e
+        except HTTPError as e:
+            raise ConnectionError(f"Connection lost reading {self._response.geturl()}") from e
+
+    def close(self) -> None:
+        """Read any remainder of the body and return the connection to the pool."""
+        self._response.drain_conn()
+        self._response.release_conn()
+
+    def abort(self) -> None:
+        """Close the connection without reading the rest of the body, so it is not kept alive for another request."""
+        self._response.close()
+        self._response.release_conn()
+
+
+class HttpClient(Transport):
+    """
+    A thread-safe HTTP client which keeps connections alive in a pool per host, so repeated requests to motogp.com and
+    resources.motogp.com skip the TCP and TLS handshakes.
+    """
+    _shared = None
+    _shared_lock = threading.Lock()
+
+    def __init__(
+            self,
+            connect_timeout: float = 5.0,
+            read_timeout: float = 30.0,
+            pool_size: int = 8,
+            chunk_size: int = 64 * 1024):
+        """
+        :param connect_timeout: The number of seconds to wait for a connection to be established.
+        :param read_timeout: The number of seconds to wait for data from an established connection.
+        :param pool_size: The number of connections kept alive for each host.
+        :param chunk_size: The number of bytes read at a time when streaming a body.
+        """
+        self.chunk_size = chunk_size
+        self._pool = urllib3.PoolManager(
+            num_pools=4,
+            maxsize=pool_size,
+            timeout=urllib3.Timeout(connect=connect_timeout, read=read_timeout),
+            # no retries here, only follow redirects
+            retries=urllib3.Retry(total=None, connect=0, read=0, status=0, other=0, redirect=5),
+            headers={"User-Agent": "score-tracking"}
+        )
+
+    @classmethod
+    def shared(cls) -> "HttpClient":
+        """
+        Get the client shared by everything in the process, creating it on first use.
+
+        :return: The shared client.
+        """
+        with cls._shared_lock:
+            if cls._shared is None:
+                cls._shared = cls()
+            return cls._shared
+
+    def request(self, method: str, url: str, headers: Optional[Dict[str, str]] = None) -> HttpResponse:
+        """
+        Send a request without reading the body.
+
+        :param method: The HTTP method, e.g. GET or HEAD.
+        :param url: The URL to request.
+        :param headers: Any extra request headers.
+        :return: The streamed response.
+        """
+        try:
+            response = self._pool.request(method, url, headers=headers, preload_content=False)
+        except MaxRetryError as e:
+            # a refused connection is a subclass of a connect timeout in urllib3
+            if isinstance(e.reason, Urllib3TimeoutError) and not isinstance(e.reason, NewConnectionError):
+                raise TimeoutError(f"Timed out connecting to {url}") from e
+            raise ConnectionError(f"Could not connect to {url}") from e
+        except Urllib3TimeoutError as e:
+            raise TimeoutError(f"Timed out requesting {url}") from e
+        except HTTPError as e:
+            raise ConnectionError(f"Could not connect to {url}") from e
+
+        return HttpResponse(response, self.chunk_size)
@@ -0,0 +1,233 @@
+import os
+import json
+import hashlib
+import tempfile
+import threading
+from concurrent.futures import Executor
+from typing import Callable, Dict, List, Optional, Tuple
+
+import pandas as pd
+
+from utils.Parser import PdfParser
+from utils.PdfCache import PdfCache
+
+
+class ParsedCache:
+    """
+    An on-disk cache of parsed PDFs, so a PDF that has already been parsed is read back from a Feather file instead of
+    being parsed with fitz again.
+
+    Entries are keyed by the SHA-256 hash of the PDF's content, its file name (the session is taken from it), the
+    parse method and its arguments, and PdfParser.version. An updated PDF or a new parser version therefore misses the
+    cache rather than returning stale data.
+
+    Each file is named after the hash of its PDF and the parser version, so the files of an older parser version and,
+    given the PDF cache, those whose PDF has been evicted from it are removed. Least recently used files are then
+    evicted once the cache grows past its byte budget.
+    """
+    dir_name = "parsed"
+    _shared = dict()
+    _shared_lock = threading.Lock()
+
+    def __init__(self, root: str, max_bytes: int = 128 * 1024 * 1024, pdf_cache: Optional[PdfCache] = None):
+        """
+        :param root: The directory the parsed folder is kept in, usually the PDF cache directory.
+        :param max_bytes: The byte budget of the cache, least recently used files are removed to stay under it.
+        :param pdf_cache:
+            The cache the PDFs are kept in. If given, a parsed PDF is removed once its PDF is no longer in the cache.
+        """
+        self.root = os.path.join(root, self.dir_name)
+        self.max_bytes = max_bytes
+        self.pdf_cache = pdf_cache
+        os.makedirs(self.root, exist_ok=True)
+        self._hashes: Dict[str, Tuple[int, int, str]] = dict()  # path: (size, modified time, sha256)
+        self._lock = threading.Lock()
+        self._evict()
+
+    @classmethod
+    def shared(cls, root: str, **kwargs) -> "ParsedCache":
+        """
+        Get the parsed cache kept in a directory, creating it on first use.
+
+        :param root: The directory the parsed folder is kept in.
+        :param kwargs: Passed on to __init__ when the cache is created.
+        :return: The cache for the directory.
+        """
+        key = os.path.abspath(root)
+        with cls._shared_lock:
+            if key not in cls._shared:
+                cls._shared[key] = cls(root, **kwargs)
+            return cls._shared[key]
+
+    def content_hash(self, file: str) -> str:
+        """
+        Get the SHA-256 hash of a file, remembering it until the file's size or modified time changes.
+
+        :param file: The path to the file.
+        :return: The hex digest.
+        """
+        stat = os.stat(file)
+        with self._lock:
+            known = self._hashes.get(file)
+        if known is not None and known[:2] == (stat.st_size, stat.st_mtime_ns):
+            return known[2]
+        sha256 = hashlib.sha256()
+        with open(file, "rb") as pdf_file:
+            for chunk in iter(lambda: pdf_file.read(1024 * 1024), b""):
+                sha256.update(chunk)
+        with self._lock:
+            self._hashes[file] = (stat.st_size, stat.st_mtime_ns, sha256.hexdigest())
+        return sha256.hexdigest()
+
+    def path(self, file: str, parse_name: str, kwargs: Dict) -> str:
+        """
+        A helper method to get the path of the Feather file for a parsed PDF.
+
+        :param file: The path to the PDF.
+        :param parse_name: The name of the parse method.
+        :param kwargs: The arguments of the parse method.
+        :return: The path of the Feather file.
+        """
+        content_hash = self.content_hash(file)
+        key = json.dumps([content_hash, os.path.basename(file), parse_name, kwargs, PdfParser.version], sort_keys=True)
+        name = f"{content_hash}_{PdfParser.version}_{hashlib.sha256(key.encode()).hexdigest()}.feather"
+        return os.path.join(self.root, name)
+
+    def load(self, path: str) -> Optional[pd.DataFrame]:
+        """
+        Read a parsed PDF from the cache.
+
+        :param path: The path of the Feather file.
+        :return: The dataframe, or None if it is not cached or cannot be read.
+        """
+        if not os.path.isfile(path):
+            return None
+        try:
+            df = pd.read_feather(path)
+            # the modified time is the last access, for eviction
+            os.utime(path)
+            return df
+        except (OSError, ValueError) as e:
+            print(f"Parsed cache file {path} could not be read, it will be parsed again: {e}")
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            return None
+
+    def save(self, path: str, df: pd.DataFrame) -> None:
+        """
+        Write a parsed PDF into the cache atomically. A dataframe Feather cannot hold is not cached.
+
+        :param path: The path of the Feather file.
+        :param df: The parsed PDF.
+        """
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        os.close(fd)
+        try:
+            df.to_feather(tmp_path)
+            os.replace(tmp_path, path)
+        except (ValueError, TypeError) as e:
+            print(f"Not caching {path}: {e}")
+        finally:
+            if os.path.isfile(tmp_path):
+                os.remove(tmp_path)
+        self._evict(keep=path)
+
+    def total_bytes(self) -> int:
+        """A helper method to get the size of all files in the cache."""
+        return sum(entry.stat().st_size for entry in os.scandir(self.root) if entry.name.endswith(".feather"))
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        """
+        Remove the files of an older parser version, those whose PDF is no longer in the PDF cache, then the least
+        recently used files until the cache is within its byte budget.
+
+        :param keep: A file that must not be removed, e.g. the one just written.
+        """
+        live_hashes = self.pdf_cache.hashes() if self.pdf_cache is not None else None
+        with self._lock:
+            kept = list()
+            total = 0
+            for entry in os.scandir(self.root):
+                if not entry.name.endswith(".feather"):
+                    continue
+                content_hash, _, rest = entry.name[:-len(".feather")].partition("_")
+                version = rest.rpartition("_")[0]
+                stale = version != PdfParser.version or (live_hashes is not None and content_hash not in live_hashes)
+                if stale and entry.path != keep:
+                    self._remove(entry.path)
+                    continue
+                try:
+                    stat = entry.stat()
+                except FileNotFoundError:
+                    continue
+                kept.append((stat.st_mtime, entry.path, stat.st_size))
+                total += stat.st_size
+            for _, path, size in sorted(kept):
+                if total <= self.max_bytes:
+                    break
+                if path == keep:
+                    continue
+                self._remove(path)
+                total -= size
+
+    @staticmethod
+    def _remove(path: str) -> None:
+        """A helper method to remove a file from the cache, if it is still there."""
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+    def parse(
+            self,
+            file: str,
+            parse_func: Callable[..., Optional[pd.DataFrame]],
+            executor: Optional[Executor] = None,
+            **kwargs) -> Optional[pd.DataFrame]:
+        """
+        Get a parsed PDF from the cache, parsing and caching it on a miss.
+
+        :param file: The path to the PDF.
+        :param parse_func: The parse method, e.g. PdfParser.parse_pdf, called with the file and kwargs on a miss.
+        :param executor: The executor to parse in on a miss, e.g. a process pool, otherwise it is parsed in this thread.
+        :param kwargs: The arguments of the parse method.
+        :return: The dataframe returned by the parse method.
+        """
+        path = self.path(file, parse_func.__name__, kwargs)
+        df = self.load(path)
+        if df is None:
+            if executor is None:
+                df = parse_func(file, **kwargs)
+            else:
+                df = executor.submit(parse_func, file, **kwargs).result()
+            if df is not None:
+                self.save(path, df)
+        return df
+
+    def parse_many(
+            self,
+            files: List[str],
+            parse_func: Callable[..., Optional[pd.DataFrame]],
+            workers: Optional[int] = None,
+            **kwargs) -> List[Optional[pd.DataFrame]]:
+        """
+        Get many parsed PDFs from the cache, parsing the ones missing in a pool of processes and caching them.
+
+        :param files: The paths to the PDFs.
+        :param parse_func: The parse method, e.g. PdfParser.parse_pdf.
+        :param workers: The number of processes used for the files missing from the cache, see PdfParser.parse_many.
+        :param kwargs: The arguments of the parse method.
+        :return: The dataframe of each file, in the same order as files.
+        """
+        paths = [self.path(file, parse_func.__name__, kwargs) for file in files]
+        out = [self.load(path) for path in paths]
+        missing = [i for i, df in enumerate(out) if df is None]
+        if missing:
+            parsed = PdfParser().parse_many([files[i] for i in missing], workers, parse_func, **kwargs)
+            for i, df in zip(missing, parsed):
+                out[i] = df
+                if df is not None:
+                    self.save(paths[i], df)
+        return out
@@ -1,8 +1,30 @@
+import os
 import fitz
 import re
+import math
+import bisect
+import threading
+import multiprocessing
+import numpy as np
 import pandas as pd
 
-from typing import Optional
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+
+class LapRecord(NamedTuple):
+    """
+    A single lap of a rider as read from an analysis PDF.
+    """
+    rider: str
+    stint: int  # counts from 1 and goes up each time the rider comes out of the pits
+    lap_number: int
+    lap_time: float  # in seconds, NaN for an unfinished lap
+    pit_in: bool  # the lap ended in the pit lane
+    unfinished: bool
+    sectors: Tuple[float, ...] = (math.nan,) * 4  # T1 to T4 in seconds, NaN where a sector time is missing
+    speed: float = math.nan  # the top speed of the lap in km/h
 
 
 class PdfParser:
@@ -11,9 +33,84 @@ class PdfParser:
     available for use via a Pandas dataframe.
     """
 
+    # Bump whenever the output of a parse method changes, so results cached by ParsedCache are parsed again
+    version = "5"
+
+    # Everything of interest in an analysis PDF, matched in a single pass over the text:
+    # - a rider: nationality three-letter code proceeds the name, the rider first names start with a capital, surnames
+    #   are all uppercase and position (1st, 2nd, 3rd, ...) always follows
+    # - a pit entry marker, which ends a stint
+    # - an unfinished lap, which ends the useful laps of a stint
+    # - a lap time and lap number, only accepting laps that are in the 1-2 min range incl., noting a lap followed by a
+    #   pit entry marker as a pit in lap, then the sector times and top speed of the lap that follow it. The plain text
+    #   does not say which sector cell is empty, so the sector times are only kept when all four are there
+    # The lookahead lets the scan skip most characters without trying each alternative. Each alternative is a named
+    # group that closes last, so lastgroup tells which one matched
+    token_pattern = re.compile(
+        r"(?=[A-Zu\s])(?:"
+        r"(?P<rider>[A-Z]{3}\s[\w\s]+\s\d{1,2}[stndrh]{2,})"
+        r"|(?P<pit>\nP\n)"
+        r"|(?P<unfinished>unfinished(?:\s(?P<unfinished_lap>\d{1,2})(?=\s))?)"
+        r"|(?P<lap>\s(?P<minutes>[1-2])'(?P<seconds>\d\d.\d\d\d)\s(?P<lap_number>\d{1,2})(?P<pit_in>\nP(?=\n))?"
+        r"(?P<sectors>(?:\s\d{1,2}\.\d{3}\*?){1,4})?(?:\s(?P<speed>\d{2,3}\.\d)\*?)?(?=\s)))"
+    )
+    sector_pattern = re.compile(r"(\d{1,2}\.\d{3})\*?")
+    speed_pattern = re.compile(r"(\d{2,3}\.\d)\*?")
+
+    # Ways of reading the text of an analysis PDF: as plain text matched by token_pattern, or as words placed in the
+    # columns of the lap table by their x-coordinate
+    TEXT = "text"
+    WORDS = "words"
+
+    # The headings of the lap table columns holding the lap time, lap number, sector times and top speed, and the pit
+    # entry marker cell
+    time_heading = "Time"
+    lap_heading = "Lap"
+    sector_headings = ("T1", "T2", "T3", "T4")
+    speed_heading = "Speed"
+    pit_marker = "P"
+    # The headings of a race Classification table and the columns they are read into, the label of the riders who
+    # were not classified and the start of the lines under the table
+    results_headings = {
+        "Pos.": "Position", "Rider": "Rider", "Num": "Number", "Nation": "Nation", "Team": "Team", "Time": "Time",
+        "Points": "Points"
+    }
+    results_position_heading = "Pos."
+    results_rider_heading = "Rider"
+    not_classified_label = "not classified"
+    results_footers = ("Fastest Lap", "Circuit Record", "Circuit Best")
+    race_time_pattern = re.compile(r"(?:(\d):)?(\d{1,2})'(\d\d\.\d\d\d)")
+    points_pattern = re.compile(r"\d{1,2}(?:\.\d)?")
+    nation_pattern = re.compile(r"[A-Z]{3}")
+    position_pattern = re.compile(r"\d{1,2}[stndrh]{2,}")
+    lap_time_pattern = re.compile(r"([1-2])'(\d\d.\d\d\d)")
+    lap_number_pattern = re.compile(r"\d{1,2}")
+
+    # the pools of processes shared by everything in the process, one for each number of workers, see process_pool
+    _pools: Dict[int, ProcessPoolExecutor] = dict()
+    _pools_lock = threading.Lock()
+
     def __init__(self):
         self.threshold = 1000
 
+    @classmethod
+    def process_pool(cls, workers: Optional[int] = None) -> ProcessPoolExecutor:
+        """
+        Get a pool of processes shared by everything in the process, creating it on first use and keeping it for the
+        life of the process. The processes are started with spawn rather than fork, as a forked child of a process
+        running threads, like the Streamlit server, can inherit a lock held by another thread and hang.
+
+        :param workers: The number of processes, defaults to the number of CPUs.
+        :return: The pool.
+        """
+        workers = workers if workers is not None else os.cpu_count() or 1
+        with cls._pools_lock:
+            if workers not in cls._pools:
+                cls._pools[workers] = ProcessPoolExecutor(
+                    max_workers=workers, mp_context=multiprocessing.get_context("spawn")
+                )
+            return cls._pools[workers]
+
     @staticmethod
     def _min_to_seconds(laptime: str) -> float:
         """
@@ -51,7 +148,313 @@ class PdfParser:
         split_lap = lap_time.split("\n")
         return split_lap[1]
 
-    def parse_pdf(self, file: str, delete_if_less_than_three: bool, is_race: bool) -> pd.DataFrame:
+    def _iter_tokens(self, file: str) -> Iterator[List[re.Match]]:
+        """
+        Read an analysis PDF one page at a time and yield the matches of token_pattern on each page.
+
+        The last match of a page may continue on the next page, e.g. a lap followed by a pit entry marker, so the text
+        from it onwards is carried over and matched again together with the next page.
+
+        :param file: The file path including file name and extension to the session file.
+        :return: An iterator of lists of matches, in the order they appear.
+        """
+        carried = ""
+        with fitz.Document(file) as doc:
+            for page in doc:
+                text = carried + page.get_text()
+                tokens = list(self.token_pattern.finditer(text))
+                if not tokens:
+                    carried = text
+                    continue
+                carried = text[tokens[-1].start():]
+                del tokens[-1]
+                yield tokens
+        yield list(self.token_pattern.finditer(carried))
+
+    def _sectors(self, cells: List[str]) -> Tuple[float, ...]:
+        """
+        Convert the sector time cells of a lap into seconds, ignoring a best sector marker.
+
+        :param cells: The text of the sector cells in order, an empty string for a missing cell.
+        :return: A time for every sector heading, NaN for a missing or unreadable cell.
+        """
+        sectors = [math.nan] * len(self.sector_headings)
+        for i, cell in enumerate(cells[:len(sectors)]):
+            sector_match = self.sector_pattern.fullmatch(cell)
+            if sector_match:
+                sectors[i] = float(sector_match.group(1))
+        return tuple(sectors)
+
+    def _iter_text_events(self, file: str) -> Iterator[Tuple[str, Optional[object], float, bool, Tuple, float]]:
+        """
+        Turn the tokens of an analysis PDF's plain text into events for _iter_rider_blocks.
+
+        :param file: The file path including file name and extension to the session file.
+        :return: An iterator of (kind, rider name or lap number, lap time, pit in, sector times, top speed) events.
+        """
+        no_sectors = (math.nan,) * len(self.sector_headings)
+        for tokens in self._iter_tokens(file):
+            for token in tokens:
+                kind = token.lastgroup
+                if kind == "lap":  # by far the most common token so check it first
+                    minutes, seconds, lap_number, pit_in, sectors, speed = token.group(
+                        "minutes", "seconds", "lap_number", "pit_in", "sectors", "speed"
+                    )
+                    sector_cells = sectors.split() if sectors else list()
+                    yield (
+                        "lap", int(lap_number), round(int(minutes) * 60 + float(seconds), 3), pit_in is not None,
+                        self._sectors(sector_cells) if len(sector_cells) == len(self.sector_headings) else no_sectors,
+                        float(speed) if speed else math.nan
+                    )
+                    if pit_in is not None:  # the lap took the pit entry marker with it
+                        yield "pit", None, math.nan, False, no_sectors, math.nan
+                elif kind == "rider":
+                    yield "rider", self._trim_names(token.group(kind)), math.nan, False, no_sectors, math.nan
+                elif kind == "pit":
+                    yield "pit", None, math.nan, False, no_sectors, math.nan
+                else:
+                    lap_number = token.group("unfinished_lap")
+                    yield (
+                        "unfinished", int(lap_number) if lap_number else None, math.nan, False, no_sectors, math.nan
+                    )
+
+    @staticmethod
+    def _page_rows(page: fitz.Page, y_tolerance: float = 2.0, clip: Optional[fitz.Rect] = None) \
+            -> List[List[Tuple[float, float, str]]]:
+        """
+        Group the words on a page into cells and the cells into rows by their position.
+
+        A cell is a line of text as found by fitz, e.g. "Rider SURNAME" or "1'39.206", and cells whose vertical centres
+        are within y_tolerance of each other are in the same row.
+
+        :param page: The page to read.
+        :param y_tolerance: The largest vertical distance between the centres of cells in the same row, in points.
+        :param clip: Only read the words inside this rectangle, the whole page if None.
+        :return: The rows from top to bottom, each a list of (x0, x1, text) cells from left to right.
+        """
+        cells = dict()
+        for x0, y0, x1, y1, word, block_no, line_no, _ in page.get_text("words", clip=clip):
+            cell = cells.get((block_no, line_no))
+            if cell is None:
+                cells[(block_no, line_no)] = [(y0 + y1) / 2, x0, x1, word]
+            else:  # words of a line come from left to right
+                cell[2] = x1
+                cell[3] += " " + word
+
+        rows = list()
+        row_y = -math.inf
+        for y, x0, x1, text in sorted(cells.values()):
+            if y - row_y > y_tolerance:
+                rows.append(list())
+                row_y = y
+            rows[-1].append((x0, x1, text))
+        for row in rows:
+            row.sort()
+        return rows
+
+    def _iter_table(self, file: str) -> Iterator[Tuple[str, Optional[Dict[str, str]]]]:
+        """
+        Read the lap tables of an analysis PDF by the position of the words on each page.
+
+        The columns are found from the x-coordinates of the headings of each rider's table, e.g. Time, Lap, T1, T2, T3,
+        T4 and Speed, and every cell of a row is placed in the column with the nearest heading. A pit entry marker is
+        kept under the key "P".
+
+        :param file: The file path including file name and extension to the session file.
+        :return: An iterator of (rider name, {column heading: cell text}) for every row of every rider's lap table,
+            with None in place of the cells for the row naming the rider.
+        """
+        rider = None
+        headings: List[str] = list()
+        bounds: List[float] = list()  # the x-coordinates half way between the centres of neighbouring headings
+        with fitz.Document(file) as doc:
+            for page in doc:
+                for row in self._page_rows(page):
+                    texts = [text for _, _, text in row]
+                    if self.time_heading in texts and self.lap_heading in texts:
+                        headings = texts
+                        bounds = self._column_bounds(row)
+                        continue
+                    name = self._row_rider(texts)
+                    if name is not None:
+                        rider = name
+                        headings = list()  # each rider's table has its own headings
+                        yield rider, None
+                        continue
+                    if rider is None or not headings:
+                        continue
+                    cells = dict()
+                    for x0, x1, text in row:
+                        if text == self.pit_marker:
+                            cells[self.pit_marker] = text
+                            continue
+                        heading = headings[bisect.bisect(bounds, (x0 + x1) / 2)]
+                        cells[heading] = cells[heading] + " " + text if heading in cells else text
+                    yield rider, cells
+
+    @staticmethod
+    def _column_bounds(heading_row: List[Tuple[float, float, str]]) -> List[float]:
+        """
+        A helper method to find the x-coordinates half way between the centres of neighbouring headings of a table, so
+        a cell belongs to the heading at index bisect(bounds, centre of the cell).
+        """
+        centres = [(x0 + x1) / 2 for x0, x1, _ in heading_row]
+        return [(left + right) / 2 for left, right in zip(centres[:-1], centres[1:])]
+
+    def iter_table_rows(self, file: str) -> Iterator[Tuple[str, Dict[str, str]]]:
+        """
+        Read every row of every rider's lap table from an analysis PDF, keeping all of the columns, e.g. the sector
+        times and speed as well as the lap time and lap number.
+
+        :param file: The file path including file name and extension to the session file.
+        :return: An iterator of (rider name, {column heading: cell text}), in the order the rows appear.
+        """
+        for rider, cells in self._iter_table(file):
+            if cells is not None:
+                yield rider, cells
+
+    def _row_rider(self, texts: List[str]) -> Optional[str]:
+        """
+        Find the rider named in a row: the nationality three-letter code is followed by the name and the position (1st,
+        2nd, 3rd, ...) comes later in the row.
+
+        :param texts: The text of the cells of a row from left to right.
+        :return: The rider's name, or None if the row does not name a rider.
+        """
+        for i, text in enumerate(texts[:-2]):
+            if self.nation_pattern.fullmatch(text):
+                if any(self.position_pattern.fullmatch(later) for later in texts[i + 2:]):
+                    return texts[i + 1]
+                return None
+        return None
+
+    def _iter_word_events(self, file: str) -> Iterator[Tuple[str, Optional[object], float, bool, Tuple, float]]:
+        """
+        Turn the lap table rows of an analysis PDF into events for _iter_rider_blocks.
+
+        :param file: The file path including file name and extension to the session file.
+        :return: An iterator of (kind, rider name or lap number, lap time, pit in, sector times, top speed) events.
+        """
+        no_sectors = (math.nan,) * len(self.sector_headings)
+        for rider, cells in self._iter_table(file):
+            if cells is None:
+                yield "rider", rider, math.nan, False, no_sectors, math.nan
+                continue
+            lap_time = cells.get(self.time_heading, "")
+            lap_number = cells.get(self.lap_heading, "")
+            lap_number = int(lap_number) if self.lap_number_pattern.fullmatch(lap_number) else None
+            pit_in = self.pit_marker in cells
+            lap_time_match = self.lap_time_pattern.fullmatch(lap_time)
+            if lap_time_match and lap_number is not None:
+                minutes, seconds = lap_time_match.groups()
+                speed_match = self.speed_pattern.fullmatch(cells.get(self.speed_heading, ""))
+                yield (
+                    "lap", lap_number, round(int(minutes) * 60 + float(seconds), 3), pit_in,
+                    self._sectors([cells.get(heading, "") for heading in self.sector_headings]),
+                    float(speed_match.group(1)) if speed_match else math.nan
+                )
+            elif lap_time.startswith("unfinished"):
+                yield "unfinished", lap_number, math.nan, False, no_sectors, math.nan
+            if pit_in:
+                yield "pit", None, math.nan, False, no_sectors, math.nan
+
+    def _iter_rider_blocks(self, file: str, extraction: str = TEXT) -> Iterator[Tuple[str, List[LapRecord], int]]:
+        """
+        Group the laps of an analysis PDF into riders, yielding each rider as soon as the next one is found.
+
+        :param file: The file path including file name and extension to the session file.
+        :param extraction: TEXT to match the plain text of each page, or WORDS to read the lap table by position.
+        :return: An iterator of (rider name, lap records, number of stints), in the order the riders appear.
+        """
+        if extraction == self.TEXT:
+            events = self._iter_text_events(file)
+        elif extraction == self.WORDS:
+            events = self._iter_word_events(file)
+        else:
+            raise ValueError(f"Unknown extraction {extraction}, use {self.TEXT} or {self.WORDS}")
+
+        rider = None  # all data before the first rider only contains circuit information
+        laps = list()
+        stint = 1
+        stint_unfinished = False
+        for kind, value, lap_time, pit_in, sectors, speed in events:
+            if kind == "lap":
+                if rider is None or stint_unfinished:
+                    continue  # the rest of the stint after an unfinished lap is ignored
+                laps.append(LapRecord(rider, stint, value, lap_time, pit_in, False, sectors, speed))
+            elif kind == "rider":
+                if rider is not None:
+                    yield rider, laps, stint
+                rider = value
+                laps = list()
+                stint = 1
+                stint_unfinished = False
+            elif rider is None:
+                continue
+            elif kind == "pit":
+                stint += 1
+                stint_unfinished = False
+            elif not stint_unfinished:
+                stint_unfinished = True
+                laps.append(LapRecord(
+                    rider, stint, value if value is not None else (laps[-1].lap_number + 1 if laps else 1),
+                    math.nan, False, True
+                ))
+        if rider is not None:
+            yield rider, laps, stint
+
+    def iter_lap_records(self, file: str, extraction: str = TEXT) -> Iterator[LapRecord]:
+        """
+        Read every lap of every rider from an analysis PDF, including out laps, pit in laps and unfinished laps.
+
+        :param file: The file path including file name and extension to the session file.
+        :param extraction: TEXT to match the plain text of each page, or WORDS to read the lap table by position.
+        :return: An iterator of lap records, in the order they appear.
+        """
+        for _, laps, _ in self._iter_rider_blocks(file, extraction):
+            yield from laps
+
+    @staticmethod
+    def _select_laps(laps: List[LapRecord], number_of_stints: int, is_race: bool, keep_pit_in: bool = False) \
+            -> List[LapRecord]:
+        """
+        Pick out the laps to analyse from a rider's laps.
+
+        Unfinished laps are always left out, and pit in laps unless keep_pit_in is set for a race. In a practice
+        session the out lap of each stint and the lap before the pit in lap of each stint except the last are left out
+        too.
+
+        :param laps: The rider's lap records.
+        :param number_of_stints: The number of stints of the rider.
+        :param is_race: If the session is a race then use all laps, do not ignore in/out laps.
+        :param keep_pit_in: In a race, keep the pit in laps too, so every lap the rider completed is there.
+        :return: The laps to analyse, in order.
+        """
+        if is_race:
+            return [lap for lap in laps if (keep_pit_in or not lap.pit_in) and not lap.unfinished]
+        stint_laps: Dict[int, List[LapRecord]] = dict()
+        for lap in laps:
+            if not lap.pit_in and not lap.unfinished:
+                stint_laps.setdefault(lap.stint, list()).append(lap)
+        selected = list()
+        for stint, stint_lap_list in stint_laps.items():
+            selected.extend(stint_lap_list[1:] if stint == number_of_stints else stint_lap_list[1:-1])
+        return selected
+
+    def iter_rider_laps(self, file: str, is_race: bool, extraction: str = TEXT) -> Iterator[Tuple[str, List[float]]]:
+        """
+        Read an analysis PDF one page at a time and yield each rider's lap times as soon as their section is complete.
+
+        :param file: The file path including file name and extension to the session file.
+        :param is_race: If the session is a race then use all laps, do not ignore in/out laps.
+        :param extraction: TEXT to match the plain text of each page, or WORDS to read the lap table by position.
+        :return: An iterator of (rider name, lap times in seconds), in the order the riders appear.
+        """
+        for rider, laps, number_of_stints in self._iter_rider_blocks(file, extraction):
+            yield rider, [lap.lap_time for lap in self._select_laps(laps, number_of_stints, is_race)]
+
+    def parse_pdf(self, file: str, delete_if_less_than_three: bool, is_race: bool, extraction: str = TEXT) \
+            -> pd.DataFrame:
         """
         This method accepts a PDF and returns a dataframe with all riders and their lap times and tyre information.
 
@@ -59,55 +462,12 @@ class PdfParser:
         :param delete_if_less_than_three:
             Delete the rider's lap times if only less than three laps exist. Only useful for practice sessions.
         :param is_race: If the session is a race then use all laps, do not ignore in/out laps.
+        :param extraction: TEXT to match the plain text of each page, or WORDS to read the lap table by position.
         :return: a dataframe
         """
-        with fitz.Document(file) as doc:
-            text = ""
-            for page in doc:
-                text += page.get_text()
-
-        # Nationality three-letter code proceeds the name, the rider first names start with a capital, surnames are all
-        # uppercase and position (1st, 2nd, 3rd, ...) always follows
-        rider_name_pattern = r"[A-Z]{3}\s{1}[\w\s]+\s\d{1,2}[stndrh]{2,}"
-        riders_with_position = re.findall(rider_name_pattern, text)
-        riders_names_only = list()
-        for rider in riders_with_position:
-            riders_names_only.append(self._trim_names(rider))
-
-        # split the text on the rider names to get each rider's lap time info
-        rider_data = re.split(rider_name_pattern, text)  # text data from each rider
-        rider_data.pop(0)  # delete all data before the first rider as it only contains circuit information
-
-        # ignore pit in laps
-        lap_time_pattern = r"\s[1-2]'\d\d.\d\d\d\s\d{1,2}\s"  # only accept laps that are in the 1-2 min range incl.
-        rider_lap_times = list()  # must be same length as rider_names_only
-        for lap_time_string in rider_data:
-            stint_times = re.split(r"\nP\n", lap_time_string)  # split lap times on pit entries
-            number_of_stints = len(stint_times)
-            lap_time_float = list()
-            for i, times in enumerate(stint_times):
-                if i == number_of_stints - 1:  # last stint so get all times
-                    # check for unfinished laps and ignore them
-                    unfinished_idx = times.find("unfinished")
-                    if unfinished_idx != -1:
-                        times = times[:unfinished_idx]
-                    # ignore out lap if it is a practise session, not if it is a race
-                    rider_lap_time_string = \
-                        re.findall(lap_time_pattern, times) if is_race else re.findall(lap_time_pattern, times)[1:]
-                else:
-                    # check for unfinished laps and ignore them
-                    unfinished_idx = times.find("unfinished")
-                    if unfinished_idx != -1:
-                        times = times[:unfinished_idx]
-                    # remove the first and last times as they are out lap and pit in lap unless it is a race
-                    rider_lap_time_string = \
-                        re.findall(lap_time_pattern, times) if is_race else re.findall(lap_time_pattern, times)[1:-1]
-                # rider_lap_time_string = re.findall(lap_time_pattern, lap_time_string)
-                temp_laps = [self._min_to_seconds(self._trim_laptimes(lap)) for lap in rider_lap_time_string]
-                lap_time_float.extend(temp_laps)
-            rider_lap_times.append(lap_time_float)
-
-        rider_and_lap_time_dict = dict(zip(riders_names_only, rider_lap_times))
+        rider_and_lap_time_dict = dict()
+        for rider_name, rider_lap_times in self.iter_rider_laps(file, is_race, extraction):
+            rider_and_lap_time_dict[rider_name] = rider_lap_times
 
         if delete_if_less_than_three:
             # check that each rider has at least 3 laps
@@ -124,52 +484,215 @@ class PdfParser:
 
         return rider_and_lap_time_df
 
+    def parse_laps(self, file: str, delete_if_less_than_three: bool, is_race: bool, extraction: str = TEXT,
+                   keep_pit_in: bool = False) -> pd.DataFrame:
+        """
+        This method accepts a PDF and returns the same laps as parse_pdf as a compact long format table, one row per
+        lap: Rider and Session are categorical, Stint and Lap are int16, LapTime, the sector times T1 to T4 in seconds
+        and TopSpeed in km/h are float32 with NaN where a cell is missing, and PitIn is True for a lap ending in the
+        pit lane.
+
+        :param file: The file path including file name and extension to the session file.
+        :param delete_if_less_than_three:
+            Delete the rider's lap times if only less than three laps exist. Only useful for practice sessions.
+        :param is_race: If the session is a race then use all laps, do not ignore in/out laps.
+        :param extraction: TEXT to match the plain text of each page, or WORDS to read the lap table by position.
+        :param keep_pit_in: In a race, keep the pit in laps too, e.g. for the race trace where a missing lap would stop
+            the rider's race time.
+        :return: a dataframe with the Rider, Session, Stint, Lap, LapTime, T1, T2, T3, T4, TopSpeed and PitIn columns
+        """
+        rider_laps: Dict[str, List[LapRecord]] = dict()
+        for rider, laps, number_of_stints in self._iter_rider_blocks(file, extraction):
+            rider_laps[rider] = self._select_laps(laps, number_of_stints, is_race, keep_pit_in)
+        if delete_if_less_than_three:
+            rider_laps = {rider: laps for rider, laps in rider_laps.items() if len(laps) >= 3}
+
+        selected = [lap for laps in rider_laps.values() for lap in laps]
+        session = file.split("_")[-1][:-4]
+        sectors = np.array([lap.sectors for lap in selected], dtype=np.float32).reshape(-1, len(self.sector_headings))
+        columns = {
+            "Rider": pd.Categorical([lap.rider for lap in selected], categories=list(rider_laps)),
+            "Session": pd.Categorical([session] * len(selected), categories=[session]),
+            "Stint": np.array([lap.stint for lap in selected], dtype=np.int16),
+            "Lap": np.array([lap.lap_number for lap in selected], dtype=np.int16),
+            "LapTime": np.array([lap.lap_time for lap in selected], dtype=np.float32)
+        }
+        for i, heading in enumerate(self.sector_headings):
+            columns[heading] = sectors[:, i]
+        columns["TopSpeed"] = np.array([lap.speed for lap in selected], dtype=np.float32)
+        columns["PitIn"] = np.array([lap.pit_in for lap in selected], dtype=bool)
+        return pd.DataFrame(columns)
+
+    @staticmethod
+    def _is_rider_name(text: str) -> bool:
+        """
+        A helper method to tell if a cell holds a rider's name: a first name with lower case letters and a surname in
+        upper case, e.g. Fabio DI GIANNANTONIO.
+        """
+        words = text.split()
+        return len(words) >= 2 and not words[0].isupper() and words[-1].isupper()
+
+    def parse_classification_pdf(self, file: str) -> pd.DataFrame:
+        """
+        This method accepts a practice session Classification PDF, one page with the best lap of each rider, and
+        returns a leaderboard. It is much quicker than parsing the Analysis PDF when only the best laps are needed.
+
+        A rider's row is found from the first cell holding a rider's name and the cell holding a lap time, and the
+        riders without a lap time are left out.
+
+        :param file: The file path including file name and extension to the Classification file.
+        :return: a dataframe with the Position, Rider, Session, BestLap and Gap (to the fastest rider) columns, in
+            seconds
+        """
+        riders = list()
+        best_laps = list()
+        with fitz.Document(file) as doc:
+            for page in doc:
+                for row in self._page_rows(page):
+                    texts = [text for _, _, text in row]
+                    rider = next((text for text in texts if self._is_rider_name(text)), None)
+                    lap_time_match = next(
+                        (match for match in map(self.lap_time_pattern.fullmatch, texts) if match is not None), None
+                    )
+                    if rider is None or lap_time_match is None or rider in riders:
+                        continue
+                    minutes, seconds = lap_time_match.groups()
+                    riders.append(rider)
+                    best_laps.append(round(int(minutes) * 60 + float(seconds), 3))
+
+        session = file.split("_")[-1][:-4]
+        best_laps = np.array(best_laps, dtype=np.float64)
+        order = np.argsort(best_laps, kind="stable")
+        return pd.DataFrame({
+            "Position": np.arange(1, len(riders) + 1, dtype=np.int16),
+            "Rider": pd.Categorical(np.array(riders, dtype=object)[order], categories=riders),
+            "Session": pd.Categorical([session] * len(riders), categories=[session]),
+            "BestLap": best_laps[order].astype(np.float32),
+            "Gap": np.round(best_laps[order] - best_laps[order][:1], 3).astype(np.float32)
+        })
+
+    def parse_many(
+            self,
+            files: List[str],
+            workers: Optional[int] = None,
+            parse_func: Optional[Callable[..., Optional[pd.DataFrame]]] = None,
+            **kwargs) -> List[Optional[pd.DataFrame]]:
+        """
+        Parse many PDFs in the shared pool of processes, see process_pool. Parsing is CPU bound and holds the GIL, so
+        threads would not help.
+
+        :param files: The file paths including file names and extensions.
+        :param workers: The number of processes, defaults to the number of CPUs. With one worker or one file the files
+            are parsed in this process.
+        :param parse_func:
+            The parse method, defaults to parse_pdf. Use parse_race_results_pdf for race Classification PDFs.
+        :param kwargs: The arguments of the parse method, e.g. delete_if_less_than_three and is_race for parse_pdf.
+        :return: The result of each file, in the same order as files.
+        """
+        parse_func = parse_func if parse_func is not None else self.parse_pdf
+        workers = min(workers if workers is not None else os.cpu_count() or 1, len(files))
+        if workers <= 1:
+            return [parse_func(file, **kwargs) for file in files]
+        return list(self.process_pool(workers).map(partial(parse_func, **kwargs), files))
+
+    def _results_clip(self, page: fitz.Page) -> Tuple[fitz.Rect, bool]:
+        """
+        A helper method to find the region of a page holding the race Classification table: from its headings, or the
+        top of the page if they are not repeated, down to the first line under the table.
+
+        :param page: The page to read.
+        :return: The clip rectangle and True if it starts with the headings.
+        """
+        textpage = page.get_textpage()
+        heading_hits = page.search_for(self.results_position_heading, textpage=textpage)
+        top = heading_hits[0].y0 - 1 if heading_hits else page.rect.y0
+        bottom = page.rect.y1
+        for footer in self.results_footers:
+            for hit in page.search_for(footer, textpage=textpage):
+                if top < hit.y0 < bottom:
+                    bottom = hit.y0
+        return fitz.Rect(page.rect.x0, top, page.rect.x1, bottom), bool(heading_hits)
+
+    def parse_race_classification_pdf(self, file: str) -> pd.DataFrame:
+        """
+        This method accepts a race Classification PDF and returns every rider in it, classified or not, reading only
+        the region of each page that holds the table.
+
+        The columns are found from the x-coordinates of the table's headings, so a missing cell, e.g. no points or no
+        time for a lapped rider, does not move the rest of the row.
+
+        :param file: The file path including file name and extension to the race Classification file.
+        :return: a dataframe with the Position, Rider, Number, Nation, Team, Time (the race time in seconds, NaN if the
+            rider was lapped or not classified), Points and Classified columns, in the order of the results
+        """
+        columns = {column: list() for column in self.results_headings.values()}
+        classified = list()
+        headings: List[Optional[str]] = list()
+        bounds: List[float] = list()
+        is_classified = True
+        with fitz.Document(file) as doc:
+            for page in doc:
+                clip, has_headings = self._results_clip(page)
+                for row in self._page_rows(page, clip=clip):
+                    texts = [text for _, _, text in row]
+                    if has_headings and self.results_position_heading in texts and self.results_rider_heading in texts:
+                        headings = [self.results_headings.get(text) for text in texts]
+                        bounds = self._column_bounds(row)
+                        continue
+                    if any(text.lower() == self.not_classified_label for text in texts):
+                        is_classified = False
+                        continue
+                    if not headings:
+                        continue
+                    cells = dict()
+                    for x0, x1, text in row:
+                        heading = headings[bisect.bisect(bounds, (x0 + x1) / 2)]
+                        if heading is not None:
+                            cells[heading] = cells[heading] + " " + text if heading in cells else text
+                    if not self._is_rider_name(cells.get("Rider", "")):
+                        continue
+                    for column in columns:
+                        columns[column].append(cells.get(column, ""))
+                    position = cells.get("Position", "")
+                    classified.append(bool(is_classified and self.lap_number_pattern.fullmatch(position)))
+
+        times = list()
+        for cell in columns["Time"]:
+            time_match = self.race_time_pattern.fullmatch(cell)
+            if time_match:
+                hours, minutes, seconds = time_match.groups()
+                times.append(round(int(hours or 0) * 3600 + int(minutes) * 60 + float(seconds), 3))
+            else:
+                times.append(math.nan)
+        return pd.DataFrame({
+            "Position": pd.array(
+                [int(cell) if is_pos else None for cell, is_pos in zip(columns["Position"], classified)], dtype="Int16"
+            ),
+            "Rider": columns["Rider"],
+            "Number": pd.array(
+                [int(cell) if cell.isdigit() else None for cell in columns["Number"]], dtype="Int16"
+            ),
+            "Nation": columns["Nation"],
+            "Team": columns["Team"],
+            "Time": np.array(times, dtype=np.float64),
+            "Points": np.array(
+                [float(cell) if self.points_pattern.fullmatch(cell) else 0.0 for cell in columns["Points"]],
+                dtype=np.float32
+            ),
+            "Classified": np.array(classified, dtype=bool)
+        })
+
     @staticmethod
-    def parse_race_results_pdf(file: str) -> Optional[pd.DataFrame]:
+    def parse_race_results_pdf(file: Optional[str]) -> Optional[pd.DataFrame]:
         """
         This method accepts a PDF and returns a dataframe with all riders and their points scored.
 
         :param file: The file path including file name and extension to the race results file.
-        :return: a dataframe
+        :return: a dataframe with the Position, Points and Rider of each rider who scored points, or None if there is
+            no file
         """
         if file is None:
             return None
-        with fitz.Document(file) as doc:
-            text = doc[0].get_text()
-
-        race_time_pattern = r"\d\d'\d\d.\d\d\d"
-        points_data = re.split(race_time_pattern, text)
-        points_dict = dict()
-
-        for i, rider in enumerate(points_data):
-            if "Not classified" in rider:
-                print("No more classified riders")
-                break
-            words = rider.split("\n")
-            points_idx = -3
-            if i == 0:
-                rider_idx = -7
-            else:
-                rider_idx = -8
-            rname = words[rider_idx]
-            points_str = words[points_idx]
-            # p_string = points_data[i + 1]
-            # p_words = p_string.split("\n")
-            # idx = 2 if i == 0 else 3  # cope with no value for gap for the winning rider
-            # points_str = p_words[idx]
-            if len(words) > 10:
-                try:
-                    points_flt = float(points_str)
-                    points_dict[rname] = [points_flt]
-                except ValueError:
-                    print(f"No points left in {file}")
-                    break
-            else:
-                break
-
-        df = pd.DataFrame.from_dict(points_dict, orient='index', columns=["Points"])
-        df.reset_index(names=["Rider"], inplace=True)
-        df.reset_index(names=["Position"], inplace=True)
-        df = df[["Position", "Points", "Rider"]]
-        df["Position"] = df["Position"] + 1
-        return df
+        results = PdfParser().parse_race_classification_pdf(file)
+        df = results[results["Points"] > 0][["Position", "Points", "Rider"]].reset_index(drop=True)
+        return df.astype({"Position": np.int64, "Points": np.float64})
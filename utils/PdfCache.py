@@ -0,0 +1,320 @@
+import os
+import json
+import time
+import hashlib
+import tempfile
+import threading
+from typing import Dict, Iterable, Optional, Set
+
+
+class PdfCache:
+    """
+    An on-disk cache for the PDFs downloaded from the MotoGP website.
+
+    A manifest in the cache directory records, for each file, the URL it came from, its size, its SHA-256 hash and the
+    ETag/Last-Modified validators sent by the server. Files are written to a temporary file and renamed into place, so
+    a file is only ever visible once complete, and a file that does not match its manifest entry is never served: the
+    size is checked on every lookup and the hash on the first lookup of the file in the process. Least recently used
+    files are evicted once the cache grows past its byte budget.
+
+    The first time a directory is used, before it has a manifest, the PDFs already in it are adopted if complete and
+    removed otherwise.
+    """
+    manifest_name = "manifest.json"
+    _shared = dict()
+    _shared_lock = threading.Lock()
+
+    def __init__(
+            self,
+            root: Optional[str] = None,
+            max_bytes: int = 512 * 1024 * 1024,
+            revalidate: bool = False,
+            revalidate_after: float = 6 * 3600.0):
+        """
+        :param root:
+            The cache directory. Defaults to the SCORE_TRACKING_PDF_CACHE environment variable if set, otherwise the
+            static folder of the app.
+        :param max_bytes: The byte budget of the cache, least recently used files are removed to stay under it.
+        :param revalidate:
+            If True, cached files older than revalidate_after are checked with a conditional request so updated
+            official PDFs are picked up.
+        :param revalidate_after: The number of seconds after which a cached file is checked with the server again.
+        """
+        if root is None:
+            root = os.environ.get("SCORE_TRACKING_PDF_CACHE", r"../score-tracking/static/")
+        self.root = root
+        self.max_bytes = max_bytes
+        self.revalidate = revalidate
+        self.revalidate_after = revalidate_after
+
+        os.makedirs(self.root, exist_ok=True)
+        self._lock = threading.RLock()
+        self._manifest_path = os.path.join(self.root, self.manifest_name)
+        has_manifest = os.path.isfile(self._manifest_path)
+        self._entries: Dict[str, Dict] = self._read_manifest()
+        self._verified: Set[str] = set()  # the files whose hash has been checked by this process
+        self._last_save = time.time()
+        if not has_manifest:
+            self._adopt_existing()
+
+    @classmethod
+    def shared(cls, root: Optional[str] = None, **kwargs) -> "PdfCache":
+        """
+        Get the cache instance for a directory, creating it on first use, so that everything in the process agrees on
+        the contents of the manifest.
+
+        :param root: The cache directory, see __init__.
+        :param kwargs: Passed on to __init__ when the cache is created.
+        :return: The cache for the directory.
+        """
+        if root is None:
+            root = os.environ.get("SCORE_TRACKING_PDF_CACHE", r"../score-tracking/static/")
+        key = os.path.abspath(root)
+        with cls._shared_lock:
+            if key not in cls._shared:
+                cls._shared[key] = cls(root=root, **kwargs)
+            return cls._shared[key]
+
+    def path(self, name: str) -> str:
+        """A helper method to get the local path of a cached file."""
+        return os.path.join(self.root, name)
+
+    @staticmethod
+    def _file_hash(file_path: str) -> str:
+        """A helper method to get the SHA-256 hash of a file."""
+        sha256 = hashlib.sha256()
+        with open(file_path, "rb") as in_file:
+            for chunk in iter(lambda: in_file.read(1024 * 1024), b""):
+                sha256.update(chunk)
+        return sha256.hexdigest()
+
+    def _adopt_existing(self) -> None:
+        """
+        Add the PDFs downloaded into the directory before the cache kept a manifest, then write the manifest. A PDF is
+        adopted if it ends with the %%EOF marker and removed otherwise, as those downloads were not written atomically
+        and may have been cut short.
+        """
+        with self._lock:
+            for dir_entry in os.scandir(self.root):
+                if not dir_entry.is_file() or not dir_entry.name.lower().endswith(".pdf"):
+                    continue
+                stat = dir_entry.stat()
+                with open(dir_entry.path, "rb") as in_file:
+                    in_file.seek(max(0, stat.st_size - 1024))
+                    complete = b"%%EOF" in in_file.read()
+                if not complete:
+                    print(f"Removing incomplete file {dir_entry.name} from the PDF cache")
+                    os.remove(dir_entry.path)
+                    continue
+                self._entries[dir_entry.name] = {
+                    "url": None,
+                    "size": stat.st_size,
+                    "sha256": self._file_hash(dir_entry.path),
+                    "etag": None,
+                    "last_modified": None,
+                    "fetched": stat.st_mtime,
+                    "last_access": stat.st_mtime
+                }
+                self._verified.add(dir_entry.name)
+            self._evict()
+            self._save_manifest()
+
+    def _read_manifest(self) -> Dict[str, Dict]:
+        """A helper method to read the manifest from disk, returning no entries if it is missing or unreadable."""
+        try:
+            with open(self._manifest_path, "r") as json_file:
+                return json.load(json_file)
+        except (OSError, ValueError):
+            return dict()
+
+    def _save_manifest(self) -> None:
+        """
+        Write the manifest atomically. Entries written by another process since it was read are kept, the most
+        recently used copy of an entry wins.
+        """
+        on_disk = self._read_manifest()
+        for name, entry in on_disk.items():
+            current = self._entries.get(name)
+            if current is None:
+                if os.path.isfile(self.path(name)):
+                    self._entries[name] = entry
+            elif entry["last_access"] > current["last_access"] and entry["sha256"] == current["sha256"]:
+                current["last_access"] = entry["last_access"]
+
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".tmp")
+        with os.fdopen(fd, "w") as json_file:
+            json.dump(self._entries, json_file, indent=1)
+        os.replace(tmp_path, self._manifest_path)
+        self._last_save = time.time()
+
+    def lookup(self, name: str) -> Optional[str]:
+        """
+        Find a complete copy of a file in the cache. Its size is checked against the manifest, and its hash too the
+        first time it is looked up by this process.
+
+        :param name: The name of the cached file.
+        :return: The local path of the file, or None if it is not cached or does not match its manifest entry.
+        """
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is None:
+                return None
+            file_path = self.path(name)
+            try:
+                size = os.path.getsize(file_path)
+            except OSError:
+                size = -1
+            matches = size == entry["size"]
+            if matches and name not in self._verified:
+                matches = self._file_hash(file_path) == entry["sha256"]
+                if matches:
+                    self._verified.add(name)
+            if not matches:
+                print(f"Cached file {name} is incomplete, corrupt or missing, it will be downloaded again")
+                if size != -1:
+                    os.remove(file_path)
+                del self._entries[name]
+                self._verified.discard(name)
+                self._save_manifest()
+                return None
+            entry["last_access"] = time.time()
+            if entry["last_access"] - self._last_save > 60:
+                self._save_manifest()
+        return file_path
+
+    def entry(self, name: str) -> Optional[Dict]:
+        """
+        Get a copy of the manifest entry for a file.
+
+        :param name: The name of the cached file.
+        :return: The entry with the url, size, sha256, etag, last_modified, fetched and last_access keys, or None.
+        """
+        with self._lock:
+            entry = self._entries.get(name)
+            return dict(entry) if entry is not None else None
+
+    def needs_revalidation(self, name: str) -> bool:
+        """
+        Check if a cached file should be confirmed with the server before it is used.
+
+        :param name: The name of the cached file.
+        :return: True if revalidation is enabled and the file was last confirmed too long ago.
+        """
+        if not self.revalidate:
+            return False
+        with self._lock:
+            entry = self._entries.get(name)
+            return entry is None or time.time() - entry["fetched"] > self.revalidate_after
+
+    def validators(self, name: str) -> Dict[str, str]:
+        """
+        Get the headers for a conditional request for a cached file.
+
+        :param name: The name of the cached file.
+        :return: The If-None-Match and/or If-Modified-Since headers, empty if nothing is known about the file.
+        """
+        headers = dict()
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None:
+                if entry.get("etag"):
+                    headers["If-None-Match"] = entry["etag"]
+                if entry.get("last_modified"):
+                    headers["If-Modified-Since"] = entry["last_modified"]
+        return headers
+
+    def mark_validated(self, name: str) -> None:
+        """
+        Record that the server confirmed the cached file is still current.
+
+        :param name: The name of the cached file.
+        """
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None:
+                entry["fetched"] = time.time()
+                self._save_manifest()
+
+    def store(
+            self,
+            name: str,
+            url: str,
+            chunks: Iterable[bytes],
+            etag: Optional[str] = None,
+            last_modified: Optional[str] = None) -> str:
+        """
+        Write a file into the cache. The chunks are written to a temporary file which is renamed into place only once
+        all of them have been written.
+
+        :param name: The name of the cached file.
+        :param url: The URL the file was downloaded from.
+        :param chunks: The body of the file.
+        :param etag: The ETag header of the response, if any.
+        :param last_modified: The Last-Modified header of the response, if any.
+        :return: The local path of the file.
+        """
+        sha256 = hashlib.sha256()
+        size = 0
+        fd, tmp_path = tempfile.mkstemp(dir=self.root, suffix=".part")
+        try:
+            with os.fdopen(fd, "wb") as out_file:
+                for chunk in chunks:
+                    out_file.write(chunk)
+                    sha256.update(chunk)
+                    size += len(chunk)
+            os.replace(tmp_path, self.path(name))
+        except BaseException:
+            if os.path.isfile(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+        now = time.time()
+        with self._lock:
+            self._entries[name] = {
+                "url": url,
+                "size": size,
+                "sha256": sha256.hexdigest(),
+                "etag": etag,
+                "last_modified": last_modified,
+                "fetched": now,
+                "last_access": now
+            }
+            self._verified.add(name)
+            self._evict(keep=name)
+            self._save_manifest()
+
+        return self.path(name)
+
+    def total_bytes(self) -> int:
+        """A helper method to get the size of all files in the cache."""
+        with self._lock:
+            return sum(entry["size"] for entry in self._entries.values())
+
+    def hashes(self) -> Set[str]:
+        """A helper method to get the SHA-256 hashes of all files in the cache."""
+        with self._lock:
+            return {entry["sha256"] for entry in self._entries.values()}
+
+    def _evict(self, keep: Optional[str] = None) -> None:
+        """
+        Remove the least recently used files until the cache is within its byte budget.
+
+        :param keep: A file that must not be removed, e.g. the one just written.
+        """
+        total = sum(entry["size"] for entry in self._entries.values())
+        if total <= self.max_bytes:
+            return
+        by_last_access = sorted(self._entries.items(), key=lambda item: item[1]["last_access"])
+        for name, entry in by_last_access:
+            if total <= self.max_bytes:
+                break
+            if name == keep:
+                continue
+            try:
+                os.remove(self.path(name))
+            except FileNotFoundError:
+                pass
+            del self._entries[name]
+            self._verified.discard(name)
+            total -= entry["size"]
+            print(f"Evicted {name} from the PDF cache")
@@ -0,0 +1,164 @@
+import argparse
+from concurrent.futures import Executor, ThreadPoolExecutor, as_completed
+from typing import Dict, List, Optional, Tuple
+
+from tqdm import tqdm
+
+from utils.Parser import PdfParser
+from utils.ParsedCache import ParsedCache
+from utils.PdfCache import PdfCache
+from utils.RaceNames import RaceResources
+from utils.RateLimiter import RateLimiter
+from utils.Retriever import PdfRetriever
+
+
+class SeasonPrefetcher:
+    """
+    A class to download and parse every available Analysis and Classification PDF of a season ahead of time, so the
+    first user to open a race on the analysis pages does not wait for the files to be fetched or parsed.
+    """
+    def __init__(
+            self, max_workers: int = 8, retriever: Optional[PdfRetriever] = None, parse_workers: Optional[int] = None):
+        """
+        :param max_workers: The maximum number of files downloaded and parsed at the same time.
+        :param retriever:
+            The retriever used for the downloads. Defaults to a background priority one using the shared PDF cache.
+        :param parse_workers:
+            The number of processes the files are parsed in, see PdfParser.process_pool. Defaults to the number of
+            CPUs.
+        """
+        self.max_workers = max_workers
+        self.parse_workers = parse_workers
+        self.pdf_retriever = \
+            retriever if retriever is not None else PdfRetriever(max_workers=1, priority=RateLimiter.BACKGROUND)
+        self.pdf_parser = PdfParser()
+        self.parsed_cache = ParsedCache.shared(self.pdf_retriever.cache.root, pdf_cache=self.pdf_retriever.cache)
+        self.race_resources = RaceResources()
+        self.categories = sorted(set(self.pdf_retriever.categories.values()))
+
+    def practice_session_codes(self) -> List[str]:
+        """
+        A method to list every practice session code the website has used.
+
+        :return: The session codes.
+        """
+        return [sess for sess in self.pdf_retriever.known_sessions if sess not in self.pdf_retriever.race_types]
+
+    def tasks(self, year: int, races: Optional[List[str]] = None, categories: Optional[List[str]] = None) \
+            -> List[Tuple[str, str, str, str]]:
+        """
+        A method to list every file to fetch for a season.
+
+        :param year: The year of the season.
+        :param races: The race 3-letter codes to fetch. Defaults to the whole calendar.
+        :param categories: The racing classes to fetch. Defaults to MotoGP, Moto2 and Moto3.
+        :return: A list of (category, race, session, data type) tuples, data type is "practice", "classification",
+            "analysis" or "results".
+        """
+        races = races if races else list(self.race_resources.race_number.values())
+        categories = categories if categories else self.categories
+        tasks = list()
+        for race in races:
+            for category in categories:
+                for sess in self.practice_session_codes():
+                    tasks.append((category, race, sess, "practice"))
+                    tasks.append((category, race, sess, "classification"))
+                race_types = ["SPR", "RAC"] if category == "MotoGP" else ["RAC"]
+                for race_type in race_types:
+                    tasks.append((category, race, race_type, "analysis"))
+                    tasks.append((category, race, race_type, "results"))
+        return tasks
+
+    def _prefetch_one(self, year: int, task: Tuple[str, str, str, str], parse_pool: Executor) -> str:
+        """
+        Download and parse a single file.
+
+        :param year: The year of the season.
+        :param task: The (category, race, session, data type) to fetch.
+        :param parse_pool: The process pool the file is parsed in.
+        :return: "fetched" if the file was downloaded and parsed, otherwise "missing".
+        """
+        category, race, sess, data_type = task
+        if data_type == "practice":
+            files = self.pdf_retriever.retrieve_practice_files(category, year, race, [sess])
+            if not files:
+                return "missing"
+            # the same parse method and arguments as DataWrangler.get_practice_laps, so the pages hit the cache
+            self.parsed_cache.parse(
+                files[0], self.pdf_parser.parse_laps, parse_pool, delete_if_less_than_three=True, is_race=False
+            )
+        elif data_type == "classification":
+            files = self.pdf_retriever.retrieve_practice_files(
+                category, year, race, [sess], document=self.pdf_retriever.CLASSIFICATION
+            )
+            if not files:
+                return "missing"
+            # the leaderboard the practice page opens on, see DataWrangler.get_practice_leaderboard
+            self.parsed_cache.parse(files[0], self.pdf_parser.parse_classification_pdf, parse_pool)
+        else:
+            file_name = self.pdf_retriever.retrieve_race_files(category, year, race, sess, data_type)
+            if file_name is None:
+                return "missing"
+            if data_type == "analysis":
+                # parse_laps for DataWrangler.get_race_pace_for_practice_comparison and, with the pit in laps, for
+                # DataWrangler.get_race_laps
+                self.parsed_cache.parse(
+                    file_name, self.pdf_parser.parse_laps, parse_pool, delete_if_less_than_three=False, is_race=True
+                )
+                self.parsed_cache.parse(
+                    file_name, self.pdf_parser.parse_laps, parse_pool, delete_if_less_than_three=False, is_race=True,
+                    keep_pit_in=True
+                )
+            else:
+                self.parsed_cache.parse(file_name, self.pdf_parser.parse_race_results_pdf, parse_pool)
+        return "fetched"
+
+    def prefetch(self, year: int, races: Optional[List[str]] = None, categories: Optional[List[str]] = None) \
+            -> Dict[str, int]:
+        """
+        Download and parse every available file for a season, reporting progress as the files complete.
+
+        :param year: The year of the season.
+        :param races: The race 3-letter codes to fetch. Defaults to the whole calendar.
+        :param categories: The racing classes to fetch. Defaults to MotoGP, Moto2 and Moto3.
+        :return: The number of files fetched, missing and failed.
+        """
+        tasks = self.tasks(year, races, categories)
+        summary = {"fetched": 0, "missing": 0, "failed": 0}
+        # downloads run in threads, parsing is CPU bound so the threads hand it to the shared pool of processes
+        parse_pool = self.pdf_parser.process_pool(self.parse_workers)
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(self._prefetch_one, year, task, parse_pool): task for task in tasks}
+            progress = tqdm(as_completed(futures), total=len(futures), unit="file")
+            for future in progress:
+                try:
+                    status = future.result()
+                except Exception as e:
+                    print(f"Failed to prefetch {futures[future]}: {e}")
+                    status = "failed"
+                summary[status] += 1
+                progress.set_postfix(summary)
+        return summary
+
+
+if __name__ == "__main__":
+    arg_parser = argparse.ArgumentParser(
+        description="Download and parse the session PDFs of a season so the analysis pages load from a warm cache."
+    )
+    arg_parser.add_argument("year", type=int, help="The year of the season to prefetch.")
+    arg_parser.add_argument("--races", nargs="*", help="Race 3-letter codes, defaults to the whole calendar.")
+    arg_parser.add_argument("--categories", nargs="*", help="Racing classes, defaults to MotoGP, Moto2 and Moto3.")
+    arg_parser.add_argument("--workers", type=int, default=8, help="Number of files fetched at the same time.")
+    arg_parser.add_argument("--parse-workers", type=int, default=None, help="Number of processes parsing files.")
+    arg_parser.add_argument("--cache-dir", default=None, help="The PDF cache directory.")
+    args = arg_parser.parse_args()
+
+    prefetcher = SeasonPrefetcher(
+        max_workers=args.workers,
+        retriever=PdfRetriever(
+            max_workers=1, cache=PdfCache.shared(args.cache_dir), priority=RateLimiter.BACKGROUND
+        ),
+        parse_workers=args.parse_workers
+    )
+    result = prefetcher.prefetch(args.year, args.races, args.categories)
+    print(f"Prefetch of {args.year} complete: {result}")
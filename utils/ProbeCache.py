@@ -0,0 +1,66 @@
+import time
+import threading
+from typing import Dict, Optional, Tuple
+
+
+class ProbeCache:
+    """
+    A thread-safe cache of session existence answers, keyed by (year, race, category, session).
+
+    Both positive and negative answers are kept, each with their own time to live, so a session that is known to be
+    missing does not cost another request until its entry expires.
+    """
+    def __init__(self, positive_ttl: float = 3600.0, negative_ttl: float = 300.0):
+        """
+        :param positive_ttl: The number of seconds a session that exists is remembered for.
+        :param negative_ttl: The number of seconds a session that does not exist is remembered for.
+        """
+        self.positive_ttl = positive_ttl
+        self.negative_ttl = negative_ttl
+        self._entries: Dict[Tuple[int, str, str, str], Tuple[bool, float]] = dict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _key(year: int, race: str, category: str, session: str) -> Tuple[int, str, str, str]:
+        """A helper method to build the cache key."""
+        return int(year), race, category, session
+
+    def get(self, year: int, race: str, category: str, session: str, allow_expired: bool = False) -> Optional[bool]:
+        """
+        Look up a session.
+
+        :param year: The year of the session.
+        :param race: The race 3-letter code.
+        :param category: The racing class.
+        :param session: The session code, e.g. FP1 or RAC.
+        :param allow_expired: If True, also return an answer that has expired, e.g. when the website cannot be reached.
+        :return: True or False if the answer is known and has not expired, otherwise None.
+        """
+        key = self._key(year, race, category, session)
+        with self._lock:
+            entry = self._entries.get(key)
+        if entry is None:
+            return None
+        exists, expiry = entry
+        if time.monotonic() >= expiry and not allow_expired:
+            return None
+        return exists
+
+    def set(self, year: int, race: str, category: str, session: str, exists: bool) -> None:
+        """
+        Record whether a session exists.
+
+        :param year: The year of the session.
+        :param race: The race 3-letter code.
+        :param category: The racing class.
+        :param session: The session code, e.g. FP1 or RAC.
+        :param exists: True if the session exists, otherwise False.
+        """
+        ttl = self.positive_ttl if exists else self.negative_ttl
+        with self._lock:
+            self._entries[self._key(year, race, category, session)] = (exists, time.monotonic() + ttl)
+
+    def clear(self) -> None:
+        """Forget all answers."""
+        with self._lock:
+            self._entries.clear()
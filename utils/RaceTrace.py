@@ -0,0 +1,143 @@
+from typing import List
+
+import numpy as np
+import pandas as pd
+
+
+class RaceTrace:
+    """
+    The race trace of a race: every rider's lap times as a riders x laps matrix and, worked out from it in one pass of
+    NumPy, the race time, gap to the leader, position and interval to the rider ahead at the end of every lap.
+
+    A lap with no time (the rider retired, or the lap was left out by the parser) has NaN in every matrix from that lap
+    on, and the rider is not counted in the positions of those laps.
+    """
+    def __init__(self, riders: List[str], lap_times: np.ndarray):
+        """
+        :param riders: The rider names, in the order of the rows of lap_times.
+        :param lap_times: The lap times in seconds, a row per rider and a column per lap, NaN where there is no time.
+        """
+        lap_times = np.asarray(lap_times, dtype=np.float64)
+        if lap_times.ndim != 2 or lap_times.shape[0] != len(riders):
+            raise ValueError("lap_times must have a row for each rider")
+        n_riders, n_laps = lap_times.shape
+        self.riders = list(riders)
+        self.lap_times = lap_times
+        self.laps = np.arange(1, n_laps + 1)
+
+        # NaN carries on through the sum, so the race time stops at the first lap without a time
+        self.race_time = np.cumsum(lap_times, axis=1)
+        has_time = ~np.isnan(self.race_time)
+        self.laps_completed = has_time.sum(axis=1)
+
+        # fmin skips NaN, so a lap is led by the quickest rider who completed it
+        leader_time = np.fmin.reduce(self.race_time, axis=0) if n_riders else np.full(n_laps, np.nan)
+        self.gap_to_leader = self.race_time - leader_time
+
+        # NaN sorts last, so the riders with a time on a lap take the first positions of that lap
+        order = np.argsort(self.race_time, axis=0, kind="stable")
+        sorted_time = np.take_along_axis(self.race_time, order, axis=0)
+        self.position = np.empty_like(self.race_time)
+        np.put_along_axis(self.position, order, np.arange(1, n_riders + 1, dtype=np.float64)[:, np.newaxis], axis=0)
+        self.position[~has_time] = np.nan
+
+        sorted_interval = np.full_like(sorted_time, np.nan)
+        sorted_interval[1:] = np.diff(sorted_time, axis=0)
+        self.interval = np.empty_like(self.race_time)
+        np.put_along_axis(self.interval, order, sorted_interval, axis=0)
+
+        # positive when a rider moved forward on a lap, nothing for the first lap as the grid is not known
+        self.position_change = np.full_like(self.position, np.nan)
+        self.position_change[:, 1:] = self.position[:, :-1] - self.position[:, 1:]
+
+        # the finishing order: the most laps completed, then the shortest race time over them
+        last_lap = np.maximum(self.laps_completed - 1, 0)
+        final_time = self.race_time[np.arange(n_riders), last_lap] if n_laps else np.full(n_riders, np.nan)
+        self.final_position = np.empty(n_riders, dtype=np.int64)
+        self.final_position[np.lexsort((final_time, -self.laps_completed))] = np.arange(1, n_riders + 1)
+        self.positions_gained = self.position[:, 0] - self.final_position if n_laps else np.full(n_riders, np.nan)
+
+    @classmethod
+    def from_wide(cls, df: pd.DataFrame) -> "RaceTrace":
+        """
+        Build the race trace from a column of lap times per rider, a row per lap. The lap of each row is taken from a
+        Lap column or an index named Lap, laps with no row have no time. Otherwise the rows must be laps 1, 2, 3, ...
+        with the default index, as from PdfParser.parse_pdf. parse_pdf leaves out pit in and unfinished laps though, so
+        the following laps of the rider are moved up, use from_laps where those laps matter.
+
+        :param df: The race dataframe, a Session column is ignored.
+        :return: The race trace.
+        """
+        laps_df = df.drop(columns="Session", errors="ignore")
+        if "Lap" in laps_df.columns:
+            laps_df = laps_df.set_index("Lap")
+        if laps_df.index.name == "Lap":
+            laps = laps_df.index.to_numpy(dtype=np.int64)
+            if len(laps) and (laps.min() < 1 or len(np.unique(laps)) != len(laps)):
+                raise ValueError("Lap numbers must be unique and count from 1")
+        elif laps_df.index.equals(pd.RangeIndex(len(laps_df))):
+            laps = np.arange(1, len(laps_df) + 1)
+        else:
+            raise ValueError("The rows must have a Lap column or index, or be laps 1, 2, 3, ... in order")
+        n_laps = int(laps.max()) if len(laps) else 0
+        lap_times = np.full((laps_df.shape[1], n_laps), np.nan)
+        lap_times[:, laps - 1] = laps_df.to_numpy(dtype=np.float64).T
+        return cls([str(rider) for rider in laps_df.columns], lap_times)
+
+    @classmethod
+    def from_laps(cls, df: pd.DataFrame) -> "RaceTrace":
+        """
+        Build the race trace of a race parsed with PdfParser.parse_laps, each lap time put at its lap number. Parse
+        it with keep_pit_in, as a pit in lap left out stops the rider's race time there.
+
+        :param df: The long format lap table with the Rider, Lap and LapTime columns.
+        :return: The race trace.
+        """
+        # keep the riders in the order of the table rather than sorted, with those without a lap left in
+        riders = list(df["Rider"].cat.categories) if isinstance(df["Rider"].dtype, pd.CategoricalDtype) \
+            else list(pd.unique(df["Rider"]))
+        wide = df.pivot(index="Lap", columns="Rider", values="LapTime")
+        wide.columns = wide.columns.astype(object)
+        return cls.from_wide(wide.reindex(columns=riders))
+
+    def to_frame(self) -> pd.DataFrame:
+        """
+        Lay out the race trace in long format, a row per rider per lap they completed, for charts.
+
+        :return: The dataframe with the Rider, Lap, LapTime, RaceTime, Gap, Position, Interval and PositionChange
+            columns.
+        """
+        n_riders, n_laps = self.race_time.shape
+        keep = ~np.isnan(self.race_time).ravel()
+        return pd.DataFrame({
+            "Rider": pd.Categorical(np.repeat(np.asarray(self.riders, dtype=object), n_laps)[keep],
+                                    categories=self.riders),
+            "Lap": np.tile(self.laps, n_riders)[keep],
+            "LapTime": self.lap_times.ravel()[keep],
+            "RaceTime": self.race_time.ravel()[keep],
+            "Gap": self.gap_to_leader.ravel()[keep],
+            "Position": self.position.ravel()[keep].astype(np.int64),
+            "Interval": self.interval.ravel()[keep],
+            "PositionChange": self.position_change.ravel()[keep],
+        })
+
+    def summary(self) -> pd.DataFrame:
+        """
+        Sum up each rider's race, in finishing order.
+
+        :return: The dataframe with the Position, LapsCompleted, RaceTime, Gap, FirstLapPosition and PositionsGained of
+            each rider, indexed by rider. RaceTime and Gap are taken at the rider's last lap, so a lapped rider's gap is
+            to the leader of that lap.
+        """
+        n_riders, n_laps = self.race_time.shape
+        last_lap = np.maximum(self.laps_completed - 1, 0)
+        rows = np.arange(n_riders)
+        out = pd.DataFrame({
+            "Position": self.final_position,
+            "LapsCompleted": self.laps_completed,
+            "RaceTime": self.race_time[rows, last_lap] if n_laps else np.full(n_riders, np.nan),
+            "Gap": self.gap_to_leader[rows, last_lap] if n_laps else np.full(n_riders, np.nan),
+            "FirstLapPosition": self.position[:, 0] if n_laps else np.full(n_riders, np.nan),
+            "PositionsGained": self.positions_gained,
+        }, index=pd.Index(self.riders, name="Rider"))
+        return out.sort_values("Position")
@@ -0,0 +1,107 @@
+import time
+import threading
+from typing import Dict, Optional, Tuple
+from urllib.parse import urlsplit
+
+
+class TokenBucket:
+    """
+    A token bucket: tokens are added at a fixed rate up to a capacity, and each request takes one.
+    """
+    def __init__(self, rate: float, capacity: int):
+        """
+        :param rate: The number of tokens added per second.
+        :param capacity: The most tokens the bucket can hold, i.e. the largest burst of requests allowed.
+        """
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = float(capacity)
+        self._updated = time.monotonic()
+
+    def refill(self) -> None:
+        """Add the tokens accumulated since the last refill."""
+        now = time.monotonic()
+        self.tokens = min(float(self.capacity), self.tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def time_until_token(self) -> float:
+        """The number of seconds until a whole token is available."""
+        return max(0.0, (1.0 - self.tokens) / self.rate)
+
+
+class RateLimiter:
+    """
+    A thread-safe rate limiter with a token bucket per host.
+
+    Requests have a priority. A background request, e.g. a prefetch or a points update, only takes a token when no
+    interactive request for the same host is waiting, so page loads go ahead of batch work.
+    """
+    INTERACTIVE = 0
+    BACKGROUND = 1
+
+    def __init__(
+            self,
+            default_rate: float = 8.0,
+            default_burst: int = 16,
+            host_rates: Optional[Dict[str, Tuple[float, int]]] = None):
+        """
+        :param default_rate: The number of requests per second allowed to a host without its own rate.
+        :param default_burst: The number of requests that can be made at once to a host without its own rate.
+        :param host_rates: The (requests per second, burst) for specific hosts, e.g. {"www.motogp.com": (4.0, 8)}.
+        """
+        self.default_rate = default_rate
+        self.default_burst = default_burst
+        self._host_rates = dict(host_rates) if host_rates else dict()
+        self._buckets: Dict[str, TokenBucket] = dict()
+        self._interactive_waiting: Dict[str, int] = dict()
+        self._condition = threading.Condition()
+
+    def set_rate(self, host: str, rate: float, burst: int) -> None:
+        """
+        Set the rate for a host.
+
+        :param host: The host name, e.g. resources.motogp.com.
+        :param rate: The number of requests per second allowed.
+        :param burst: The number of requests that can be made at once.
+        """
+        with self._condition:
+            self._host_rates[host] = (rate, burst)
+            self._buckets.pop(host, None)
+            self._condition.notify_all()
+
+    def _bucket(self, host: str) -> TokenBucket:
+        """A helper method to get the bucket of a host, creating it on first use."""
+        if host not in self._buckets:
+            rate, burst = self._host_rates.get(host, (self.default_rate, self.default_burst))
+            self._buckets[host] = TokenBucket(rate, burst)
+        return self._buckets[host]
+
+    def acquire(self, url: str, priority: int = INTERACTIVE) -> float:
+        """
+        Wait until a request to the host of a URL is allowed.
+
+        :param url: The URL to be requested.
+        :param priority: INTERACTIVE or BACKGROUND.
+        :return: The number of seconds waited.
+        """
+        host = urlsplit(url).netloc
+        start = time.monotonic()
+        with self._condition:
+            if priority == self.INTERACTIVE:
+                self._interactive_waiting[host] = self._interactive_waiting.get(host, 0) + 1
+            try:
+                while True:
+                    bucket = self._bucket(host)
+                    bucket.refill()
+                    if bucket.tokens >= 1.0:
+                        if priority == self.INTERACTIVE or self._interactive_waiting.get(host, 0) == 0:
+                            bucket.tokens -= 1.0
+                            return time.monotonic() - start
+                        # a token is free but an interactive request is waiting, so wait to be told it is done
+                        self._condition.wait(0.05)
+                    else:
+                        self._condition.wait(bucket.time_until_token())
+            finally:
+                if priority == self.INTERACTIVE:
+                    self._interactive_waiting[host] -= 1
+                    self._condition.notify_all()
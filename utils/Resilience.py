@@ -0,0 +1,152 @@
+import time
+import random
+import threading
+from typing import Callable, Dict, Optional, TypeVar
+from urllib.parse import urlsplit
+
+T = TypeVar("T")
+
+
+class CircuitOpenError(ConnectionError):
+    """Raised instead of making a request while the circuit breaker for the host is open."""
+    pass
+
+
+class TransientStatusError(ConnectionError):
+    """Raised for a response status worth retrying, e.g. 503, so it is retried like a dropped connection."""
+    def __init__(self, status: int, url: str):
+        super().__init__(f"Status {status} from {url}")
+        self.status = status
+
+
+class RetryPolicy:
+    """
+    Bounded retries with jittered exponential backoff for transient failures: connection errors, timeouts and the
+    statuses listed in retry_statuses.
+    """
+    retry_statuses = (429, 500, 502, 503, 504)
+
+    def __init__(self, max_attempts: int = 3, base_delay: float = 0.5, max_delay: float = 8.0):
+        """
+        :param max_attempts: The maximum number of attempts, including the first.
+        :param base_delay: The number of seconds to wait before the first retry, doubled on each later retry.
+        :param max_delay: The longest wait between two attempts in seconds.
+        """
+        if max_attempts < 1:
+            raise ValueError("max_attempts must be at least 1")
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt: int) -> float:
+        """
+        The wait before the next attempt, using "full jitter" so that clients that failed together do not retry
+        together.
+
+        :param attempt: The number of attempts made so far, starting at 1.
+        :return: The number of seconds to wait.
+        """
+        return random.uniform(0.0, min(self.max_delay, self.base_delay * 2 ** (attempt - 1)))
+
+    def call(self, func: Callable[[], T], on_failure: Optional[Callable[[Exception], None]] = None) -> T:
+        """
+        Call a function, retrying it on ConnectionError and TimeoutError. A CircuitOpenError is never retried.
+
+        :param func: The function to call.
+        :param on_failure: Called with each failure, before waiting to retry.
+        :return: The result of the first successful call.
+        """
+        attempt = 1
+        while True:
+            try:
+                return func()
+            except CircuitOpenError:
+                raise
+            except (ConnectionError, TimeoutError) as e:
+                if on_failure is not None:
+                    on_failure(e)
+                if attempt >= self.max_attempts:
+                    raise
+                time.sleep(self.delay(attempt))
+                attempt += 1
+
+
+class CircuitBreaker:
+    """
+    A per-host circuit breaker. After failure_threshold consecutive failures to a host the circuit opens and requests
+    to that host fail straight away. Once reset_timeout has passed a single trial request is let through; the circuit
+    closes if it succeeds and opens again if it fails.
+    """
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0):
+        """
+        :param failure_threshold: The number of consecutive failures that opens the circuit for a host.
+        :param reset_timeout: The number of seconds the circuit stays open before a trial request is allowed.
+        """
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._failures: Dict[str, int] = dict()
+        self._opened_at: Dict[str, float] = dict()
+        self._trial_running: Dict[str, bool] = dict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def host(url: str) -> str:
+        """A helper method to get the host of a URL."""
+        return urlsplit(url).netloc
+
+    def is_open(self, url: str) -> bool:
+        """
+        Check if requests to the host of a URL are currently being refused, without claiming the trial request.
+
+        :param url: The URL to be requested.
+        :return: True if the circuit for the host is open.
+        """
+        host = self.host(url)
+        with self._lock:
+            opened_at = self._opened_at.get(host)
+            if opened_at is None:
+                return False
+            return time.monotonic() - opened_at < self.reset_timeout or self._trial_running.get(host, False)
+
+    def before_request(self, url: str) -> None:
+        """
+        Call before each request.
+
+        :param url: The URL to be requested.
+        :raises CircuitOpenError: If the circuit for the host is open.
+        """
+        host = self.host(url)
+        with self._lock:
+            opened_at = self._opened_at.get(host)
+            if opened_at is None:
+                return
+            if time.monotonic() - opened_at < self.reset_timeout or self._trial_running.get(host, False):
+                raise CircuitOpenError(f"Circuit open for {host}, not requesting {url}")
+            self._trial_running[host] = True
+
+    def record_success(self, url: str) -> None:
+        """
+        Call after a request that reached the host.
+
+        :param url: The URL requested.
+        """
+        host = self.host(url)
+        with self._lock:
+            self._failures[host] = 0
+            self._opened_at.pop(host, None)
+            self._trial_running[host] = False
+
+    def record_failure(self, url: str) -> None:
+        """
+        Call after a request that failed with a connection error, a timeout or a server error.
+
+        :param url: The URL requested.
+        """
+        host = self.host(url)
+        with self._lock:
+            self._failures[host] = self._failures.get(host, 0) + 1
+            if self._trial_running.get(host, False) or self._failures[host] >= self.failure_threshold:
+                if host not in self._opened_at or self._trial_running.get(host, False):
+                    print(f"Opening circuit for {host} after {self._failures[host]} failures")
+                self._opened_at[host] = time.monotonic()
+            self._trial_running[host] = False
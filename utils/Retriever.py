@@ -1,16 +1,63 @@
-import os
-import wget
-import urllib.request
-from typing import List, Union
+from concurrent.futures import ThreadPoolExecutor
+from typing import Callable, Dict, Iterator, List, Tuple, Union, Optional, TypeVar
 
-from urllib.error import HTTPError
+from utils.HttpClient import HttpClient
+from utils.PdfCache import PdfCache
+from utils.ProbeCache import ProbeCache
+from utils.RateLimiter import RateLimiter
+from utils.Resilience import CircuitBreaker, RetryPolicy, TransientStatusError
+from utils.SessionIndex import SessionIndex
+from utils.Transport import Transport, TransportResponse
+
+T = TypeVar("T")
 
 
 class PdfRetriever:
     """
     This class is for retrieving session PDFs for all classes in the MotoGP championship.
+
+    Session existence answers are kept in a probe cache shared by every retriever in the process, so a session known
+    to be missing (or present) does not need another request until the cached answer expires.
+
+    Transient failures are retried with backoff, and a circuit breaker per host, also shared by the process, stops
+    requests to a host that keeps failing. While the website cannot be reached cached files and answers are used.
+
+    All retrievers in the process share a rate limiter, so many sessions loading pages at once do not get throttled by
+    the website. Interactive retrievers go ahead of background ones such as the prefetcher.
     """
-    def __init__(self):
+    probe_cache = ProbeCache()
+    circuit_breaker = CircuitBreaker()
+    rate_limiter = RateLimiter()
+    AUTO_SESSIONS = "Auto-detect"
+    ANALYSIS = "Analysis"  # every lap of every rider, many pages
+    CLASSIFICATION = "Classification"  # the best lap of every rider, one page
+
+    def __init__(
+            self,
+            max_workers: int = 4,
+            cache: Optional[PdfCache] = None,
+            transport: Optional[Transport] = None,
+            retry_policy: Optional[RetryPolicy] = None,
+            priority: int = RateLimiter.INTERACTIVE):
+        """
+        :param max_workers:
+            The maximum number of sessions probed and downloaded at the same time. A value of 1 retrieves the sessions
+            one after the other.
+        :param cache: The on-disk cache the PDFs are downloaded to. Defaults to the shared cache in the static folder.
+        :param transport:
+            The transport used for all requests. Defaults to the HTTP client shared by the process, which keeps
+            connections alive between requests. A FileTransport serves recorded files instead of the website.
+            Connect and read timeouts are set on the transport, e.g. HttpClient(connect_timeout=3, read_timeout=20).
+        :param retry_policy: The retries for transient failures. Defaults to 3 attempts with jittered backoff.
+        :param priority: RateLimiter.INTERACTIVE for page loads, RateLimiter.BACKGROUND for batch work.
+        """
+        if max_workers < 1:
+            raise ValueError("Error in Retriever - max_workers must be at least 1")
+        self.max_workers = max_workers
+        self.cache = cache if cache is not None else PdfCache.shared()
+        self.transport = transport if transport is not None else HttpClient.shared()
+        self.retry_policy = retry_policy if retry_policy is not None else RetryPolicy()
+        self.priority = priority
         self.session = None
         self.sessions = None
 
@@ -32,43 +79,229 @@ class PdfRetriever:
             "3: P1, P2, P3": ["P1", "P2", "P3"],
             "3: FP1, FP2, FP3, WUP": ["FP1", "FP2", "FP3", "WUP"]
         }
+        self.race_types = ["SPR", "RAC"]
+
+        # every session code the website has used, FP5 to FP9 are only run at pre-season tests
+        self.known_sessions = list()
+        for style in self.session_style.values():
+            for sess in style:
+                if sess not in self.known_sessions:
+                    self.known_sessions.append(sess)
+        self.known_sessions.extend(["FP5", "FP6", "FP7", "FP8", "FP9"])
+        self.known_sessions.extend(self.race_types)
+        self.session_index = SessionIndex.shared(self.cache.root)
+
+    def _map_sessions(self, func: Callable[[str], T], sessions: List[str], workers: Optional[int] = None) -> List[T]:
+        """
+        Run a function for each session, concurrently if more than one worker is allowed.
+
+        :param func: The function to call with each session code.
+        :param sessions: The session codes.
+        :param workers: The number of workers to use, defaults to max_workers.
+        :return: The results in the same order as the sessions.
+        """
+        workers = workers if workers is not None else self.max_workers
+        if workers == 1 or len(sessions) <= 1:
+            return [func(sess) for sess in sessions]
+        with ThreadPoolExecutor(max_workers=min(workers, len(sessions))) as executor:
+            # map keeps the results in the same order as the sessions requested
+            return list(executor.map(func, sessions))
+
+    def _iter_sessions(self, func: Callable[[str], T], sessions: List[str]) -> Iterator[T]:
+        """
+        Run a function for each session in background threads, up to max_workers at a time, yielding each result as
+        soon as it and the results of the sessions before it are ready. Even with one worker the next session is
+        fetched while the caller works on the one yielded.
+
+        :param func: The function to call with each session code.
+        :param sessions: The session codes.
+        :return: The results in the same order as the sessions.
+        """
+        if not sessions:
+            return
+        with ThreadPoolExecutor(max_workers=min(self.max_workers, len(sessions))) as executor:
+            # map submits every session straight away and yields the results in order
+            yield from executor.map(func, sessions)
+
+    def _send(self, method: str, url: str, headers: Optional[Dict[str, str]] = None) -> TransportResponse:
+        """
+        Make a single request through the circuit breaker and the rate limiter. Statuses worth retrying are raised as
+        TransientStatusError.
+
+        :param method: The HTTP method, e.g. GET or HEAD.
+        :param url: The URL to request.
+        :param headers: Any extra request headers.
+        :return: The streamed response.
+        """
+        self.circuit_breaker.before_request(url)
+        # anything raised before the outcome is recorded, from the rate limiter or the transport, counts as a failure,
+        # so a trial request always ends and cannot leave the circuit open for good
+        succeeded = False
+        try:
+            self.rate_limiter.acquire(url, self.priority)
+            response = self.transport.request(method, url, headers)
+            if response.status in self.retry_policy.retry_statuses:
+                response.close()
+                raise TransientStatusError(response.status, url)
+            succeeded = True
+        finally:
+            if succeeded:
+                self.circuit_breaker.record_success(url)
+            else:
+                self.circuit_breaker.record_failure(url)
+        return response
 
-    @staticmethod
-    def __check_url_validity(url: str) -> bool:
+    def __check_url_validity(self, url: str) -> Optional[bool]:
         """
-        Helper function to verify if a URL is valid.
+        Helper function to verify if a URL is valid. Only the headers are requested, or a single byte if the server
+        does not allow HEAD requests, so the body is never transferred.
 
         :param url: The URL to check.
-        :return: True if URL is valid, False otherwise.
+        :return: True if URL is valid, False if it is missing (404), or None for any other answer.
         """
         print(url)
-        exist = False
 
+        def probe() -> int:
+            with self._send("HEAD", url) as head_response:
+                status = head_response.status
+            if status in (405, 501):  # HEAD not supported so ask for the first byte only
+                get_response = self._send("GET", url, headers={"Range": "bytes=0-0"})
+                status = get_response.status
+                # a server ignoring the range sends the whole file, so drop the connection rather than read it
+                get_response.abort()
+            return status
+
+        code = self.retry_policy.call(probe)
+
+        if code in (200, 206):
+            return True
+        if code == 404:
+            return False
+        print(f"Error {code} when checking {url}")
+        return None
+
+    def _download(self, url: str, name: str, cached: Optional[str]) -> Tuple[Optional[str], Optional[bool]]:
+        """
+        Make a single attempt at downloading a file into the cache, see _fetch_pdf.
+
+        :param url: The URL of the file.
+        :param name: The name of the file in the cache.
+        :param cached: The local path of the cached copy if there is one.
+        :return: The local path of the file or None, and whether the file exists, see _fetch_pdf.
+        """
+        headers = self.cache.validators(name) if cached else dict()
+        with self._send("GET", url, headers=headers) as response:
+            if response.status == 200:
+                return self.cache.store(
+                    name=name,
+                    url=url,
+                    chunks=response.iter_content(),
+                    etag=response.headers.get("ETag"),
+                    last_modified=response.headers.get("Last-Modified")
+                ), True
+            if response.status == 304 and cached:
+                self.cache.mark_validated(name)
+                return cached, True
+            if response.status == 404:
+                return cached, False
+            print(f"Error {response.status} when downloading {url}")
+        return cached, None
+
+    def _fetch_pdf(self, url: str, name: str) -> Tuple[Optional[str], Optional[bool]]:
+        """
+        Get a file from the cache, or download it with a single request. The body of the first successful response is
+        streamed straight into the cache, and a missing file (404) is treated as the file not existing.
+
+        If the cache asks for revalidation, a conditional request is made and the cached copy is kept if the server
+        reports it has not been modified. If the website cannot be reached, any cached copy is used.
+
+        :param url: The URL of the file.
+        :param name: The name of the file in the cache.
+        :return:
+            The local path of the file or None if there is no copy, and whether the file exists: True, False if the
+            website answered 404, or None if the website could not be reached or gave another error, so the file may
+            well exist.
+        """
+        cached = self.cache.lookup(name)
+        if cached and not self.cache.needs_revalidation(name):
+            return cached, True
+
+        print(url)
         try:
-            code = urllib.request.urlopen(url).getcode()
-        except HTTPError:
-            code = 404
+            return self.retry_policy.call(lambda: self._download(url, name, cached))
+        except (ConnectionError, TimeoutError) as e:
+            print(f"Error when downloading {url}: {e}")
+
+        return cached, None
+
+    def _probe_session(self, category: str, year: int, race: str, sess: str) -> Optional[bool]:
+        """
+        Check if a single session exists, using the shared probe cache before going to the website.
+
+        :param category: The name of the racing class.
+        :param year: The year of the desired session.
+        :param race: The race of the desired session.
+        :param sess: The session code, e.g. FP1 or RAC.
+        :return: True if the session exists, False if not, or None if the website could not be reached.
+        """
+        exists = self.probe_cache.get(year, race, category, sess)
+        if exists is None:
+            try:
+                exists = self.__check_url_validity(
+                    url=f"https://www.motogp.com/en/gp-results/{year}/{race}/{category}/{sess}/Classification"
+                )
+            except (ConnectionError, TimeoutError) as e:
+                print(f"Could not check {category}-{year}-{race}-{sess}: {e}")
+                return None
+            # only a 404 says the session does not exist, do not cache any other error as the session may well exist
+            if exists is not None:
+                self.probe_cache.set(year, race, category, sess, exists)
+        return exists
 
-        if code == 200:
-            exist = True
+    def _session_exists(self, category: str, year: int, race: str, sess: str) -> bool:
+        """
+        Check if a single session exists. The session index of the event is trusted before probing, as
+        discover_sessions only saves it when every code was answered. If the website cannot be reached, any earlier
+        answer is used.
 
-        return exist
+        :param category: The name of the racing class.
+        :param year: The year of the desired session.
+        :param race: The race of the desired session.
+        :param sess: The session code, e.g. FP1 or RAC.
+        :return: True if the session exists, otherwise False.
+        """
+        if sess in self.known_sessions and self.probe_cache.get(year, race, category, sess) is None:
+            indexed = self.session_index.get(year, race, category)
+            if indexed is not None:
+                # seed the probe cache too, so the retrieval that follows trusts the same answer
+                self.probe_cache.set(year, race, category, sess, sess in indexed)
+                return sess in indexed
+        exists = self._probe_session(category, year, race, sess)
+        if exists is None:
+            exists = self.probe_cache.get(year, race, category, sess, allow_expired=True)
+        if exists is None:
+            indexed = self.session_index.get(year, race, category, allow_expired=True)
+            exists = indexed is not None and sess in indexed
+        return exists
 
     def check_sessions_exist(self, category: str, year: int, race: str, session: Union[List[str], str]) -> bool:
         """
-        Uses the arguments given to form a URL and check the practice session validity.
+        Uses the arguments given to form a URL and check the practice session validity. Every session is checked so
+        that the answers are cached for the retrieval that follows.
 
         :param category: The name of the racing class.
         :param year: The year of the desired sessions.
         :param race: The race of the desired sessions.
-        :param session: The format of the desired sessions.
+        :param session: The format of the desired sessions, or AUTO_SESSIONS for the sessions the event actually had.
         :return: Boolean, True if a session exists, otherwise False.
         """
         url_exists = False
 
         if isinstance(session, str):
-            if "SPR" == session or "RAC" == session:
+            if session in self.race_types:
                 session_types = [session]
+            elif session == self.AUTO_SESSIONS:
+                session_types = self.discover_practice_sessions(category, year, race)
             else:
                 session_types = self.session_style[session]
         elif isinstance(session, list):
@@ -76,21 +309,59 @@ class PdfRetriever:
         else:
             print("Incorrect session type")
             return False
-        while not url_exists:
-            for sess in session_types:
-                url_exists = self.__check_url_validity(
-                    url=f"https://www.motogp.com/en/gp-results/{year}/{race}/{category}/{sess}/Classification"
-                )
-                if url_exists:
-                    print(f"{category}-{year}-{race}-{sess} exist: {url_exists}")
-                else:
-                    print(f"No session found for {sess} in {category}-{year}-{race}-{sess}")
-            if not url_exists:
-                print(f"No sessions found for {category}-{year}-{race}")
-                break
+
+        all_exist = self._map_sessions(lambda sess: self._session_exists(category, year, race, sess), session_types)
+        for sess, sess_exists in zip(session_types, all_exist):
+            if sess_exists:
+                print(f"{category}-{year}-{race}-{sess} exist: {sess_exists}")
+                url_exists = True
+            else:
+                print(f"No session found for {sess} in {category}-{year}-{race}-{sess}")
+        if not url_exists:
+            print(f"No sessions found for {category}-{year}-{race}")
 
         return url_exists
 
+    def discover_sessions(self, category: str, year: int, race: str, refresh: bool = False) -> List[str]:
+        """
+        Find which session codes exist for an event by probing every known code at the same time. The result is kept
+        in the session index, so later loads of the same event do not probe again.
+
+        :param category: The name of the racing class.
+        :param year: The year of the event.
+        :param race: The race of the event.
+        :param refresh: If True, ignore the session index and probe again.
+        :return: The session codes that exist, practice sessions first and the races last.
+        """
+        sessions = None if refresh else self.session_index.get(year, race, category)
+        if sessions is None:
+            all_exist = self._map_sessions(
+                lambda sess: self._probe_session(category, year, race, sess),
+                self.known_sessions,
+                workers=len(self.known_sessions)
+            )
+            if None in all_exist:
+                # the website could not be reached for every code, so keep whatever was known before
+                sessions = self.session_index.get(year, race, category, allow_expired=True)
+                if sessions is None:
+                    sessions = [sess for sess, exists in zip(self.known_sessions, all_exist) if exists]
+                return sessions
+            sessions = [sess for sess, exists in zip(self.known_sessions, all_exist) if exists]
+            # the event is over once the race has a result, so its sessions will not change
+            self.session_index.set(year, race, category, sessions, complete="RAC" in sessions)
+        return sessions
+
+    def discover_practice_sessions(self, category: str, year: int, race: str) -> List[str]:
+        """
+        Find which practice session codes exist for an event, see discover_sessions.
+
+        :param category: The name of the racing class.
+        :param year: The year of the event.
+        :param race: The race of the event.
+        :return: The practice session codes that exist.
+        """
+        return [sess for sess in self.discover_sessions(category, year, race) if sess not in self.race_types]
+
     # def check_race_exist(self, year: int, race: str, category: str) -> bool:
     #     """
     #     Uses the arguments given to form a URL and check the validity of the results page for the race.
@@ -111,36 +382,98 @@ class PdfRetriever:
     #
     #     return url_exists
 
+    def _retrieve_practice_file(
+            self, category: str, year: int, race: str, sess: str, document: str = ANALYSIS) -> Optional[str]:
+        """
+        Gets a single practice session PDF from the website, using the local copy if it has already been downloaded.
+
+        :param category: The racing class for which to get the session file.
+        :param year: The year of the desired session.
+        :param race: The race of the desired session.
+        :param sess: The session code, e.g. FP1.
+        :param document: ANALYSIS for the lap by lap analysis or CLASSIFICATION for the best lap classification.
+        :return: The pdf name saved locally or None if no file exists.
+        """
+        # the session code is kept last as the parsers read it from the file name
+        if document == self.ANALYSIS:
+            download_name = f"{category}-{year}_{race}_{sess}.pdf"
+        else:
+            download_name = f"{category}-{year}_{race}_{document}_{sess}.pdf"
+        if self.probe_cache.get(year, race, category, sess) is False and self.cache.lookup(download_name) is None:
+            return None
+
+        url = f"https://resources.motogp.com/files/results/{year}/{race}/{category}/{sess}/{document}.pdf"
+        file_name, _ = self._fetch_pdf(url, download_name)
+        if file_name:
+            self.probe_cache.set(year, race, category, sess, True)
+
+        return file_name
+
+    def _practice_sessions(self, category: str, year: int, race: str, session: Union[List[str], str]) -> List[str]:
+        """
+        A helper method to get the session codes of a session format.
+
+        :param category: The racing class.
+        :param year: The year of the event.
+        :param race: The race 3-letter code.
+        :param session: The format of the desired sessions, AUTO_SESSIONS or a list of session codes.
+        :return: The session codes.
+        """
+        if isinstance(session, str):
+            if session == self.AUTO_SESSIONS:
+                return self.discover_practice_sessions(category, year, race)
+            return self.session_style[session]
+        elif isinstance(session, list):
+            return session
+        raise ValueError("Error in Retriever - incorrect session types")
+
+    def iter_practice_files(
+            self, category: str, year: int, race: str, session: Union[List[str], str], document: str = ANALYSIS) \
+            -> Iterator[str]:
+        """
+        Gets the PDFs from the website like retrieve_practice_files, but yields each file name in session order as
+        soon as it is downloaded, so the caller can parse a session while the next ones are still downloading.
+
+        :param category: The racing class for which to get the session file.
+        :param year: The year of the desired sessions.
+        :param race: The race of the desired sessions.
+        :param session: The format of the desired sessions, or AUTO_SESSIONS for the sessions the event actually had.
+        :param document: ANALYSIS or CLASSIFICATION, see retrieve_practice_files.
+        :return: The pdf names saved locally, sessions without a file are skipped.
+        """
+        if document not in (self.ANALYSIS, self.CLASSIFICATION):
+            raise ValueError(f"Error in Retriever - unknown document {document}")
+        sessions = self._practice_sessions(category, year, race, session)
+        for file_name in self._iter_sessions(
+                lambda sess: self._retrieve_practice_file(category, year, race, sess, document), sessions):
+            if file_name is not None:
+                yield file_name
+
     def retrieve_practice_files(
-            self, category: str, year: int, race: str, session: Union[List[str], str]) -> List[str]:
+            self, category: str, year: int, race: str, session: Union[List[str], str], document: str = ANALYSIS) \
+            -> List[str]:
         """
-        Gets the PDF from the website.
+        Gets the PDFs from the website. Sessions are probed and downloaded concurrently, up to max_workers at a time,
+        and the file names are returned in session order.
 
         :param category: The racing class for which to get the session file.
         :param year: The year of the desired sessions.
         :param race: The race of the desired sessions.
-        :param session: The format of the desired sessions.
-        :return: The pdf name saved locally
+        :param session: The format of the desired sessions, or AUTO_SESSIONS for the sessions the event actually had.
+        :param document:
+            ANALYSIS for the lap by lap analysis of each session, or CLASSIFICATION for the one page best lap
+            classification, which is much quicker to download and parse.
+        :return: The pdf names saved locally
         """
-        if isinstance(session, str):
-            sessions = self.session_style[session]
-        elif isinstance(session, list):
-            sessions = session
-        else:
-            raise ValueError("Error in Retriever - incorrect session types")
+        if document not in (self.ANALYSIS, self.CLASSIFICATION):
+            raise ValueError(f"Error in Retriever - unknown document {document}")
+        sessions = self._practice_sessions(category, year, race, session)
 
-        file_names = list()
+        results = self._map_sessions(
+            lambda sess: self._retrieve_practice_file(category, year, race, sess, document), sessions
+        )
 
-        for sess in sessions:
-            url = f"https://resources.motogp.com/files/results/{year}/{race}/{category}/{sess}/Analysis.pdf"
-            valid_url = self.__check_url_validity(url)
-            if valid_url:
-                download_name = (r"../score-tracking/static/" + f"{category}-{year}_{race}_{sess}.pdf")
-                if os.path.isfile(download_name):
-                    file_name = download_name
-                else:
-                    file_name = wget.download(url, download_name)
-                file_names.append(file_name)
+        file_names = [file_name for file_name in results if file_name is not None]
 
         return file_names
 
@@ -159,15 +492,18 @@ class PdfRetriever:
         """
         name = "Analysis" if data_type == "analysis" else "Classification"
 
+        download_name = f"{year}_{race}_{category}_{race_type}_{name}.pdf"
+        if self.probe_cache.get(year, race, category, race_type) is False and self.cache.lookup(download_name) is None:
+            return None
+
         url = \
             f"https://resources.motogp.com/files/results/{year}/{race}/{category}/{race_type}/{name}.pdf"
-        valid_url = self.__check_url_validity(url)
-        file_name = None
-        if valid_url:
-            download_name = (r"../score-tracking/static/" + f"{year}_{race}_{category}_{race_type}_{name}.pdf")
-            if os.path.isfile(download_name):
-                file_name = download_name
-            else:
-                file_name = wget.download(url=url, out=download_name)
+        file_name, exists = self._fetch_pdf(url, download_name)
+        if file_name:
+            self.probe_cache.set(year, race, category, race_type, True)
+        elif name == "Classification" and exists is False:
+            # every race that took place has a classification, an analysis may be published later. Only a 404 is
+            # cached, as an outage or an open circuit says nothing about the race
+            self.probe_cache.set(year, race, category, race_type, False)
 
         return file_name
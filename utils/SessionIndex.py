@@ -0,0 +1,102 @@
+import os
+import json
+import time
+import tempfile
+import threading
+from typing import Dict, List, Optional
+
+
+class SessionIndex:
+    """
+    A persistent index of the session codes that exist for each event, keyed by (year, race, category).
+
+    Once the race of an event has been found the event is over and its entry is kept for good. Entries for events that
+    are still under way expire so that sessions held later in the weekend are picked up.
+    """
+    file_name = "session_index.json"
+    _shared = dict()
+    _shared_lock = threading.Lock()
+
+    def __init__(self, root: str, incomplete_ttl: float = 3600.0):
+        """
+        :param root: The directory the index file is kept in.
+        :param incomplete_ttl: The number of seconds an entry for an event without a race result is trusted for.
+        """
+        self.incomplete_ttl = incomplete_ttl
+        self._path = os.path.join(root, self.file_name)
+        self._lock = threading.Lock()
+        os.makedirs(root, exist_ok=True)
+        self._entries: Dict[str, Dict] = self._read()
+
+    @classmethod
+    def shared(cls, root: str) -> "SessionIndex":
+        """
+        Get the index kept in a directory, creating it on first use.
+
+        :param root: The directory the index file is kept in.
+        :return: The index for the directory.
+        """
+        key = os.path.abspath(root)
+        with cls._shared_lock:
+            if key not in cls._shared:
+                cls._shared[key] = cls(root)
+            return cls._shared[key]
+
+    @staticmethod
+    def _key(year: int, race: str, category: str) -> str:
+        """A helper method to build the key of an event."""
+        return f"{year}/{race}/{category}"
+
+    def _read(self) -> Dict[str, Dict]:
+        """A helper method to read the index from disk, returning no entries if it is missing or unreadable."""
+        try:
+            with open(self._path, "r") as json_file:
+                return json.load(json_file)
+        except (OSError, ValueError):
+            return dict()
+
+    def _save(self) -> None:
+        """A helper method to write the index atomically, keeping entries added by other processes."""
+        entries = self._read()
+        entries.update(self._entries)
+        self._entries = entries
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(self._path), suffix=".tmp")
+        with os.fdopen(fd, "w") as json_file:
+            json.dump(self._entries, json_file, indent=1)
+        os.replace(tmp_path, self._path)
+
+    def get(self, year: int, race: str, category: str, allow_expired: bool = False) -> Optional[List[str]]:
+        """
+        Look up the sessions of an event.
+
+        :param year: The year of the event.
+        :param race: The race 3-letter code.
+        :param category: The racing class.
+        :param allow_expired: If True, also return an entry that has expired, e.g. when the website cannot be reached.
+        :return: The session codes in the order they were found, or None if the event is not indexed or has expired.
+        """
+        with self._lock:
+            entry = self._entries.get(self._key(year, race, category))
+        if entry is None:
+            return None
+        if not entry["complete"] and time.time() - entry["discovered"] > self.incomplete_ttl and not allow_expired:
+            return None
+        return list(entry["sessions"])
+
+    def set(self, year: int, race: str, category: str, sessions: List[str], complete: bool) -> None:
+        """
+        Record the sessions of an event.
+
+        :param year: The year of the event.
+        :param race: The race 3-letter code.
+        :param category: The racing class.
+        :param sessions: The session codes that exist.
+        :param complete: True if the event is over, so the entry never expires.
+        """
+        with self._lock:
+            self._entries[self._key(year, race, category)] = {
+                "sessions": list(sessions),
+                "complete": complete,
+                "discovered": time.time()
+            }
+            self._save()
@@ -0,0 +1,204 @@
+import os
+import time
+import random
+import threading
+from abc import ABC, abstractmethod
+from email.utils import formatdate
+from typing import Dict, Iterator, Optional
+from urllib.parse import urlsplit
+
+
+class TransportResponse:
+    """
+    A response from a transport. The body is streamed with iter_content and the response must be closed once done
+    with, so use it as a context manager.
+    """
+    def __init__(self, status: int, headers: Optional[Dict[str, str]] = None):
+        self.status = status
+        self.headers = headers if headers is not None else dict()
+
+    def iter_content(self) -> Iterator[bytes]:
+        """
+        Stream the body of the response.
+
+        :return: An iterator over the chunks of the body.
+        """
+        return iter(())
+
+    def close(self) -> None:
+        """Release anything held by the response."""
+        pass
+
+    def abort(self) -> None:
+        """Release the response without reading the rest of its body, e.g. when only the status was wanted."""
+        self.close()
+
+    def __enter__(self) -> "TransportResponse":
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb) -> None:
+        self.close()
+
+
+class Transport(ABC):
+    """
+    The interface PdfRetriever uses to talk to the MotoGP website. The HttpClient goes to the real website, the
+    FileTransport serves recorded files from disk so retrieval can be exercised and measured offline.
+
+    Connection problems are raised as ConnectionError and timeouts as TimeoutError. HTTP error statuses are not raised,
+    they are returned on the response for the caller to handle.
+    """
+    @abstractmethod
+    def request(self, method: str, url: str, headers: Optional[Dict[str, str]] = None) -> TransportResponse:
+        """
+        Send a request without reading the body.
+
+        :param method: The HTTP method, e.g. GET or HEAD.
+        :param url: The URL to request.
+        :param headers: Any extra request headers.
+        :return: The streamed response.
+        """
+
+
+class FileResponse(TransportResponse):
+    """A response whose body is read from a local file."""
+    def __init__(self, status: int, headers: Dict[str, str], path: Optional[str] = None, length: int = -1,
+                 chunk_size: int = 64 * 1024):
+        super().__init__(status, headers)
+        self._path = path
+        self._length = length
+        self._chunk_size = chunk_size
+
+    def iter_content(self) -> Iterator[bytes]:
+        if self._path is None:
+            return
+        remaining = self._length
+        with open(self._path, "rb") as in_file:
+            while remaining != 0:
+                size = self._chunk_size if remaining < 0 else min(self._chunk_size, remaining)
+                chunk = in_file.read(size)
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                yield chunk
+
+
+class FileTransport(Transport):
+    """
+    A transport serving recorded files from a local directory, laid out as <root>/<host>/<path>, e.g.
+    <root>/resources.motogp.com/files/results/2024/QAT/MotoGP/FP1/Analysis.pdf. A URL whose path is a directory is
+    answered with the index.html inside it. Missing files are answered with a 404.
+
+    Latency and failures can be injected to measure concurrency, retries and caching. The random choices come from a
+    seeded generator so runs are repeatable.
+    """
+    def __init__(
+            self,
+            root: str,
+            latency: float = 0.0,
+            latency_jitter: float = 0.0,
+            failure_rate: float = 0.0,
+            failure_status: Optional[int] = None,
+            seed: Optional[int] = 0):
+        """
+        :param root: The directory holding the recorded files.
+        :param latency: The number of seconds each request waits before answering.
+        :param latency_jitter: Up to this many extra seconds are added to the latency of each request at random.
+        :param failure_rate: The fraction of requests, between 0 and 1, that fail.
+        :param failure_status:
+            The status returned by a failing request, e.g. 503. If None a failing request raises a ConnectionError.
+        :param seed: The seed for the random latency and failures.
+        """
+        self.root = root
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.failure_rate = failure_rate
+        self.failure_status = failure_status
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.request_count = 0
+        self.bytes_served = 0
+
+    def path_for(self, url: str) -> str:
+        """
+        Map a URL to the local file recorded for it.
+
+        :param url: The URL.
+        :return: The local path, which may not exist.
+        """
+        parts = urlsplit(url)
+        path = os.path.join(self.root, parts.netloc, *[p for p in parts.path.split("/") if p])
+        if os.path.isdir(path):
+            path = os.path.join(path, "index.html")
+        return path
+
+    def request(self, method: str, url: str, headers: Optional[Dict[str, str]] = None) -> TransportResponse:
+        headers = headers if headers is not None else dict()
+        with self._lock:
+            self.request_count += 1
+            delay = self.latency + self._random.uniform(0.0, self.latency_jitter)
+            failed = self._random.random() < self.failure_rate
+        if delay > 0:
+            time.sleep(delay)
+        if failed:
+            if self.failure_status is None:
+                raise ConnectionError(f"Injected failure for {url}")
+            return TransportResponse(self.failure_status)
+
+        path = self.path_for(url)
+        if not os.path.isfile(path):
+            return TransportResponse(404)
+
+        stat = os.stat(path)
+        response_headers = {
+            "ETag": f'"{stat.st_size:x}-{stat.st_mtime_ns:x}"',
+            "Last-Modified": formatdate(stat.st_mtime, usegmt=True),
+            "Content-Length": str(stat.st_size)
+        }
+        if headers.get("If-None-Match") == response_headers["ETag"]:
+            return TransportResponse(304, response_headers)
+
+        status = 200
+        length = stat.st_size
+        if headers.get("Range") == "bytes=0-0" and stat.st_size > 0:
+            status = 206
+            length = 1
+            response_headers["Content-Length"] = "1"
+        if method == "HEAD":
+            return TransportResponse(status, response_headers)
+
+        with self._lock:
+            self.bytes_served += length
+        return FileResponse(status, response_headers, path, length)
+
+
+class RecordingTransport(Transport):
+    """
+    A transport that passes requests on to another transport and saves every successful GET body in the layout read by
+    FileTransport, to record fixtures from the real website.
+    """
+    def __init__(self, transport: Transport, root: str):
+        """
+        :param transport: The transport that answers the requests, normally the HttpClient.
+        :param root: The directory to record the files in.
+        """
+        self.transport = transport
+        self.recorder = FileTransport(root)
+
+    def request(self, method: str, url: str, headers: Optional[Dict[str, str]] = None) -> TransportResponse:
+        response = self.transport.request(method, url, headers)
+        if response.status != 200:
+            return response
+
+        path = self.recorder.path_for(url)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        if method != "GET":
+            # keep a placeholder so the page is known to exist when replayed
+            if not os.path.isfile(path):
+                open(path, "wb").close()
+            return response
+        with response, open(path, "wb") as out_file:
+            for chunk in response.iter_content():
+                out_file.write(chunk)
+        stat = os.stat(path)
+        return FileResponse(200, {"Content-Length": str(stat.st_size)}, path, stat.st_size)